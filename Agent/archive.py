@@ -0,0 +1,159 @@
+# Conversation archive: compressed prompt/response history with full-text search
+#
+# Texts are stored zlib-compressed; the FTS5 index is contentless, so it holds
+# only the search terms and the archive stays a fraction of the raw size.
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exchanges (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    created       REAL NOT NULL,
+    request_key   TEXT NOT NULL,
+    persona       TEXT,
+    model         TEXT,
+    task          BLOB NOT NULL,
+    prompt        BLOB NOT NULL,
+    response      BLOB NOT NULL,
+    input_tokens  INTEGER,
+    output_tokens INTEGER,
+    latency       REAL
+);
+CREATE INDEX IF NOT EXISTS exchanges_key ON exchanges (request_key, created);
+CREATE VIRTUAL TABLE IF NOT EXISTS exchanges_fts USING fts5(
+    task, response, content='', tokenize='porter unicode61'
+);
+"""
+
+
+def _pack(text):
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def _unpack(blob):
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def _match_expression(query, any_term=False):
+    """FTS5 query from free text: quoted words, all required (or any)"""
+    words = re.findall(r"\w+", query.lower())
+    return (" OR " if any_term else " ").join(f'"{word}"' for word in words)
+
+
+class ConversationArchive:
+    """Every prompt/response pair, searchable and reusable as a cache"""
+
+    def __init__(self, path, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def record(self, request_key, task, prompt, response, persona=None, model=None,
+               usage=None, latency=None):
+        """Store one exchange and index its task and response; returns its id"""
+        usage = usage or {}
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = db.execute(
+                "INSERT INTO exchanges (created, request_key, persona, model, task, prompt, response, "
+                "input_tokens, output_tokens, latency) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), request_key, persona, model, _pack(task), _pack(prompt), _pack(response),
+                 usage.get("input_tokens"), usage.get("output_tokens"), latency),
+            )
+            db.execute("INSERT INTO exchanges_fts (rowid, task, response) VALUES (?, ?, ?)",
+                       (cursor.lastrowid, task, response))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return cursor.lastrowid
+
+    def lookup(self, request_key, max_age=None):
+        """Latest response archived for exactly this request, or None"""
+        sql = "SELECT response FROM exchanges WHERE request_key = ?"
+        args = [request_key]
+        if max_age:
+            sql += " AND created >= ?"
+            args.append(time.time() - max_age)
+        row = self._connection().execute(sql + " ORDER BY created DESC LIMIT 1", args).fetchone()
+        return _unpack(row["response"]) if row else None
+
+    def search(self, query, limit=10, any_term=False, snippet_chars=160):
+        """Best-matching exchanges for free text, with a snippet of each answer"""
+        expression = _match_expression(query, any_term)
+        if not expression:
+            return []
+        rows = self._connection().execute(
+            "SELECT e.id, e.created, e.persona, e.model, e.task, e.response, e.latency, "
+            "e.input_tokens, e.output_tokens FROM exchanges_fts f JOIN exchanges e ON e.id = f.rowid "
+            "WHERE exchanges_fts MATCH ? ORDER BY bm25(exchanges_fts) LIMIT ?",
+            (expression, limit),
+        )
+        words = re.findall(r"\w+", query.lower())
+        hits = []
+        for row in rows:
+            response = _unpack(row["response"])
+            hits.append({
+                "id": row["id"],
+                "created": row["created"],
+                "persona": row["persona"],
+                "model": row["model"],
+                "task": _unpack(row["task"]),
+                "response": response,
+                "snippet": _snippet(response, words, snippet_chars),
+                "latency": row["latency"],
+                "input_tokens": row["input_tokens"],
+                "output_tokens": row["output_tokens"],
+            })
+        return hits
+
+    def get(self, exchange_id):
+        """One archived exchange with its full prompt and response"""
+        row = self._connection().execute("SELECT * FROM exchanges WHERE id = ?", (exchange_id,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        for field in ("task", "prompt", "response"):
+            entry[field] = _unpack(entry[field])
+        return entry
+
+    def related_context(self, task, limit=2, max_chars=1500):
+        """Earlier answers to similar tasks, formatted as prompt context"""
+        parts = []
+        for hit in self.search(task, limit=limit, any_term=True):
+            parts.append(f"Q: {hit['task'][:200]}\nA: {hit['response'][:max_chars]}")
+        return "\n\n".join(parts)
+
+    def stats(self):
+        row = self._connection().execute(
+            "SELECT COUNT(*) AS exchanges, COALESCE(SUM(LENGTH(prompt) + LENGTH(response)), 0) AS stored, "
+            "COALESCE(SUM(input_tokens), 0) AS input_tokens, COALESCE(SUM(output_tokens), 0) AS output_tokens "
+            "FROM exchanges"
+        ).fetchone()
+        return dict(row)
+
+
+def _snippet(text, words, limit):
+    """Window of text around the first matching word"""
+    lowered = text.lower()
+    positions = [lowered.find(word) for word in words if word in lowered]
+    start = max(0, min(positions) - limit // 4) if positions else 0
+    snippet = " ".join(text[start:start + limit].split())
+    return ("…" if start else "") + snippet + ("…" if start + limit < len(text) else "")
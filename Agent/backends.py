@@ -0,0 +1,232 @@
+# Pluggable model backends: live Cohere, cassette recorder and replayer
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+
+class ChatResponse:
+    """Backend-neutral chat result"""
+
+    def __init__(self, text, usage=None, model=None):
+        self.text = text
+        self.usage = usage or {"input_tokens": 0, "output_tokens": 0}
+        self.model = model
+
+    def __repr__(self):
+        return f"ChatResponse(model={self.model!r}, chars={len(self.text)})"
+
+
+class CassetteMissError(KeyError):
+    """Raised by a strict replayer when no recording matches a request"""
+
+
+def usage_from_response(response):
+    """Extract billed token counts from a Cohere chat response or stream end event"""
+    usage = getattr(response, "usage", None)
+    billed = getattr(usage, "billed_units", None) or getattr(usage, "tokens", None)
+    return {
+        "input_tokens": int(getattr(billed, "input_tokens", 0) or 0),
+        "output_tokens": int(getattr(billed, "output_tokens", 0) or 0),
+    }
+
+
+def messages_key(messages):
+    """Stable hash of a message list, used to match recordings"""
+    encoded = json.dumps(messages, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ChatBackend:
+    """Interface every backend implements
+
+    chat() returns a ChatResponse. chat_stream() yields ("chunk", text)
+    pairs as text arrives and finally one ("usage", usage_dict) pair.
+    """
+
+    def chat(self, model, messages, **options):
+        raise NotImplementedError
+
+    def chat_stream(self, model, messages, **options):
+        response = self.chat(model, messages, **options)
+        yield "chunk", response.text
+        yield "usage", response.usage
+
+
+class CohereBackend(ChatBackend):
+    """Calls the Cohere v2 chat API"""
+
+    def __init__(self, api_key=None, client=None):
+        if client is None:
+            import cohere
+            client = cohere.ClientV2(api_key)
+        self.client = client
+
+    def chat(self, model, messages, **options):
+        response = self.client.chat(model=model, messages=messages, **options)
+        return ChatResponse(response.message.content[0].text, usage_from_response(response), model)
+
+    def chat_stream(self, model, messages, **options):
+        for event in self.client.chat_stream(model=model, messages=messages, **options):
+            if event.type == "content-delta":
+                yield "chunk", event.delta.message.content.text
+            elif event.type == "message-end":
+                yield "usage", usage_from_response(event.delta)
+
+
+class RecordingBackend(ChatBackend):
+    """Passes calls through to another backend and appends them to a cassette file"""
+
+    def __init__(self, inner, path):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def chat(self, model, messages, **options):
+        start = time.perf_counter()
+        response = self.inner.chat(model, messages, **options)
+        self._save(model, messages, options, response.text, response.usage,
+                   time.perf_counter() - start, chunks=None)
+        return response
+
+    def chat_stream(self, model, messages, **options):
+        start = time.perf_counter()
+        chunks = []
+        usage = None
+        for kind, payload in self.inner.chat_stream(model, messages, **options):
+            if kind == "chunk":
+                chunks.append([time.perf_counter() - start, payload])
+            elif kind == "usage":
+                usage = payload
+            yield kind, payload
+
+        text = "".join(chunk for _, chunk in chunks)
+        self._save(model, messages, options, text, usage, time.perf_counter() - start, chunks=chunks)
+
+    def _save(self, model, messages, options, text, usage, latency, chunks):
+        record = {
+            "key": messages_key(messages),
+            "model": model,
+            "messages": messages,
+            "options": options,
+            "text": text,
+            "usage": usage,
+            "latency": latency,
+            "chunks": chunks,
+            "recorded_at": time.time(),
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def latency_sampler(spec, seed=None):
+    """Build a function returning a latency in seconds from a spec string
+
+    Specs: "recorded" (use the recorded latency), "none", "fixed:S",
+    "uniform:LOW,HIGH", "normal:MEAN,STDDEV" or "lognormal:MU,SIGMA".
+    """
+    rng = random.Random(seed)
+    kind, _, params = (spec or "recorded").partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()]
+
+    if kind == "recorded":
+        return lambda recorded: recorded
+    if kind == "none":
+        return lambda recorded: 0.0
+    if kind == "fixed":
+        return lambda recorded: values[0]
+    if kind == "uniform":
+        return lambda recorded: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda recorded: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda recorded: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+class ReplayBackend(ChatBackend):
+    """Serves recorded responses from a cassette with simulated latency
+
+    Requests are matched by the hash of their messages; with several
+    recordings for the same request they are replayed round-robin. Misses
+    raise CassetteMissError when strict, otherwise return a placeholder.
+    """
+
+    def __init__(self, path, latency="recorded", seed=None, strict=False):
+        self.path = path
+        self.strict = strict
+        self.sample_latency = latency_sampler(latency, seed)
+        self.recordings = {}
+        self.stats = {"hits": 0, "misses": 0}
+        self._cursor = {}
+        self._lock = threading.Lock()
+        self.load(path)
+
+    def load(self, path):
+        if not path or not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    record = json.loads(line)
+                    self.recordings.setdefault(record["key"], []).append(record)
+
+    def chat(self, model, messages, **options):
+        record = self._find(model, messages)
+        time.sleep(self.sample_latency(record.get("latency", 0.0)))
+        return ChatResponse(record["text"], record.get("usage"), model)
+
+    def chat_stream(self, model, messages, **options):
+        record = self._find(model, messages)
+        recorded_latency = record.get("latency", 0.0)
+        target = self.sample_latency(recorded_latency)
+        chunks = record.get("chunks") or [[recorded_latency, record["text"]]]
+
+        # Stretch the recorded chunk timings to the sampled total latency
+        scale = target / recorded_latency if recorded_latency else 0.0
+        start = time.perf_counter()
+        for offset, text in chunks:
+            delay = offset * scale - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+            yield "chunk", text
+        yield "usage", record.get("usage") or {"input_tokens": 0, "output_tokens": 0}
+
+    def _find(self, model, messages):
+        key = messages_key(messages)
+        with self._lock:
+            candidates = self.recordings.get(key)
+            if not candidates:
+                self.stats["misses"] += 1
+                if self.strict:
+                    raise CassetteMissError(f"No recording for request {key[:12]} ({model})")
+                return {"text": f"[replay] No recording for this request ({model}).", "latency": 0.0}
+
+            self.stats["hits"] += 1
+            # Prefer recordings made against the same model
+            same_model = [r for r in candidates if r["model"] == model] or candidates
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            return same_model[index % len(same_model)]
+
+
+def backend_from_env(api_key=None, default_cassette=None):
+    """Create the backend selected by AGENT_BACKEND (cohere, record or replay)"""
+    kind = os.getenv("AGENT_BACKEND", "cohere").lower()
+    cassette = os.getenv("AGENT_CASSETTE", default_cassette)
+
+    if kind == "replay":
+        return ReplayBackend(
+            cassette,
+            latency=os.getenv("AGENT_REPLAY_LATENCY", "recorded"),
+            seed=os.getenv("AGENT_REPLAY_SEED"),
+            strict=os.getenv("AGENT_REPLAY_STRICT", "0") == "1",
+        )
+    if kind == "record":
+        return RecordingBackend(CohereBackend(api_key), cassette)
+    return CohereBackend(api_key)
@@ -0,0 +1,198 @@
+# Non-interactive batch mode: dependency-aware, concurrent command execution
+#
+# Input is either a script with one REPL-style command per line:
+#
+#     read math_operations.py
+#     edit math_operations.py add docstrings to all functions
+#     review math_operations.py
+#
+# or JSONL with one object per line:
+#
+#     {"id": "r1", "op": "review", "target": "math_operations.py"}
+#     {"id": "e1", "op": "edit", "file": "a.py", "instructions": "...", "after": ["r1"]}
+#
+# Commands touching the same file keep their order (a write waits for earlier
+# reads and writes of that file, a read waits for earlier writes); everything
+# else runs concurrently. Results are written as JSONL in completion order.
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+READ_OPS = {"read", "analyze", "review"}
+WRITE_OPS = {"write", "create", "edit"}
+
+
+class BatchCommand:
+    """One unit of batch work"""
+
+    def __init__(self, command_id, op, params, after=None):
+        self.id = str(command_id)
+        self.op = op
+        self.params = params
+        self.after = set(str(a) for a in (after or []))
+        self.deps = set(self.after)
+
+    @property
+    def file(self):
+        target = self.params.get("file") or (self.params.get("target") if self.op == "review" else None)
+        # file.py::Class.method touches file.py
+        return target.split("::", 1)[0] if target else None
+
+    def touches(self):
+        """(files read, files written) by this command"""
+        if self.op in WRITE_OPS:
+            return set(), {self.file}
+        if self.op in READ_OPS and self.file:
+            return {self.file}, set()
+        if self.op == "ask":
+            # Questions pick up files they mention as context
+            words = (w.strip('.,!?;:"\'') for w in self.params.get("message", "").split())
+            return {w for w in words if '.' in w and not w.startswith('.')}, set()
+        return set(), set()
+
+
+def parse_line(line, number):
+    """Turn one script line into a BatchCommand (None for blanks and comments)"""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+
+    command_id = f"L{number}"
+    word, _, rest = line.partition(" ")
+    op = word.lower()
+    rest = rest.strip()
+
+    if op in ("read", "analyze"):
+        return BatchCommand(command_id, op, {"file": rest})
+    if op == "review":
+        return BatchCommand(command_id, op, {"target": rest})
+    if op in ("edit", "write", "create"):
+        file_path, _, text = rest.partition(" ")
+        key = "instructions" if op == "edit" else "content"
+        return BatchCommand(command_id, op, {"file": file_path, key: text})
+    if op == "list":
+        return BatchCommand(command_id, op, {"dir": rest or "."})
+    if op == "ask":
+        return BatchCommand(command_id, "ask", {"message": rest})
+    return BatchCommand(command_id, "ask", {"message": line})
+
+
+def load_commands(path):
+    """Read a script or JSONL file of commands"""
+    commands = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            stripped = line.strip()
+            if stripped.startswith("{"):
+                spec = json.loads(stripped)
+                op = spec.pop("op")
+                command_id = spec.pop("id", f"L{number}")
+                after = spec.pop("after", [])
+                commands.append(BatchCommand(command_id, op, spec, after))
+            else:
+                command = parse_line(line, number)
+                if command:
+                    commands.append(command)
+    return commands
+
+
+def plan(commands):
+    """Add ordering dependencies between commands that touch the same files"""
+    ids = set()
+    for command in commands:
+        if command.id in ids:
+            raise ValueError(f"Duplicate command id: {command.id}")
+        ids.add(command.id)
+
+    for i, command in enumerate(commands):
+        unknown = command.after - ids
+        if unknown:
+            raise ValueError(f"{command.id} depends on unknown ids: {', '.join(sorted(unknown))}")
+        reads, writes = command.touches()
+        for earlier in commands[:i]:
+            earlier_reads, earlier_writes = earlier.touches()
+            if writes & (earlier_reads | earlier_writes) or reads & earlier_writes:
+                command.deps.add(earlier.id)
+    return commands
+
+
+class BatchRunner:
+    """Runs planned commands on a worker pool as their dependencies finish"""
+
+    def __init__(self, operations, jobs=8, output=None):
+        self.operations = operations
+        self.jobs = jobs
+        self.output = output
+        self.results = {}
+        self._lock = threading.Lock()
+        self._start = None
+
+    def run(self, commands):
+        plan(commands)
+        pending = {command.id: command for command in commands}
+        running = {}
+        self._start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while pending or running:
+                for command in list(pending.values()):
+                    states = [self.results.get(dep, {}).get("status") for dep in command.deps]
+                    if any(state not in (None, "ok") for state in states):
+                        del pending[command.id]
+                        self._finish(command, "skipped", {"error": "A dependency did not succeed"}, 0.0, 0.0)
+                    elif all(state == "ok" for state in states):
+                        del pending[command.id]
+                        running[pool.submit(self._execute, command)] = command
+
+                if not running:
+                    if pending:
+                        # Only reachable with a dependency cycle via explicit "after"
+                        for command in pending.values():
+                            self._finish(command, "skipped", {"error": "Dependency cycle"}, 0.0, 0.0)
+                        pending.clear()
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+
+        return [self.results[command.id] for command in commands]
+
+    def _execute(self, command):
+        started = time.perf_counter() - self._start
+        operation = self.operations.get(command.op)
+        try:
+            if operation is None:
+                raise ValueError(f"Unknown operation: {command.op}")
+            result = operation(command.params)
+            status = "error" if isinstance(result, dict) and "error" in result else "ok"
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {e}"}
+            status = "failed"
+        self._finish(command, status, result, started, time.perf_counter() - self._start)
+
+    def _finish(self, command, status, result, started, finished):
+        record = {
+            "id": command.id,
+            "op": command.op,
+            "params": command.params,
+            "status": status,
+            "deps": sorted(command.deps),
+            "started": round(started, 4),
+            "duration": round(finished - started, 4),
+            "result": result,
+        }
+        with self._lock:
+            self.results[command.id] = record
+            if self.output:
+                self.output.write(json.dumps(record, default=str) + "\n")
+                self.output.flush()
+
+
+def summarize(results):
+    """Count of results per status"""
+    counts = {}
+    for record in results:
+        counts[record["status"]] = counts.get(record["status"], 0) + 1
+    return counts
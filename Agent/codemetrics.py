@@ -0,0 +1,253 @@
+# Code metrics for workspace files: complexity, size, documentation and churn
+#
+# Metrics depend only on a file's content, so they are cached per content
+# hash; churn is the number of distinct versions of a file seen recently.
+import ast
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from Agent.depgraph import scan_python_files
+
+# Decision points that add a path through a function
+_BRANCHES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler, ast.Assert)
+# Statements that nest a block
+_BLOCKS = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try)
+if hasattr(ast, "Match"):
+    _BRANCHES += (ast.match_case,)
+    _BLOCKS += (ast.Match,)
+if hasattr(ast, "TryStar"):
+    _BLOCKS += (ast.TryStar,)
+
+CHURN_WINDOW = 30 * 24 * 3600
+
+
+class _MetricsVisitor(ast.NodeVisitor):
+    """Collects per-function metrics in one walk of the tree"""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.functions = []
+        self.classes = []
+        self.stack = []  # metrics of the enclosing functions, innermost last
+        self.owner = []  # enclosing class names
+        self.depth = 0
+
+    def _function(self, node):
+        args = node.args
+        metrics = {
+            "name": ".".join(self.owner + [node.name]),
+            "line": node.lineno,
+            "end_line": node.end_lineno,
+            "loc": _code_lines(self.lines, node.lineno, node.end_lineno),
+            "params": len(args.posonlyargs) + len(args.args) + len(args.kwonlyargs)
+                      + bool(args.vararg) + bool(args.kwarg),
+            "complexity": 1,
+            "nesting": 0,
+            "docstring": ast.get_docstring(node) is not None,
+        }
+        self.functions.append(metrics)
+
+        # A nested function is measured on its own, from depth 0
+        outer_depth, self.depth = self.depth, 0
+        self.stack.append(metrics)
+        self.owner.append(node.name)
+        self.generic_visit(node)
+        self.owner.pop()
+        self.stack.pop()
+        self.depth = outer_depth
+
+    visit_FunctionDef = visit_AsyncFunctionDef = _function
+
+    def visit_ClassDef(self, node):
+        self.classes.append({"name": node.name, "docstring": ast.get_docstring(node) is not None})
+        self.owner.append(node.name)
+        self.generic_visit(node)
+        self.owner.pop()
+
+    def generic_visit(self, node):
+        current = self.stack[-1] if self.stack else None
+        if current is not None:
+            if isinstance(node, _BRANCHES):
+                current["complexity"] += 1
+            elif isinstance(node, ast.BoolOp):
+                current["complexity"] += len(node.values) - 1
+            elif isinstance(node, ast.comprehension):
+                current["complexity"] += 1 + len(node.ifs)
+
+        if isinstance(node, _BLOCKS):
+            self.depth += 1
+            if current is not None:
+                current["nesting"] = max(current["nesting"], self.depth)
+            super().generic_visit(node)
+            self.depth -= 1
+        else:
+            super().generic_visit(node)
+
+
+def _code_lines(lines, start, end):
+    """Lines in [start, end] that are neither blank nor comments"""
+    return sum(1 for line in lines[start - 1:end] if line.strip() and not line.strip().startswith("#"))
+
+
+def file_metrics(source):
+    """Metrics of one Python source text (raises SyntaxError)"""
+    tree = ast.parse(source)
+    lines = source.split("\n")
+    visitor = _MetricsVisitor(lines)
+    visitor.visit(tree)
+
+    functions = visitor.functions
+    documented = sum(f["docstring"] for f in functions) + sum(c["docstring"] for c in visitor.classes)
+    documentable = len(functions) + len(visitor.classes)
+    complexities = [f["complexity"] for f in functions] or [0]
+    return {
+        "loc": len(lines),
+        "sloc": _code_lines(lines, 1, len(lines)),
+        "functions": functions,
+        "classes": len(visitor.classes),
+        "max_complexity": max(complexities),
+        "avg_complexity": round(sum(complexities) / len(complexities), 2),
+        "max_nesting": max([f["nesting"] for f in functions] or [0]),
+        "max_params": max([f["params"] for f in functions] or [0]),
+        "docstring_coverage": round(documented / documentable, 2) if documentable else 1.0,
+        "module_docstring": ast.get_docstring(tree) is not None,
+    }
+
+
+def _metrics_or_error(source):
+    try:
+        return file_metrics(source)
+    except (SyntaxError, ValueError) as e:
+        return {"error": f"Syntax error at line {getattr(e, 'lineno', '?')}: {getattr(e, 'msg', e)}"}
+
+
+def risk_score(metrics, churn=1):
+    """Higher means more likely to hide bugs
+
+    Complexity above 5 (worst function counted twice), nesting deeper than
+    3, size, missing docstrings and repeated changes all add to the score.
+    """
+    excess = sum(max(0, f["complexity"] - 5) for f in metrics["functions"])
+    return round(
+        excess
+        + 2 * max(0, metrics["max_complexity"] - 5)
+        + 1.5 * max(0, metrics["max_nesting"] - 3)
+        + metrics["sloc"] / 100
+        + 3 * (1 - metrics["docstring_coverage"])
+        + 2 * max(0, churn - 1),
+        1,
+    )
+
+
+class MetricsEngine:
+    """Workspace metrics, cached per content hash in SQLite
+
+    collect() hashes every file (in threads), computes metrics only for
+    content not seen before and records each file's versions for churn.
+    Many uncached files are measured in forked worker processes, but only
+    while this process has a single thread: forking a threaded process
+    (the API server, the daemon) can deadlock the child, so there the
+    work stays in this process.
+    """
+
+    def __init__(self, path, workers=None, parallel_threshold=8, timeout=10.0):
+        self.path = path
+        self.workers = workers or os.cpu_count() or 2
+        self.parallel_threshold = parallel_threshold
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS metrics (content_hash TEXT PRIMARY KEY, data TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS versions (
+                path TEXT NOT NULL, content_hash TEXT NOT NULL, seen REAL NOT NULL,
+                PRIMARY KEY (path, content_hash)
+            );
+        """)
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def collect(self, root):
+        """({rel path: metrics with "risk" and "churn"}, stats) for every .py file under root"""
+        paths = sorted(scan_python_files(root))
+
+        def load(rel_path):
+            with open(os.path.join(root, rel_path), "r", encoding="utf-8", errors="ignore") as f:
+                source = f.read()
+            return rel_path, hashlib.sha256(source.encode("utf-8")).hexdigest(), source
+
+        with ThreadPoolExecutor(max_workers=min(32, len(paths) or 1)) as pool:
+            files = list(pool.map(load, paths))
+
+        db = self._connection()
+        hashes = sorted({content_hash for _, content_hash, _ in files})
+        cached = {}
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            rows = db.execute(
+                f"SELECT content_hash, data FROM metrics WHERE content_hash IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            cached.update({content_hash: json.loads(data) for content_hash, data in rows})
+
+        missing = {}
+        for _, content_hash, source in files:
+            if content_hash not in cached:
+                missing[content_hash] = source
+        computed = self._compute(list(missing.items()))
+
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany("INSERT OR REPLACE INTO metrics (content_hash, data) VALUES (?, ?)",
+                           [(h, json.dumps(m)) for h, m in computed.items()])
+            db.executemany("INSERT OR IGNORE INTO versions (path, content_hash, seen) VALUES (?, ?, ?)",
+                           [(rel_path, content_hash, now) for rel_path, content_hash, _ in files])
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        cached.update(computed)
+
+        churn = dict(db.execute(
+            "SELECT path, COUNT(*) FROM versions WHERE seen >= ? GROUP BY path", (now - CHURN_WINDOW,)
+        ).fetchall())
+        results = {}
+        for rel_path, content_hash, _ in files:
+            metrics = dict(cached[content_hash])
+            metrics["churn"] = churn.get(rel_path, 1)
+            if "error" not in metrics:
+                metrics["risk"] = risk_score(metrics, metrics["churn"])
+            results[rel_path] = metrics
+        return results, {"files": len(files), "computed": len(computed), "cached": len(files) - len(missing)}
+
+    def _compute(self, items):
+        """{content hash: metrics} for [(content hash, source), ...]"""
+        if not items:
+            return {}
+        hashes = [h for h, _ in items]
+        sources = [source for _, source in items]
+        if (len(items) < self.parallel_threshold or threading.active_count() > 1
+                or "fork" not in multiprocessing.get_all_start_methods()):
+            return dict(zip(hashes, map(_metrics_or_error, sources)))
+        # Parsing is CPU-bound; forked workers only run the pure functions above
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(items)),
+                                 mp_context=multiprocessing.get_context("fork")) as pool:
+            return dict(zip(hashes, pool.map(_metrics_or_error, sources, chunksize=4)))
+
+
+def hot_files(results, limit=10):
+    """(rel path, metrics) of the riskiest files, highest risk first"""
+    ranked = [(path, m) for path, m in results.items() if "risk" in m]
+    return sorted(ranked, key=lambda item: -item[1]["risk"])[:limit]
@@ -0,0 +1,162 @@
+# Background daemon holding warm agent state, and its thin client
+#
+# This module is imported on the one-shot fast path before anything heavy,
+# so it must only depend on the standard library.
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+from Agent.state import state_dir
+
+
+def default_socket():
+    return os.getenv("AGENT_SOCKET") or os.path.join(state_dir(), "agent.sock")
+
+
+def run_client(command, socket_path=None, timeout=600):
+    """Send one command to a running daemon and print its output
+
+    Returns the command's exit code, or None when no daemon is listening
+    so the caller can run the command itself.
+    """
+    socket_path = socket_path or default_socket()
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+
+    with sock, sock.makefile("rwb") as stream:
+        stream.write(json.dumps({"command": command}).encode("utf-8") + b"\n")
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "out" in message:
+                sys.stdout.write(message["out"])
+                sys.stdout.flush()
+            elif "exit" in message:
+                return message["exit"]
+    return 1
+
+
+class _CommandStdout(io.TextIOBase):
+    """sys.stdout replacement that sends prints to the command being run
+
+    Commands run one at a time, so everything printed while one runs, from
+    any thread (task runners, test pools), belongs to it. A line starting
+    with "❌" marks the command as failed.
+    """
+
+    def __init__(self, default):
+        self.default = default
+        self.sink = None
+        self.failed = False
+
+    def write(self, text):
+        sink = self.sink
+        if sink is None:
+            return self.default.write(text)
+        if any(line.lstrip().startswith("❌") for line in text.split("\n")):
+            self.failed = True
+        sink(text)
+        return len(text)
+
+    def flush(self):
+        if self.sink is None:
+            self.default.flush()
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            command = json.loads(line)["command"].strip()
+        except (ValueError, KeyError):
+            self._send({"out": "❌ Malformed request\n"})
+            self._send({"exit": 2})
+            return
+
+        # handle_command, its module state and the profiler are not thread-safe
+        stdout = self.server.stdout
+        with self.server.command_lock:
+            stdout.sink = lambda text: self._send({"out": text})
+            stdout.failed = False
+            try:
+                if command.lower() == "quit":
+                    print("ℹ️  'quit' has no effect on the daemon; stop it with Ctrl+C")
+                else:
+                    self.server.run_command(command)
+            except Exception as e:
+                print(f"❌ {type(e).__name__}: {e}")
+            finally:
+                stdout.sink = None
+            exit_code = 1 if stdout.failed else 0
+        self._send({"exit": exit_code})
+
+    def _send(self, message):
+        try:
+            self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+            self.wfile.flush()
+        except OSError:
+            pass  # Client disconnected; keep running the command
+
+
+class _DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _is_listening(socket_path):
+    """True if something accepts connections on socket_path"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def serve_daemon(run_command, socket_path=None):
+    """Serve commands on a Unix socket until interrupted
+
+    run_command(text) runs one REPL command in this warm process; whatever
+    it prints is streamed back to the client that sent it. Commands from
+    concurrent clients are queued and run one at a time.
+    """
+    socket_path = socket_path or default_socket()
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+    if os.path.exists(socket_path):
+        if _is_listening(socket_path):
+            print(f"❌ A daemon is already listening on {socket_path}")
+            return
+        os.unlink(socket_path)  # Stale socket from a crashed daemon
+
+    stdout = _CommandStdout(sys.stdout)
+    sys.stdout = stdout
+    server = _DaemonServer(socket_path, _CommandHandler)
+    server.run_command = run_command
+    server.stdout = stdout
+    server.command_lock = threading.Lock()
+    os.chmod(socket_path, 0o600)
+    print(f"🛰️  Agent daemon listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Daemon stopped")
+    finally:
+        server.server_close()
+        sys.stdout = stdout.default
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
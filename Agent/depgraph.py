@@ -0,0 +1,261 @@
+# Workspace import graph and test-impact selection
+import os
+import threading
+
+
+def module_name(rel_path):
+    """Dotted module name of a workspace-relative .py path"""
+    parts = rel_path[:-3].replace(os.sep, "/").split("/")
+    if parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+def is_test_file(rel_path):
+    """Test modules: test_*.py, *_test.py, or anything under a tests/ directory"""
+    name = os.path.basename(rel_path)
+    parts = rel_path.replace(os.sep, "/").split("/")
+    return name.endswith(".py") and (
+        name.startswith("test_") or name.endswith("_test.py") or "tests" in parts[:-1]
+    )
+
+
+def scan_python_files(root):
+    """{rel path: (mtime_ns, size)} of every .py file under root, skipping hidden dirs"""
+    found = {}
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith(".") or entry.name == "__pycache__":
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(".py") and entry.is_file():
+                    stat = entry.stat()
+                    found[os.path.relpath(entry.path, root)] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                continue
+    return found
+
+
+class ImportGraph:
+    """Which workspace files import which, kept up to date file by file
+
+    set_imports(rel_path, imports) records the import strings of one file,
+    in the form FileSystemManager.analyze_file reports them ("pkg.mod",
+    "pkg.mod.name", ".sibling" for relative imports). Imports are resolved
+    to workspace files lazily, so a file added later is picked up by the
+    files that already import it. sync() re-reads only files whose mtime or
+    size changed since they were last indexed.
+    """
+
+    def __init__(self):
+        self._imports = {}  # rel path -> import strings
+        self._signatures = {}  # rel path -> (mtime_ns, size) when indexed
+        self._modules = {}  # module name -> rel path
+        self._deps = None  # rel path -> rel paths it imports (resolved)
+        self._rdeps = None  # rel path -> rel paths importing it
+        self._lock = threading.Lock()
+
+    def __contains__(self, rel_path):
+        return rel_path in self._imports
+
+    def __len__(self):
+        return len(self._imports)
+
+    def files(self):
+        return sorted(self._imports)
+
+    def set_imports(self, rel_path, imports, signature=None):
+        with self._lock:
+            self._set(rel_path, imports, signature)
+
+    def remove(self, rel_path):
+        with self._lock:
+            self._remove(rel_path)
+
+    def _set(self, rel_path, imports, signature):
+        self._imports[rel_path] = list(imports)
+        self._signatures[rel_path] = signature
+        self._modules[module_name(rel_path)] = rel_path
+        self._deps = self._rdeps = None
+
+    def _remove(self, rel_path):
+        if self._imports.pop(rel_path, None) is not None:
+            self._signatures.pop(rel_path, None)
+            self._modules.pop(module_name(rel_path), None)
+            self._deps = self._rdeps = None
+
+    def sync(self, root, read_imports):
+        """Bring the graph in line with the .py files under root
+
+        read_imports(rel_path) returns a file's import strings (or None to
+        keep what is recorded). Returns (changed, removed) rel paths. The
+        diff and its application happen under the lock, so concurrent
+        syncs and queries never see a half-updated graph.
+        """
+        current = scan_python_files(root)
+        with self._lock:
+            changed = [path for path, signature in current.items() if self._signatures.get(path) != signature]
+            removed = [path for path in self._imports if path not in current]
+            for path in removed:
+                self._remove(path)
+            for path in changed:
+                imports = read_imports(path)
+                if imports is None:
+                    imports = self._imports.get(path, [])
+                self._set(path, imports, current[path])
+        return changed, removed
+
+    def _resolve(self, rel_path, name):
+        """Workspace file an import string refers to, if any"""
+        if name.startswith("."):
+            level = len(name) - len(name.lstrip("."))
+            package = module_name(rel_path).split(".")
+            if not rel_path.endswith("__init__.py"):
+                package = package[:-1]
+            package = package[:len(package) - (level - 1)] if level > 1 else package
+            name = ".".join(package + [name.lstrip(".")]).strip(".")
+
+        # "pkg.mod.func" may name a module, a package member, or both: take the longest module
+        parts = name.split(".")
+        for end in range(len(parts), 0, -1):
+            target = self._modules.get(".".join(parts[:end]))
+            if target:
+                return target
+        return None
+
+    def _index(self):
+        with self._lock:
+            if self._deps is None:
+                deps = {}
+                rdeps = {path: set() for path in self._imports}
+                for path, imports in self._imports.items():
+                    targets = {self._resolve(path, name) for name in imports}
+                    targets.discard(None)
+                    targets.discard(path)
+                    deps[path] = targets
+                    for target in targets:
+                        rdeps[target].add(path)
+                self._deps, self._rdeps = deps, rdeps
+            return self._deps, self._rdeps
+
+    def imports_of(self, rel_path):
+        """Workspace files rel_path imports directly"""
+        return set(self._index()[0].get(rel_path, ()))
+
+    def importers_of(self, rel_path):
+        """Workspace files that import rel_path directly"""
+        return set(self._index()[1].get(rel_path, ()))
+
+    def dependencies(self, rel_paths):
+        """Every file any of rel_paths imports, directly or transitively"""
+        return _closure(self._index()[0], rel_paths)
+
+    def dependents(self, rel_paths):
+        """Every file that imports any of rel_paths, directly or transitively"""
+        return _closure(self._index()[1], rel_paths)
+
+    def impact(self, rel_path):
+        """What may break if rel_path changes"""
+        dependents = self.dependents([rel_path])
+        return {
+            "file": rel_path,
+            "direct": sorted(self.importers_of(rel_path)),
+            "transitive": sorted(dependents),
+            "tests": self.affected_tests([rel_path]),
+        }
+
+    def cycles(self):
+        """Import cycles: for each group of files that import each other
+        (a strongly connected component), {"files": the group, "cycle": one
+        real import path through it, [a, b, c] meaning a → b → c → a}
+        """
+        deps, _ = self._index()
+        index = {}
+        low = {}
+        on_stack = set()
+        stack = []
+        found = []
+        counter = [0]
+
+        def visit(root):
+            # Iterative Tarjan: (node, iterator over its imports)
+            work = [(root, iter(sorted(deps[root])))]
+            index[root] = low[root] = counter[0]
+            counter[0] += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, targets = work[-1]
+                for target in targets:
+                    if target not in index:
+                        index[target] = low[target] = counter[0]
+                        counter[0] += 1
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(sorted(deps[target]))))
+                        break
+                    if target in on_stack:
+                        low[node] = min(low[node], index[target])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1:
+                            found.append(sorted(component))
+
+        for path in sorted(deps):
+            if path not in index:
+                visit(path)
+        return [{"files": files, "cycle": _shortest_cycle(deps, files)} for files in sorted(found)]
+
+    def affected_tests(self, rel_paths):
+        """Test files that are, or transitively import, any of rel_paths"""
+        candidates = self.dependents(rel_paths) | set(rel_paths)
+        return sorted(path for path in candidates if is_test_file(path) and path in self._imports)
+
+
+def _shortest_cycle(edges, files):
+    """Shortest import path from the first file back to itself, inside files"""
+    start = files[0]
+    members = set(files)
+    parents = {}
+    queue = [start]
+    for node in queue:
+        for target in sorted(edges[node]):
+            if target == start:
+                path = [node]
+                while path[-1] != start:
+                    path.append(parents[path[-1]])
+                return path[::-1]
+            if target in members and target not in parents:
+                parents[target] = node
+                queue.append(target)
+    return list(files)
+
+
+def _closure(edges, starts):
+    seen = set()
+    stack = list(starts)
+    while stack:
+        for target in edges.get(stack.pop(), ()):
+            if target not in seen:
+                seen.add(target)
+                stack.append(target)
+    return seen - set(starts)
@@ -0,0 +1,174 @@
+# Lazy directory listing and line-range file reads for large workspaces
+import os
+import threading
+from collections import OrderedDict
+
+# Sorted entry names of recently listed directories, keyed by (path, mtime)
+_listings = OrderedDict()
+_listings_lock = threading.Lock()
+MAX_LISTINGS = 32
+
+
+def _sorted_entries(dir_path):
+    """[(name, is_dir)] of one directory, dirs first, rescanned only when it changes
+
+    Adding, removing or renaming an entry updates the directory's mtime, so
+    paging through a listing scans and sorts it once.
+    """
+    key = (dir_path, os.stat(dir_path).st_mtime_ns)
+    with _listings_lock:
+        if key in _listings:
+            _listings.move_to_end(key)
+            return _listings[key]
+
+    dirs = []
+    files = []
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.name)
+                elif entry.is_file():
+                    files.append(entry.name)
+            except OSError:
+                continue
+    dirs.sort(key=str.lower)
+    files.sort(key=str.lower)
+    listing = [(name, True) for name in dirs] + [(name, False) for name in files]
+
+    with _listings_lock:
+        _listings[key] = listing
+        while len(_listings) > MAX_LISTINGS:
+            _listings.popitem(last=False)
+    return listing
+
+
+def list_directory(root, rel_dir=".", offset=0, limit=200):
+    """List one directory level (dirs first), paginated
+
+    Only rel_dir itself is scanned, so the cost does not depend on how
+    many files live further down the tree; file sizes are read for the
+    returned page only.
+    """
+    root = os.path.abspath(root)
+    dir_path = os.path.abspath(os.path.join(root, rel_dir))
+    if os.path.commonpath([root, dir_path]) != root:
+        return {"error": f"Access restricted: {rel_dir}"}
+    if not os.path.isdir(dir_path):
+        return {"error": f"Not a directory: {rel_dir}"}
+
+    listing = _sorted_entries(dir_path)
+    entries = []
+    for name, is_dir in listing[offset:offset + limit]:
+        if is_dir:
+            entries.append({"name": name, "type": "dir"})
+            continue
+        try:
+            size = os.stat(os.path.join(dir_path, name)).st_size
+        except OSError:
+            continue  # Removed since the directory was listed
+        entries.append({"name": name, "type": "file", "size": size})
+
+    return {
+        "success": True,
+        "directory": os.path.relpath(dir_path, root),
+        "entries": entries,
+        "total": len(listing),
+        "offset": offset,
+        "has_more": offset + limit < len(listing),
+    }
+
+
+class LineIndex:
+    """Sparse byte offsets of every `stride`-th line of a file
+
+    The index is built only as far as reads require and resumes from where
+    it stopped, so opening the first page of a huge file stays cheap.
+    """
+
+    def __init__(self, path, stride=1000):
+        self.path = path
+        self.stride = stride
+        self.checkpoints = [0]  # byte offset of line 0, stride, 2*stride, ...
+        self.scanned_lines = 0
+        self.scanned_bytes = 0
+        self.complete = False
+        self.lock = threading.Lock()
+
+    def offset_for(self, line):
+        """(line, byte offset) of the closest checkpoint at or before line"""
+        with self.lock:
+            self._extend(line)
+            index = min(line // self.stride, len(self.checkpoints) - 1)
+            return index * self.stride, self.checkpoints[index]
+
+    def total_lines(self, scan=False):
+        """Line count if known (or scan=True to finish the index)"""
+        with self.lock:
+            if scan:
+                self._extend(None)
+            return self.scanned_lines if self.complete else None
+
+    def _extend(self, target_line):
+        if self.complete or (target_line is not None and target_line < self.scanned_lines):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.scanned_bytes)
+            for raw in f:
+                self.scanned_lines += 1
+                self.scanned_bytes += len(raw)
+                if self.scanned_lines % self.stride == 0:
+                    self.checkpoints.append(self.scanned_bytes)
+                if target_line is not None and self.scanned_lines > target_line + self.stride:
+                    return
+            self.complete = True
+
+
+class FileViewer:
+    """Serves line ranges of files, caching one LineIndex per file version"""
+
+    def __init__(self, max_indexes=64, stride=1000):
+        self.max_indexes = max_indexes
+        self.stride = stride
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _index(self, path):
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = LineIndex(path, self.stride)
+                while len(self._indexes) > self.max_indexes:
+                    self._indexes.popitem(last=False)
+            self._indexes.move_to_end(key)
+            return index
+
+    def read_lines(self, path, start=0, count=200):
+        """Read lines [start, start + count) without loading the whole file"""
+        index = self._index(path)
+        line, offset = index.offset_for(start)
+        lines = []
+        has_more = False
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                if line >= start + count:
+                    has_more = True
+                    break
+                if line >= start:
+                    lines.append(raw.decode("utf-8", errors="replace"))
+                line += 1
+
+        return {
+            "success": True,
+            "text": "".join(lines),
+            "start": start,
+            "end": start + len(lines),
+            "total_lines": index.total_lines(),
+            "size": os.path.getsize(path),
+            "has_more": has_more,
+        }
@@ -0,0 +1,275 @@
+# Load generator for the Gradio app and the CLI
+#
+# Usage:
+#   python -m Agent.loadtest --target app --sessions 20 --iterations 5
+#   python -m Agent.loadtest --target cli --latency lognormal:-1,0.5
+#   python -m Agent.loadtest --target http --url http://127.0.0.1:7860
+#
+# The model is served by the replay backend unless --live is given, so runs
+# are repeatable and need no API key.
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+CHAT_PROMPTS = [
+    "Write a Python function to check prime numbers",
+    "Explain recursion with an example",
+    "Review this code: def add(a,b): return a+b",
+    "Create a REST API structure",
+]
+
+SCENARIO = ["chat", "save", "read", "list", "chat"]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class AppTarget:
+    """Calls the Gradio app's event handlers in-process, on a throwaway workspace"""
+
+    def __init__(self):
+        import App
+        self.app = App
+        self.workspace = tempfile.mkdtemp(prefix="agent-loadtest-")
+        App.WORKSPACE_DIR = self.workspace
+
+    def chat(self, session, message):
+        for _ in self.app.respond(message, dict(self.app.DEFAULT_SETTINGS), f"loadtest-{session}"):
+            pass
+
+    def save(self, session, path, content):
+        result = self.app.write_file(path, content)
+        if result.startswith("❌"):
+            raise RuntimeError(result)
+
+    def read(self, session, path):
+        _, _, info = self.app.view_page(path)
+        if info.startswith("❌"):
+            raise RuntimeError(info)
+
+    def list(self, session):
+        *_, label = self.app.browse(".")
+        if label.startswith("❌"):
+            raise RuntimeError(label)
+
+    def close(self):
+        shutil.rmtree(self.workspace, ignore_errors=True)
+
+
+class CliTarget:
+    """Runs REPL commands through main.handle_command, on a throwaway workspace"""
+
+    def __init__(self):
+        import main
+        self.main = main
+        self.workspace = tempfile.mkdtemp(prefix="agent-loadtest-")
+        main.fs.workspace_dir = self.workspace
+
+    def close(self):
+        shutil.rmtree(self.workspace, ignore_errors=True)
+
+    def chat(self, session, message):
+        self.main.handle_command(message)
+
+    def save(self, session, path, content):
+        self._check(self.main.fs.write_file(path, content))
+
+    def read(self, session, path):
+        self._check(self.main.fs.read_file(path))
+
+    def list(self, session):
+        self._check(self.main.fs.list_files("."))
+
+    @staticmethod
+    def _check(result):
+        if "error" in result:
+            raise RuntimeError(result["error"])
+
+
+class HttpTarget:
+    """Drives a running Gradio server through gradio_client (one client per session)"""
+
+    def __init__(self, url):
+        from gradio_client import Client
+        self.client_class = Client
+        self.url = url
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _client(self, session):
+        with self._lock:
+            if session not in self._clients:
+                self._clients[session] = self.client_class(self.url, verbose=False)
+            return self._clients[session]
+
+    def chat(self, session, message):
+        self._client(session).predict(message, api_name="/respond")
+
+    def save(self, session, path, content):
+        self._client(session).predict(path, content, api_name="/save_file")
+
+    def read(self, session, path):
+        self._client(session).predict(path, 200, api_name="/display_file")
+
+    def list(self, session):
+        self._client(session).predict(api_name="/update_file_list")
+
+    def close(self):
+        pass
+
+
+class LoadRun:
+    """Runs simulated sessions concurrently and collects per-operation timings"""
+
+    def __init__(self, target, sessions=10, iterations=3, think_time=0.0, seed=0):
+        self.target = target
+        self.sessions = sessions
+        self.iterations = iterations
+        self.think_time = think_time
+        self.seed = seed
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def run(self):
+        threads = [threading.Thread(target=self._session, args=(i,)) for i in range(self.sessions)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.report(time.perf_counter() - start)
+
+    def _session(self, session):
+        rng = random.Random(self.seed + session)
+        path = f"loadtest/session_{session}.py"
+        for iteration in range(self.iterations):
+            for op in SCENARIO:
+                if op == "chat":
+                    args = (rng.choice(CHAT_PROMPTS),)
+                elif op == "save":
+                    args = (path, f"def session_{session}_{iteration}():\n    return {iteration}\n")
+                elif op == "read":
+                    args = (path,)
+                else:
+                    args = ()
+                self._timed(op, session, args)
+                if self.think_time:
+                    time.sleep(rng.uniform(0, 2 * self.think_time))
+
+    def _timed(self, op, session, args):
+        start = time.perf_counter()
+        error = None
+        try:
+            getattr(self.target, op)(session, *args)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.samples.append((op, latency, error))
+
+    def report(self, elapsed):
+        ops = {}
+        for op, latency, error in self.samples:
+            entry = ops.setdefault(op, {"latencies": [], "errors": 0})
+            entry["latencies"].append(latency)
+            if error:
+                entry["errors"] += 1
+
+        def summarize(latencies, errors):
+            return {
+                "count": len(latencies),
+                "errors": errors,
+                "error_rate": errors / len(latencies) if latencies else 0.0,
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "max": max(latencies) if latencies else 0.0,
+            }
+
+        all_latencies = [latency for _, latency, _ in self.samples]
+        all_errors = sum(1 for _, _, error in self.samples if error)
+        return {
+            "sessions": self.sessions,
+            "iterations": self.iterations,
+            "elapsed": elapsed,
+            "throughput": len(self.samples) / elapsed if elapsed else 0.0,
+            "overall": summarize(all_latencies, all_errors),
+            "operations": {op: summarize(e["latencies"], e["errors"]) for op, e in sorted(ops.items())},
+            "sample_errors": sorted({error for _, _, error in self.samples if error})[:5],
+        }
+
+
+def format_report(report):
+    """Human-readable table for a load test report"""
+    lines = [
+        f"Sessions: {report['sessions']}  Iterations: {report['iterations']}  "
+        f"Elapsed: {report['elapsed']:.2f}s  Throughput: {report['throughput']:.1f} ops/s",
+        "-" * 72,
+        f"{'operation':12} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}",
+    ]
+    rows = list(report["operations"].items()) + [("overall", report["overall"])]
+    for op, stats in rows:
+        lines.append(
+            f"{op:12} {stats['count']:7} {stats['errors']:7} {stats['p50'] * 1000:9.1f} "
+            f"{stats['p95'] * 1000:9.1f} {stats['p99'] * 1000:9.1f} {stats['max'] * 1000:9.1f}"
+        )
+    for error in report["sample_errors"]:
+        lines.append(f"❌ {error}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the AI Coding Agent")
+    parser.add_argument("--target", choices=["app", "cli", "http"], default="app")
+    parser.add_argument("--url", default="http://127.0.0.1:7860", help="server URL for --target http")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--iterations", type=int, default=3, help="scenario repetitions per session")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between operations (s)")
+    parser.add_argument("--cassette", help="replay cassette (default: .agent/cassettes/default.jsonl)")
+    parser.add_argument("--latency", default="uniform:0.2,0.8", help="replay latency spec")
+    parser.add_argument("--live", action="store_true", help="call the real model instead of replaying")
+    parser.add_argument("--json", help="also write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    if not args.live:
+        os.environ["AGENT_BACKEND"] = "replay"
+        os.environ["AGENT_REPLAY_LATENCY"] = args.latency
+        os.environ.setdefault("AGENT_REPLAY_SEED", "0")
+        if args.cassette:
+            os.environ["AGENT_CASSETTE"] = args.cassette
+
+    # The app and CLI print on every call; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        if args.target == "app":
+            target = AppTarget()
+        elif args.target == "cli":
+            target = CliTarget()
+        else:
+            target = HttpTarget(args.url)
+        try:
+            report = LoadRun(target, args.sessions, args.iterations, args.think_time).run()
+        finally:
+            target.close()
+
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# Runs a task list as a dependency graph, several independent tasks at a time
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class PlanExecutor:
+    """Works through the open tasks of a TaskStore in dependency order
+
+    run_task(task, dependency_results) does the actual work and returns its
+    output; dependency_results maps each prerequisite's id to its stored
+    result. Every finished task is checkpointed in the store straight away,
+    so a crashed run can be resumed and only the unfinished tasks run again.
+
+    Tasks are leased to this executor and the leases renewed every
+    lease_ttl / 3 seconds while it runs, so a task is only recovered from
+    a runner that stopped renewing it, never from one still working on it.
+    """
+
+    def __init__(self, store, run_task, concurrency=4, on_event=None, lease_ttl=60.0):
+        self.store = store
+        self.run_task = run_task
+        self.concurrency = concurrency
+        self.on_event = on_event
+        self.lease_ttl = lease_ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+
+    def recover(self):
+        """Put tasks whose runner stopped renewing their lease back to pending"""
+        return self.store.release_stale(self.lease_ttl)
+
+    def run(self, task_ids=None, resume=True):
+        """Run pending tasks (all, or only task_ids) until none can make progress
+
+        Returns {"completed": [...], "failed": [...], "blocked": [...]}, where
+        blocked tasks are waiting on a failed or missing prerequisite.
+        """
+        if resume:
+            for task_id in self.recover():
+                self._emit("resumed", self.store.get(task_id))
+
+        deps = self.store.dependencies()
+        wanted = set(task_ids) if task_ids is not None else None
+        pending = {
+            task["id"]: task for task in self.store.list(status="pending")
+            if wanted is None or task["id"] in wanted
+        }
+        outcome = {"completed": [], "failed": [], "blocked": []}
+        running = {}
+
+        stopped = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(stopped,), daemon=True)
+        heartbeat.start()
+        try:
+            self._schedule(pending, deps, running, outcome)
+        finally:
+            stopped.set()
+            heartbeat.join()
+
+        outcome["blocked"] = sorted(pending)
+        return outcome
+
+    def _heartbeat(self, stopped):
+        while not stopped.wait(self.lease_ttl / 3):
+            self.store.renew(self.owner)
+
+    def _schedule(self, pending, deps, running, outcome):
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="plan") as pool:
+            while True:
+                for task_id, task in sorted(pending.items()):
+                    if len(running) >= self.concurrency:
+                        break
+                    if not self._ready(deps.get(task_id, ())):
+                        continue
+                    del pending[task_id]
+                    # Another agent may have claimed it since we listed the tasks
+                    claimed = self.store.lease(task_id, self.owner)
+                    if claimed:
+                        self._emit("started", claimed)
+                        running[pool.submit(self._execute, claimed, deps.get(task_id, ()))] = claimed
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    outcome["completed" if future.result() else "failed"].append(task["id"])
+
+    def _emit(self, event, task, detail=None):
+        # Workers report from their own threads; keep their output whole
+        if self.on_event:
+            with self._lock:
+                self.on_event(event, task, detail)
+
+    def _ready(self, prerequisites):
+        for task_id in prerequisites:
+            task = self.store.get(task_id)
+            if task is None or task["status"] != "completed":
+                return False
+        return True
+
+    def _execute(self, task, prerequisites):
+        results = {}
+        for task_id in prerequisites:
+            stored = self.store.result(task_id)
+            if stored and stored.get("result"):
+                results[task_id] = stored["result"]
+        try:
+            output = self.run_task(task, results)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            self.store.finish(task["id"], error=error, owner=self.owner)
+            self._emit("failed", task, error)
+            return False
+        if not self.store.finish(task["id"], result=output, owner=self.owner):
+            # The lease lapsed and someone else has the task now; their result wins
+            self._emit("failed", task, "lease lost before the task finished")
+            return False
+        self._emit("completed", task, output)
+        return True
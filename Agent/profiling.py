@@ -0,0 +1,166 @@
+# Per-command CPU and allocation profiling
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class CommandProfiler:
+    """Wraps commands in cProfile and/or tracemalloc and dumps hot spots
+
+    For every profiled command three files are written to output_dir:
+    a text report, <name>.cpu.folded and <name>.alloc.folded. The .folded
+    files use the collapsed-stack format ("a;b;c weight") read by
+    flamegraph.pl, speedscope and similar tools.
+    """
+
+    def __init__(self, output_dir, cpu=False, memory=False, top=10, frames=25):
+        self.output_dir = output_dir
+        self.cpu = cpu
+        self.memory = memory
+        self.top = top
+        self.frames = frames
+
+    @property
+    def enabled(self):
+        return self.cpu or self.memory
+
+    def enable(self, cpu=True, memory=False):
+        self.cpu = cpu
+        self.memory = memory
+
+    def disable(self):
+        self.cpu = False
+        self.memory = False
+
+    @contextmanager
+    def profile(self, name):
+        """Profile the enclosed block if profiling is enabled"""
+        if not self.enabled:
+            yield
+            return
+
+        profiler = cProfile.Profile() if self.cpu else None
+        started_tracemalloc = False
+        before = None
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                started_tracemalloc = True
+            before = tracemalloc.take_snapshot()
+
+        if profiler:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+            after = tracemalloc.take_snapshot() if self.memory else None
+            if started_tracemalloc:
+                tracemalloc.stop()
+            self._report(name, profiler, before, after)
+
+    def _report(self, name, profiler, before, after):
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}")
+        report = io.StringIO()
+
+        if profiler:
+            stats = pstats.Stats(profiler, stream=report)
+            report.write(f"=== CPU hot spots: {name} ===\n")
+            stats.sort_stats("cumulative").print_stats(self.top)
+            stats.sort_stats("tottime").print_stats(self.top)
+            with open(f"{prefix}.cpu.folded", "w", encoding="utf-8") as f:
+                f.writelines(f"{stack} {weight}\n" for stack, weight in collapsed_cpu_stacks(stats))
+
+            print(f"\n🔥 Top functions for '{name}' (cumulative):")
+            for func, cumulative in top_functions(stats, self.top):
+                print(f"  {cumulative * 1000:9.1f} ms  {func}")
+
+        if before is not None and after is not None:
+            diff = after.compare_to(before, "lineno")
+            report.write(f"\n=== Top allocation sites: {name} ===\n")
+            for stat in diff[:self.top]:
+                report.write(f"{stat}\n")
+            with open(f"{prefix}.alloc.folded", "w", encoding="utf-8") as f:
+                f.writelines(f"{stack} {size}\n" for stack, size in collapsed_alloc_stacks(after, before))
+
+            print(f"\n🧮 Top allocation sites for '{name}':")
+            for stat in diff[:5]:
+                frame = stat.traceback[0]
+                print(f"  {stat.size_diff / 1024:+9.1f} KB  {frame.filename}:{frame.lineno}")
+
+        with open(f"{prefix}.txt", "w", encoding="utf-8") as f:
+            f.write(report.getvalue())
+        print(f"📝 Profile written to {prefix}.*")
+
+
+def _label(func):
+    filename, lineno, funcname = func
+    if filename == "~":
+        return funcname  # Built-ins such as <built-in method ...>
+    return f"{funcname} ({os.path.basename(filename)}:{lineno})"
+
+
+def top_functions(stats, limit):
+    """(label, cumulative seconds) of the most expensive functions"""
+    entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+    return [(_label(func), data[3]) for func, data in entries[:limit]]
+
+
+def collapsed_cpu_stacks(stats, max_depth=64):
+    """Approximate collapsed stacks (microseconds) from cProfile caller data
+
+    cProfile only records caller/callee edges, so inclusive time is split
+    across the paths leading to a function in proportion to each edge.
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    roots = [func for func, data in stats.stats.items() if not data[4]]
+    folded = {}
+
+    def walk(func, path, inclusive):
+        _, _, tottime, cumtime, _ = stats.stats[func]
+        path = path + (func,)
+        if cumtime <= 0 or inclusive <= 0:
+            return
+        own = inclusive * min(1.0, tottime / cumtime)
+        key = ";".join(_label(f) for f in path)
+        folded[key] = folded.get(key, 0.0) + own
+        if len(path) >= max_depth:
+            return
+        for callee, edge_time in callees.get(func, ()):
+            if callee not in path:
+                walk(callee, path, inclusive * edge_time / cumtime)
+
+    for root in roots:
+        walk(root, (), stats.stats[root][3])
+
+    return sorted(
+        ((stack, int(seconds * 1_000_000)) for stack, seconds in folded.items() if seconds >= 1e-6),
+        key=lambda item: item[0],
+    )
+
+
+def collapsed_alloc_stacks(after, before=None):
+    """Collapsed stacks (bytes) of memory still allocated at the end of a command"""
+    if before is not None:
+        stats = after.compare_to(before, "traceback")
+        entries = [(stat.traceback, stat.size_diff) for stat in stats if stat.size_diff > 0]
+    else:
+        entries = [(stat.traceback, stat.size) for stat in after.statistics("traceback")]
+
+    folded = {}
+    for traceback, size in entries:
+        # tracemalloc lists the most recent frame first; flame graphs want root first
+        frames = [f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in reversed(traceback)]
+        key = ";".join(frames)
+        folded[key] = folded.get(key, 0) + size
+    return sorted(folded.items())
@@ -0,0 +1,259 @@
+# Incremental code review: per-symbol findings cached by the symbol's source
+#
+# A file is split into review units (top-level functions, class methods, each
+# class's skeleton and the remaining module-level code). Findings are stored
+# per unit under a hash of its source, so re-reviewing a file only sends the
+# units that changed, plus an outline of the rest.
+import ast
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Bump when the prompt or finding format changes, so old findings are not reused
+FORMAT_VERSION = "1"
+
+FINDINGS_TASK = """Review the code below for security issues, bugs, performance problems and code smells.
+Lines are prefixed with their line numbers in the file. The outline lists every symbol in the file;
+only the symbols whose code is included need reviewing.
+
+Answer with one JSON object per line and nothing else:
+{"symbol": "<symbol from the outline>", "line": <line number>, "severity": "high|medium|low", "message": "<problem and fix>"}
+Answer with the single line {"none": true} if you find no problems.
+
+Outline:
+"""
+
+SEVERITY_ORDER = {"high": 0, "medium": 1, "low": 2}
+
+
+class ReviewUnit:
+    """A reviewable piece of a file: its symbol name, lines and text"""
+
+    def __init__(self, symbol, lines, text):
+        self.symbol = symbol
+        self.lines = lines  # absolute line number of each line of text
+        self.text = text
+        digest = hashlib.sha256(f"{FORMAT_VERSION}\0{symbol}\0{text}".encode("utf-8"))
+        self.hash = digest.hexdigest()
+
+    @property
+    def span(self):
+        return self.lines[0], self.lines[-1]
+
+    def numbered(self):
+        return "\n".join(f"{number:5} | {line}" for number, line in zip(self.lines, self.text.split("\n")))
+
+
+def review_units(source):
+    """Split Python source into ReviewUnits (raises SyntaxError)"""
+    tree = ast.parse(source)
+    lines = source.split("\n")
+    covered = set()
+    units = []
+
+    def first_line(node):
+        return min([node.lineno] + [d.lineno for d in node.decorator_list])
+
+    def make_unit(symbol, numbers):
+        return ReviewUnit(symbol, numbers, "\n".join(lines[n - 1] for n in numbers))
+
+    defs = (ast.FunctionDef, ast.AsyncFunctionDef)
+    for node in tree.body:
+        if isinstance(node, defs):
+            numbers = list(range(first_line(node), node.end_lineno + 1))
+            units.append(make_unit(node.name, numbers))
+            covered.update(numbers)
+        elif isinstance(node, ast.ClassDef):
+            class_lines = list(range(first_line(node), node.end_lineno + 1))
+            covered.update(class_lines)
+            method_lines = set()
+            for child in node.body:
+                if isinstance(child, defs):
+                    numbers = list(range(first_line(child), child.end_lineno + 1))
+                    units.append(make_unit(f"{node.name}.{child.name}", numbers))
+                    # The class skeleton keeps each method's signature line
+                    method_lines.update(numbers[numbers.index(child.lineno) + 1:])
+            skeleton = [n for n in class_lines if n not in method_lines and lines[n - 1].strip()]
+            units.append(make_unit(node.name, skeleton))
+
+    module_lines = [n for n in range(1, len(lines) + 1) if n not in covered and lines[n - 1].strip()]
+    if module_lines:
+        units.append(make_unit("<module>", module_lines))
+    units.sort(key=lambda unit: unit.span[0])
+    return units
+
+
+def parse_findings(text, units):
+    """(findings grouped by unit symbol, whether the reply used the format)
+
+    Findings naming an unknown symbol are attached to the unit containing
+    their line. Lines that are not JSON objects are ignored; a reply with
+    neither a finding nor {"none": true} did not follow the format, and
+    its empty result must not be taken as "no issues".
+    """
+    by_symbol = {unit.symbol: unit for unit in units}
+    grouped = {}
+    answered = False
+    for raw in text.splitlines():
+        match = re.search(r"\{.*\}", raw)
+        if not match:
+            continue
+        try:
+            finding = json.loads(match.group(0))
+        except ValueError:
+            continue
+        if not isinstance(finding, dict):
+            continue
+        if finding.get("none") is True:
+            answered = True
+            continue
+        if not finding.get("message"):
+            continue
+
+        try:
+            line = int(finding.get("line") or 0)
+        except (TypeError, ValueError):
+            line = 0
+        unit = by_symbol.get(finding.get("symbol"))
+        if unit is None:
+            # The innermost unit holding that line (a method rather than its class)
+            holders = [u for u in units if line in u.lines] or [u for u in units if u.span[0] <= line <= u.span[1]]
+            unit = min(holders, key=lambda u: u.span[1] - u.span[0], default=None)
+        if unit is None:
+            continue
+
+        answered = True
+        severity = str(finding.get("severity", "medium")).lower()
+        grouped.setdefault(unit.symbol, []).append({
+            "offset": _offset(unit, line),
+            "severity": severity if severity in SEVERITY_ORDER else "medium",
+            "message": str(finding["message"]).strip(),
+        })
+    return grouped, answered
+
+
+def _offset(unit, line):
+    """Index of the unit line at (or just before) an absolute line number"""
+    offset = 0
+    for index, number in enumerate(unit.lines):
+        if number <= line:
+            offset = index
+    return offset
+
+
+class FindingsCache:
+    """Findings per review unit hash, in SQLite"""
+
+    def __init__(self, path, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS findings (unit_hash TEXT PRIMARY KEY, symbol TEXT, "
+            "findings TEXT NOT NULL, created REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def get_many(self, hashes):
+        """{unit hash: findings} for the hashes that are cached"""
+        if not hashes:
+            return {}
+        rows = self._connection().execute(
+            f"SELECT unit_hash, findings FROM findings WHERE unit_hash IN ({', '.join('?' * len(hashes))})",
+            list(hashes),
+        )
+        return {unit_hash: json.loads(findings) for unit_hash, findings in rows}
+
+    def put_many(self, entries):
+        """Store [(unit, findings), ...]"""
+        now = time.time()
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "INSERT OR REPLACE INTO findings (unit_hash, symbol, findings, created) VALUES (?, ?, ?, ?)",
+                [(unit.hash, unit.symbol, json.dumps(findings), now) for unit, findings in entries],
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+
+class IncrementalReviewer:
+    """Reviews only the parts of a file whose findings are not cached
+
+    ask(task, context) sends one review request and returns the model's text.
+    Findings are only cached when the reply followed the findings format;
+    otherwise the reply is returned as "reply" for the caller to show as is.
+    """
+
+    def __init__(self, cache, ask):
+        self.cache = cache
+        self.ask = ask
+
+    def review(self, source):
+        units = review_units(source)
+        cached = self.cache.get_many([unit.hash for unit in units])
+        changed = [unit for unit in units if unit.hash not in cached]
+
+        chars_sent = 0
+        reply = None
+        if changed:
+            outline = "\n".join(
+                f"- {unit.symbol} (lines {unit.span[0]}-{unit.span[1]})"
+                + ("" if unit in changed else " [unchanged, not included]")
+                for unit in units
+            )
+            code = "\n\n".join(f"# --- {unit.symbol} ---\n{unit.numbered()}" for unit in changed)
+            chars_sent = sum(len(unit.text) for unit in changed)
+            text = self.ask(FINDINGS_TASK + outline, code)
+            grouped, answered = parse_findings(text, changed)
+            if answered:
+                fresh = [(unit, grouped.get(unit.symbol, [])) for unit in changed]
+                self.cache.put_many(fresh)
+                cached.update({unit.hash: findings for unit, findings in fresh})
+            else:
+                reply = text
+
+        findings = []
+        for unit in units:
+            for finding in cached.get(unit.hash, ()):
+                findings.append({
+                    "symbol": unit.symbol,
+                    "line": unit.lines[min(finding["offset"], len(unit.lines) - 1)],
+                    "severity": finding["severity"],
+                    "message": finding["message"],
+                })
+        findings.sort(key=lambda f: (SEVERITY_ORDER[f["severity"]], f["line"]))
+        return {
+            "findings": findings,
+            "reviewed": [unit.symbol for unit in changed],
+            "reused": [unit.symbol for unit in units if unit not in changed],
+            "chars_sent": chars_sent,
+            "chars_total": len(source),
+            "reply": reply,
+        }
+
+
+def format_findings(findings, path=None):
+    """Findings as text, one per line with file:line references"""
+    if not findings:
+        return "No issues found."
+    icons = {"high": "🔴", "medium": "🟠", "low": "🟡"}
+    prefix = f"{path}:" if path else "line "
+    return "\n".join(
+        f"{icons[f['severity']]} {prefix}{f['line']} [{f['symbol']}] {f['message']}" for f in findings
+    )
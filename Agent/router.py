@@ -0,0 +1,196 @@
+# Model routing for the coding agent
+import json
+import os
+import threading
+import time
+from collections import deque
+
+FLAGSHIP_MODEL = "command-a-03-2025"
+STANDARD_MODEL = "command-r-08-2024"
+FAST_MODEL = "command-r7b-12-2024"
+
+# USD per 1M tokens (input, output)
+MODEL_COSTS = {
+    FLAGSHIP_MODEL: (2.50, 10.00),
+    STANDARD_MODEL: (0.15, 0.60),
+    FAST_MODEL: (0.0375, 0.15),
+}
+
+QUALITY_LEVELS = ("low", "normal", "high")
+
+# Rules are checked in order, the first match wins.
+# Any field left out of a rule matches everything.
+DEFAULT_RULES = [
+    {
+        "name": "high-quality",
+        "quality": ["high"],
+        "model": FLAGSHIP_MODEL,
+    },
+    {
+        "name": "trivial",
+        "task_types": ["simple", "test"],
+        "model": FAST_MODEL,
+        "fallbacks": [STANDARD_MODEL],
+    },
+    {
+        "name": "small-review",
+        "task_types": ["review"],
+        "personas": ["reviewer"],
+        "max_prompt_chars": 6000,
+        "model": STANDARD_MODEL,
+    },
+    {
+        "name": "small-chat",
+        "task_types": ["chat"],
+        "max_prompt_chars": 4000,
+        "quality": ["low", "normal"],
+        "model": STANDARD_MODEL,
+    },
+]
+
+
+class Route:
+    """Models chosen for a single request, in the order they should be tried"""
+
+    def __init__(self, rule, models, task_type, persona, prompt_chars):
+        self.rule = rule
+        self.models = models
+        self.task_type = task_type
+        self.persona = persona
+        self.prompt_chars = prompt_chars
+
+    def __iter__(self):
+        return iter(self.models)
+
+    def __repr__(self):
+        return f"Route(rule={self.rule!r}, models={self.models!r})"
+
+
+class ModelRouter:
+    """Picks a model per request from configurable rules and tracks savings"""
+
+    def __init__(self, rules=None, default_model=FLAGSHIP_MODEL, costs=None, log_size=200):
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+        self.default_model = default_model
+        self.costs = dict(MODEL_COSTS)
+        self.costs.update(costs or {})
+        self.log = deque(maxlen=log_size)
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path=None):
+        """Load routing rules from a JSON file (AGENT_ROUTER_CONFIG), falling back to defaults"""
+        path = path or os.getenv("AGENT_ROUTER_CONFIG")
+        if not path or not os.path.exists(path):
+            return cls()
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not load router config {path}: {e}")
+            return cls()
+
+        costs = {model: tuple(price) for model, price in config.get("costs", {}).items()}
+        return cls(
+            rules=config.get("rules"),
+            default_model=config.get("default_model", FLAGSHIP_MODEL),
+            costs=costs,
+        )
+
+    def route(self, task_type="chat", persona="coder", prompt_chars=0, quality="normal"):
+        """Return the ordered list of models to try for a request"""
+        if quality not in QUALITY_LEVELS:
+            quality = "normal"
+
+        for rule in self.rules:
+            if self._matches(rule, task_type, persona, prompt_chars, quality):
+                models = [rule.get("model", self.default_model)]
+                models += rule.get("fallbacks", [])
+                models.append(self.default_model)
+                return Route(rule.get("name", "rule"), self._dedupe(models), task_type, persona, prompt_chars)
+
+        return Route("default", [self.default_model], task_type, persona, prompt_chars)
+
+    def record(self, route, model, latency, usage=None, error=None):
+        """Log the outcome of one model call made for a route"""
+        usage = usage or {}
+        cost = self.estimate_cost(model, usage)
+        baseline = self.estimate_cost(self.default_model, usage)
+        entry = {
+            "time": time.time(),
+            "rule": route.rule,
+            "task_type": route.task_type,
+            "persona": route.persona,
+            "model": model,
+            "latency": latency,
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "cost": cost,
+            "saved": 0.0 if error else baseline - cost,
+            "error": str(error) if error else None,
+        }
+
+        with self._lock:
+            self.log.append(entry)
+            totals = self.totals.setdefault(model, {
+                "calls": 0, "errors": 0, "latency": 0.0, "cost": 0.0, "saved": 0.0
+            })
+            totals["calls"] += 1
+            totals["latency"] += latency
+            totals["cost"] += cost
+            totals["saved"] += entry["saved"]
+            if error:
+                totals["errors"] += 1
+
+        return entry
+
+    def estimate_cost(self, model, usage):
+        """Estimate the USD cost of a call from its token usage"""
+        input_price, output_price = self.costs.get(model, self.costs.get(self.default_model, (0.0, 0.0)))
+        return (
+            usage.get("input_tokens", 0) * input_price
+            + usage.get("output_tokens", 0) * output_price
+        ) / 1_000_000
+
+    def summary(self):
+        """Per-model call counts, average latency, cost and savings"""
+        with self._lock:
+            models = {}
+            for model, totals in self.totals.items():
+                calls = totals["calls"]
+                models[model] = {
+                    "calls": calls,
+                    "errors": totals["errors"],
+                    "avg_latency": totals["latency"] / calls if calls else 0.0,
+                    "cost": totals["cost"],
+                    "saved": totals["saved"],
+                }
+            return {
+                "models": models,
+                "total_cost": sum(m["cost"] for m in models.values()),
+                "total_saved": sum(m["saved"] for m in models.values()),
+                "recent": list(self.log)[-10:],
+            }
+
+    def _matches(self, rule, task_type, persona, prompt_chars, quality):
+        if "task_types" in rule and task_type not in rule["task_types"]:
+            return False
+        if "personas" in rule and persona not in rule["personas"]:
+            return False
+        if "quality" in rule and quality not in rule["quality"]:
+            return False
+        if "max_prompt_chars" in rule and prompt_chars > rule["max_prompt_chars"]:
+            return False
+        if "min_prompt_chars" in rule and prompt_chars < rule["min_prompt_chars"]:
+            return False
+        return True
+
+    @staticmethod
+    def _dedupe(models):
+        seen = []
+        for model in models:
+            if model not in seen:
+                seen.append(model)
+        return seen
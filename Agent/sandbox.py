@@ -0,0 +1,295 @@
+# Warm sandbox pool for running workspace code
+#
+# A few long-lived "zygote" interpreters (python -m Agent.sandbox) import the
+# usual modules once and then fork a fresh child per job. Forking a warm
+# interpreter takes about a millisecond, versus tens of milliseconds to start
+# Python. Each child gets CPU, memory and file-size limits, a wall-clock
+# timeout, its own process group and no API keys in its environment.
+#
+# This limits runaway code; it is not an isolation boundary. The child runs
+# as the same user with the same filesystem view, so it can still read
+# files such as ../.env. Only run code you would run yourself.
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: jobs run as plain subprocesses without rlimits
+    resource = None
+
+FORK_AVAILABLE = hasattr(os, "fork") and resource is not None
+
+PRELOAD = (
+    "json", "re", "math", "typing", "collections", "dataclasses", "itertools", "functools",
+    "datetime", "pathlib", "unittest", "doctest", "pytest",
+)
+
+# Environment variables never passed on to sandboxed code
+_SECRET_MARKERS = ("KEY", "TOKEN", "SECRET", "PASSWORD")
+
+_PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sandbox_env():
+    env = {k: v for k, v in os.environ.items() if not any(m in k.upper() for m in _SECRET_MARKERS)}
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+class SandboxPool:
+    """Runs Python files or modules in isolated, resource-limited processes
+
+    run() blocks until a zygote is free, so at most `workers` jobs run at
+    once. Zygotes start on first use (or on start()) and are replaced if
+    one dies.
+    """
+
+    def __init__(self, workers=2, cpu_seconds=10, memory_mb=512, timeout=30, max_output=64 * 1024):
+        self.workers = workers
+        self.limits = {
+            "cpu_seconds": cpu_seconds,
+            "memory_mb": memory_mb,
+            "timeout": timeout,
+            "max_output": max_output,
+        }
+        self._idle = queue.Queue()
+        self._started = False
+        self._lock = threading.Lock()
+        self.stats = {"jobs": 0, "timeouts": 0, "respawns": 0}
+
+    def start(self):
+        with self._lock:
+            if self._started or not FORK_AVAILABLE:
+                return
+            for _ in range(self.workers):
+                self._idle.put(self._spawn())
+            self._started = True
+
+    def _spawn(self):
+        return subprocess.Popen(
+            [sys.executable, "-m", "Agent.sandbox"],
+            cwd=_PACKAGE_ROOT,
+            env=sandbox_env(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def run(self, path=None, module=None, args=(), cwd=None, timeout=None):
+        """Run a file (path) or module (python -m module) with args
+
+        Returns {"success", "exit_code", "stdout", "stderr", "duration",
+        "timed_out", "truncated"}; success means exit code 0.
+        """
+        job = dict(self.limits, path=path, module=module, args=list(args),
+                   cwd=cwd or os.getcwd(), timeout=timeout or self.limits["timeout"])
+        self._count("jobs")
+        if not FORK_AVAILABLE:
+            result = _run_subprocess(job)
+        else:
+            self.start()
+            zygote = self._idle.get()
+            try:
+                zygote.stdin.write(json.dumps(job).encode("utf-8") + b"\n")
+                zygote.stdin.flush()
+                line = zygote.stdout.readline()
+                if not line:
+                    raise BrokenPipeError("sandbox worker exited")
+                result = json.loads(line)
+            except (OSError, ValueError):
+                zygote.kill()
+                zygote = self._spawn()
+                self._count("respawns")
+                result = _run_subprocess(job)
+            finally:
+                self._idle.put(zygote)
+        if result["timed_out"]:
+            self._count("timeouts")
+        return result
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def close(self):
+        with self._lock:
+            while not self._idle.empty():
+                zygote = self._idle.get()
+                zygote.stdin.close()
+                zygote.wait(timeout=5)
+            self._started = False
+
+
+def _result(exit_code, stdout, stderr, duration, timed_out=False, truncated=False):
+    return {
+        "success": exit_code == 0 and not timed_out,
+        "exit_code": exit_code,
+        "stdout": stdout,
+        "stderr": stderr,
+        "duration": duration,
+        "timed_out": timed_out,
+        "truncated": truncated,
+    }
+
+
+def _run_subprocess(job):
+    """Fallback without a warm zygote: a fresh interpreter, timeout only"""
+    command = [sys.executable] + (["-m", job["module"]] if job["module"] else [job["path"]]) + job["args"]
+    start = time.perf_counter()
+    try:
+        completed = subprocess.run(command, cwd=job["cwd"], env=sandbox_env(), capture_output=True,
+                                   stdin=subprocess.DEVNULL, timeout=job["timeout"])
+    except subprocess.TimeoutExpired as e:
+        return _result(None, _decode(e.stdout or b"", job), _decode(e.stderr or b"", job),
+                       time.perf_counter() - start, timed_out=True)
+    return _result(completed.returncode, _decode(completed.stdout, job), _decode(completed.stderr, job),
+                   time.perf_counter() - start, truncated=max(len(completed.stdout), len(completed.stderr)) > job["max_output"])
+
+
+def _decode(data, job):
+    return data[:job["max_output"]].decode("utf-8", errors="replace")
+
+
+# ===== Zygote side (python -m Agent.sandbox) =====
+
+def _run_job(job):
+    """Fork a child for the job, collect its output and enforce the timeout"""
+    import select
+    import signal
+
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(out_r)
+        os.close(err_r)
+        _child(job, out_w, err_w)  # never returns
+
+    os.close(out_w)
+    os.close(err_w)
+    buffers = {out_r: bytearray(), err_r: bytearray()}
+    open_fds = [out_r, err_r]
+    deadline = start + job["timeout"]
+    truncated = timed_out = False
+    while open_fds:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            timed_out = True
+            break
+        ready, _, _ = select.select(open_fds, [], [], remaining)
+        for fd in ready:
+            data = os.read(fd, 65536)
+            if not data:
+                open_fds.remove(fd)
+                continue
+            room = job["max_output"] - len(buffers[fd])
+            if len(data) > room:
+                truncated = True
+            buffers[fd].extend(data[:max(room, 0)])
+
+    # A child can close its output and keep running: the deadline still applies
+    status = None
+    pause = 0.0005
+    while not timed_out:
+        waited, status = os.waitpid(pid, os.WNOHANG)
+        if waited:
+            break
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            timed_out = True
+            break
+        time.sleep(min(pause, remaining))
+        pause = min(pause * 2, 0.05)
+
+    if timed_out:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            os.kill(pid, signal.SIGKILL)  # Killed before it could call setsid()
+        _, status = os.waitpid(pid, 0)
+    for fd in (out_r, err_r):
+        os.close(fd)
+
+    exit_code = os.waitstatus_to_exitcode(status)
+    stderr = buffers[err_r].decode("utf-8", errors="replace")
+    if exit_code < 0 and not timed_out:
+        name = signal.Signals(-exit_code).name
+        hint = " (CPU limit)" if name == "SIGXCPU" else ""
+        stderr += f"\nKilled by {name}{hint}"
+    return _result(exit_code, buffers[out_r].decode("utf-8", errors="replace"), stderr,
+                   time.perf_counter() - start, timed_out, truncated)
+
+
+def _child(job, out_w, err_w):
+    """Runs in the forked child: isolate, limit, run the code, exit"""
+    exit_code = 1
+    try:
+        os.setsid()  # own process group, so a timeout kills anything it spawns
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(out_w, 1)
+        os.dup2(err_w, 2)
+
+        cpu = job["cpu_seconds"]
+        memory = job["memory_mb"] * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (64 * 1024 * 1024,) * 2)
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+        import runpy
+        import traceback
+
+        os.chdir(job["cwd"])
+        try:
+            if job["module"]:
+                sys.argv = [job["module"]] + job["args"]
+                sys.path.insert(0, job["cwd"])
+                runpy.run_module(job["module"], run_name="__main__", alter_sys=True)
+            else:
+                sys.argv = [job["path"]] + job["args"]
+                sys.path.insert(0, os.path.dirname(os.path.abspath(job["path"])))
+                runpy.run_path(job["path"], run_name="__main__")
+            exit_code = 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                exit_code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+        except BaseException:
+            traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+
+def _zygote_main():
+    for name in PRELOAD:
+        try:
+            __import__(name)
+        except Exception:
+            pass
+
+    control_in = sys.stdin.buffer
+    control_out = sys.stdout.buffer
+    for line in control_in:
+        job = json.loads(line)
+        try:
+            result = _run_job(job)
+        except Exception as e:
+            result = _result(None, "", f"Sandbox error: {e}", 0.0)
+        control_out.write(json.dumps(result).encode("utf-8") + b"\n")
+        control_out.flush()
+
+
+if __name__ == "__main__":
+    _zygote_main()
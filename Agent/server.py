@@ -0,0 +1,281 @@
+# Headless asyncio HTTP/JSON API for the agent
+#
+#   GET  /health
+#   GET  /list?dir=.            POST /list      {"dir": "."}
+#   GET  /read?file=a.py        POST /read      {"file": "a.py"}
+#   GET  /analyze?file=a.py     POST /analyze   {"file": "a.py"}
+#   POST /chat    {"message": "...", "persona": "coder", "temperature": 0.2, "stream": true}
+#   POST /review  {"target": "a.py", "stream": true}
+#   POST /edit    {"file": "a.py", "instructions": "..."}
+#
+# Only read-only operations accept GET. Everything else must be a POST with
+# Content-Type: application/json, which a web page can only send to another
+# origin after a CORS preflight this server never approves; requests with a
+# foreign Origin header are refused outright. If a token is configured,
+# every request but /health needs "Authorization: Bearer <token>".
+#
+# Streaming requests ("stream": true or Accept: text/event-stream) answer with
+# server-sent events: one `data: {"text": ...}` event per chunk, then `event: done`.
+import asyncio
+import hmac
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 415: "Unsupported Media Type",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+_DONE = object()
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class AgentServer:
+    """Serves agent operations over HTTP from a bounded worker pool
+
+    operations maps a name to fn(params) -> dict; streams maps a name to
+    fn(params) -> iterator of text chunks. required maps a name to the
+    parameters it cannot run without; read_only names the operations that
+    may be called with GET. Blocking work runs on `workers` threads; at
+    most `workers + queue_size` requests are admitted at once and the rest
+    are rejected with 503 so the process never over-commits.
+    """
+
+    def __init__(self, operations, streams=None, workers=8, queue_size=64, max_body=4 * 1024 * 1024,
+                 required=None, read_only=(), token=None):
+        self.operations = operations
+        self.streams = streams or {}
+        self.required = required or {}
+        self.read_only = set(read_only)
+        self.token = token
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.max_body = max_body
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agent-worker")
+        self.active = 0
+        self.stats = {"requests": 0, "rejected": 0, "errors": 0}
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+        print(f"🌐 Agent API listening on {addresses} ({self.workers} workers)")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                keep_alive = await self._dispatch(request, writer)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HttpError as e:
+            await self._send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > self.max_body:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+
+        url = urlsplit(target)
+        keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+        return {
+            "method": method.upper(),
+            "path": url.path.rstrip("/") or "/",
+            "query": dict(parse_qsl(url.query)),
+            "headers": headers,
+            "body": body,
+            "keep_alive": keep_alive,
+        }
+
+    async def _dispatch(self, request, writer):
+        keep_alive = request["keep_alive"]
+        self.stats["requests"] += 1
+        name = request["path"].lstrip("/")
+
+        if name == "health":
+            await self._send_json(writer, 200, {"status": "ok", "active": self.active, **self.stats}, keep_alive)
+            return keep_alive
+
+        if name not in self.operations and name not in self.streams:
+            await self._send_json(writer, 404, {"error": f"Unknown endpoint: /{name}"}, keep_alive)
+            return keep_alive
+
+        refusal = self._check_request(request, name)
+        if refusal:
+            await self._send_json(writer, refusal[0], {"error": refusal[1]}, keep_alive)
+            return keep_alive
+
+        try:
+            params = dict(request["query"]) if request["method"] == "GET" else {}
+            if request["body"]:
+                body = json.loads(request["body"])
+                if not isinstance(body, dict):
+                    raise ValueError("not an object")
+                params.update(body)
+        except ValueError:
+            await self._send_json(writer, 400, {"error": "Body must be a JSON object"}, keep_alive)
+            return keep_alive
+
+        missing = [key for key in self.required.get(name, ()) if key not in params]
+        if missing:
+            await self._send_json(writer, 400, {"error": f"Missing parameter: {', '.join(missing)}"}, keep_alive)
+            return keep_alive
+
+        if self.active >= self.capacity:
+            self.stats["rejected"] += 1
+            await self._send_json(writer, 503, {"error": "Server busy, retry later"}, keep_alive)
+            return keep_alive
+
+        wants_stream = (
+            str(params.pop("stream", "")).lower() in ("1", "true")
+            or "text/event-stream" in request["headers"].get("accept", "")
+        )
+
+        self.active += 1
+        try:
+            if wants_stream and name in self.streams:
+                await self._stream(writer, self.streams[name], params)
+                return False
+            status, payload = await self._run(self.operations.get(name), params)
+            await self._send_json(writer, status, payload, keep_alive)
+            return keep_alive
+        finally:
+            self.active -= 1
+
+    def _check_request(self, request, name):
+        """(status, reason) if the request may not call this operation, else None"""
+        headers = request["headers"]
+        if self.token:
+            scheme, _, token = headers.get("authorization", "").partition(" ")
+            if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip(), self.token):
+                return 401, "Missing or invalid bearer token"
+
+        origin = headers.get("origin")
+        if origin and urlsplit(origin).netloc != headers.get("host"):
+            return 403, f"Cross-origin requests are not allowed ({origin})"
+
+        if request["method"] == "GET":
+            if name in self.read_only:
+                return None
+            return 405, f"/{name} changes state or calls the model; use POST with a JSON body"
+        if request["method"] != "POST":
+            return 405, "Use GET or POST"
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            return 415, "POST bodies must be sent as Content-Type: application/json"
+        return None
+
+    async def _run(self, operation, params):
+        if operation is None:
+            return 400, {"error": "This endpoint only supports streaming"}
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self.executor, operation, params)
+        except Exception as e:
+            self.stats["errors"] += 1
+            return 500, {"error": str(e)}
+        return (400 if isinstance(result, dict) and "error" in result else 200), result
+
+    async def _stream(self, writer, stream, params):
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def produce():
+            try:
+                for chunk in stream(params):
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+            except Exception as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(chunks.put_nowait, _DONE)
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n"
+        )
+        await writer.drain()
+        loop.run_in_executor(self.executor, produce)
+
+        try:
+            while True:
+                item = await chunks.get()
+                if item is _DONE:
+                    writer.write(b"event: done\ndata: {}\n\n")
+                    break
+                if isinstance(item, Exception):
+                    self.stats["errors"] += 1
+                    error = json.dumps({"error": str(item)})
+                    writer.write(f"event: error\ndata: {error}\n\n".encode("utf-8"))
+                    continue
+                writer.write(f"data: {json.dumps({'text': item})}\n\n".encode("utf-8"))
+                await writer.drain()
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            # Client went away or stream ended: stop the producer at its next chunk
+            cancelled.set()
+
+    async def _send_json(self, writer, status, payload, keep_alive=True):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+def run_server(operations, streams=None, host="127.0.0.1", port=8765, workers=8, queue_size=64,
+               required=None, read_only=(), token=None):
+    """Block serving the API until interrupted"""
+    server = AgentServer(operations, streams, workers=workers, queue_size=queue_size,
+                         required=required, read_only=read_only, token=token)
+    try:
+        asyncio.run(server.serve(host, port))
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped")
+    finally:
+        server.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,115 @@
+# Server-side chat sessions with bounded history
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+def _gist(text, limit):
+    """First line or sentence of text, cut to limit characters"""
+    first = text.strip().split("\n", 1)[0]
+    for stop in (". ", "? ", "! "):
+        if stop in first:
+            first = first.split(stop, 1)[0] + stop.strip()
+            break
+    return first if len(first) <= limit else first[:limit - 1] + "…"
+
+
+class ChatSession:
+    """One browser session's conversation"""
+
+    def __init__(self, session_id, visible_turns):
+        self.id = session_id
+        self.turns = []
+        self.display = deque(maxlen=visible_turns)
+        self.summary = []
+        self.last_active = time.monotonic()
+        self.lock = threading.Lock()
+
+    def tokens(self):
+        summary = sum(estimate_tokens(line) for line in self.summary)
+        return summary + sum(estimate_tokens(user) + estimate_tokens(bot) for user, bot in self.turns)
+
+
+class SessionStore:
+    """Keeps chat history on the server, keyed by session id
+
+    Each session's history is kept within token_budget: the oldest turns
+    are folded into a short extractive summary, and the summary itself is
+    capped at summary_lines. Idle sessions expire after ttl seconds and at
+    most max_sessions are kept (least recently used are dropped first).
+    """
+
+    def __init__(self, token_budget=3000, visible_turns=20, summary_lines=20,
+                 max_sessions=1000, ttl=3600):
+        self.token_budget = token_budget
+        self.visible_turns = visible_turns
+        self.summary_lines = summary_lines
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """Return the session, creating it if needed"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                self._expire()
+                session = self._sessions[session_id] = ChatSession(session_id, self.visible_turns)
+            self._sessions.move_to_end(session_id)
+            session.last_active = time.monotonic()
+            return session
+
+    def append(self, session_id, user_message, bot_message):
+        """Add a finished turn and compact the history to the token budget"""
+        session = self.get(session_id)
+        with session.lock:
+            session.turns.append((user_message, bot_message))
+            session.display.append((user_message, bot_message))
+            self._compact(session)
+
+    def context(self, session_id):
+        """Summary plus recent turns, formatted for the model prompt"""
+        session = self.get(session_id)
+        with session.lock:
+            parts = []
+            if session.summary:
+                parts.append("Earlier in this conversation:\n" + "\n".join(session.summary))
+            for user_message, bot_message in session.turns:
+                parts.append(f"User: {user_message}\nAssistant: {bot_message}")
+            return "\n\n".join(parts)
+
+    def view(self, session_id, pending=None):
+        """Turns to display, bounded to the most recent visible_turns"""
+        session = self.get(session_id)
+        with session.lock:
+            turns = list(session.display)
+        if pending is not None:
+            turns = turns[-(self.visible_turns - 1):] + [pending] if self.visible_turns > 1 else [pending]
+        return turns
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def _compact(self, session):
+        while len(session.turns) > 1 and session.tokens() > self.token_budget:
+            user_message, bot_message = session.turns.pop(0)
+            session.summary.append(f"- Asked: {_gist(user_message, 120)} → {_gist(bot_message, 160)}")
+        del session.summary[:-self.summary_lines]
+
+    def _expire(self):
+        now = time.monotonic()
+        for session_id in [sid for sid, s in self._sessions.items() if now - s.last_active > self.ttl]:
+            del self._sessions[session_id]
+        while len(self._sessions) >= self.max_sessions:
+            self._sessions.popitem(last=False)
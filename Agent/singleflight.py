@@ -0,0 +1,127 @@
+# Request coalescing for identical in-flight agent calls
+import hashlib
+import threading
+
+
+def request_key(model, persona, prompt, options=None):
+    """Hash identifying a request by model, persona, prompt and call options"""
+    digest = hashlib.sha256()
+    for part in (model, persona, prompt, sorted((options or {}).items())):
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class _Call:
+    """A blocking call shared by every caller with the same key"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Stream:
+    """A streamed call whose chunks are replayed to every follower"""
+
+    def __init__(self):
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def feed(self, source):
+        try:
+            for chunk in source():
+                with self.cond:
+                    self.chunks.append(chunk)
+                    self.cond.notify_all()
+        except BaseException as e:
+            self.error = e
+        finally:
+            with self.cond:
+                self.finished = True
+                self.cond.notify_all()
+
+    def follow(self):
+        index = 0
+        while True:
+            with self.cond:
+                while index >= len(self.chunks) and not self.finished:
+                    self.cond.wait()
+                if index < len(self.chunks):
+                    chunk = self.chunks[index]
+                    index += 1
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            yield chunk
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key
+
+    The first caller (the leader) runs the function; callers arriving while it
+    is still in flight wait for and receive the same result, error or stream.
+    Once the call finishes the key is released, so later calls run fresh.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self.stats = {"leaders": 0, "shared": 0}
+
+    def do(self, key, fn):
+        """Run fn once for all concurrent callers with the same key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["leaders"] += 1
+            else:
+                self.stats["shared"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stream(self, key, fn):
+        """Share one streamed call; every caller iterates all of its chunks"""
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is None:
+                stream = self._streams[key] = _Stream()
+                self.stats["leaders"] += 1
+                threading.Thread(target=self._run_stream, args=(key, stream, fn), daemon=True).start()
+            else:
+                self.stats["shared"] += 1
+
+        return stream.follow()
+
+    def in_flight(self):
+        """Number of distinct calls currently running"""
+        with self._lock:
+            return len(self._calls) + len(self._streams)
+
+    def _run_stream(self, key, stream, fn):
+        try:
+            stream.feed(fn)
+        finally:
+            with self._lock:
+                self._streams.pop(key, None)
@@ -0,0 +1,14 @@
+# Local state directory for metrics, traces, caches and stores
+import os
+
+
+def state_dir():
+    """The state directory, read from AGENT_STATE_DIR on every call so .env settings apply"""
+    return os.path.abspath(os.getenv("AGENT_STATE_DIR", ".agent"))
+
+
+def state_path(*parts):
+    """Path inside the state directory, creating parent directories as needed"""
+    path = os.path.join(state_dir(), *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
@@ -0,0 +1,70 @@
+# Symbol-scoped source extraction and splicing (file.py::Class.method)
+import ast
+import re
+import textwrap
+
+SEPARATOR = "::"
+
+
+def split_target(target):
+    """("file.py", "Class.method") for "file.py::Class.method", (target, None) otherwise"""
+    if SEPARATOR in target:
+        file_path, symbol = target.split(SEPARATOR, 1)
+        return file_path.strip(), symbol.strip() or None
+    return target, None
+
+
+def locate(source, symbol):
+    """Span of a (dotted) function or class in source, or None
+
+    Returns {"start", "end", "def_line", "indent", "kind"} with 1-based,
+    inclusive line numbers; start includes decorators.
+    """
+    body = ast.parse(source).body
+    node = None
+    for part in symbol.split("."):
+        node = next(
+            (n for n in body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+             and n.name == part),
+            None,
+        )
+        if node is None:
+            return None
+        body = node.body
+
+    return {
+        "start": min([node.lineno] + [d.lineno for d in node.decorator_list]),
+        "end": node.end_lineno,
+        "def_line": node.lineno,
+        "indent": node.col_offset,
+        "kind": "class" if isinstance(node, ast.ClassDef) else "function",
+    }
+
+
+def extract(source, symbol):
+    """(span, text) of a symbol, or (None, None) if it is not defined"""
+    span = locate(source, symbol)
+    if span is None:
+        return None, None
+    lines = source.split("\n")
+    return span, "\n".join(lines[span["start"] - 1:span["end"]])
+
+
+def strip_fences(text):
+    """Code from a reply that may wrap it in a ```python fence"""
+    match = re.search(r"```[\w+-]*\n(.*?)```", text, re.DOTALL)
+    return (match.group(1) if match else text).strip("\n")
+
+
+def splice(source, span, new_text):
+    """source with the span's lines replaced by new_text, re-indented to match
+
+    Raises SyntaxError if the result does not parse, so a bad replacement
+    never reaches the file.
+    """
+    indent = " " * span["indent"]
+    replacement = textwrap.indent(textwrap.dedent(new_text), indent, lambda line: line.strip() != "")
+    lines = source.split("\n")
+    spliced = "\n".join(lines[:span["start"] - 1] + replacement.split("\n") + lines[span["end"]:])
+    ast.parse(spliced)
+    return spliced
@@ -0,0 +1,311 @@
+# Persistent task store (SQLite in WAL mode) replacing todos.json
+#
+# Every change is a small indexed row update inside its own transaction, so
+# status changes never rewrite the whole list and several agents (threads or
+# processes) can update tasks at the same time without clobbering each other.
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+STATUSES = ("pending", "in_progress", "completed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    content     TEXT NOT NULL,
+    active_form TEXT NOT NULL,
+    status      TEXT NOT NULL CHECK (status IN ('pending', 'in_progress', 'completed')),
+    created     TEXT NOT NULL,
+    updated     TEXT NOT NULL,
+    owner       TEXT,
+    heartbeat   REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id);
+CREATE TABLE IF NOT EXISTS task_deps (
+    task_id    INTEGER NOT NULL REFERENCES tasks (id) ON DELETE CASCADE,
+    depends_on INTEGER NOT NULL REFERENCES tasks (id) ON DELETE CASCADE,
+    PRIMARY KEY (task_id, depends_on)
+);
+CREATE TABLE IF NOT EXISTS task_results (
+    task_id  INTEGER PRIMARY KEY REFERENCES tasks (id) ON DELETE CASCADE,
+    result   TEXT,
+    error    TEXT,
+    finished TEXT NOT NULL
+);
+"""
+
+
+class TaskStore:
+    """Indexed task list with atomic status transitions
+
+    Each thread gets its own connection; writers take the database lock up
+    front (BEGIN IMMEDIATE) and wait up to `timeout` seconds for each other
+    instead of failing.
+
+    A runner takes a task with lease(), which records the runner as its
+    owner, and keeps the lease alive with renew(). Only tasks whose lease
+    has expired are handed back by release_stale(); tasks started by hand
+    (transition) have no owner and are never taken away.
+    """
+
+    def __init__(self, path, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            self._local.db = db
+        return db
+
+    def _write(self):
+        return _Transaction(self._connection())
+
+    # ----- queries -----
+
+    def get(self, task_id):
+        row = self._connection().execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return _to_dict(row) if row else None
+
+    def list(self, status=None):
+        """All tasks (optionally only those with the given status), by id"""
+        db = self._connection()
+        if status:
+            rows = db.execute("SELECT * FROM tasks WHERE status = ? ORDER BY id", (status,))
+        else:
+            rows = db.execute("SELECT * FROM tasks ORDER BY id")
+        return [_to_dict(row) for row in rows]
+
+    def counts(self):
+        """Number of tasks per status"""
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM tasks GROUP BY status")
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    # ----- changes -----
+
+    def add(self, content, active_form=None, status="pending"):
+        """Create a task and return it"""
+        _check_status(status)
+        now = _now()
+        with self._write() as db:
+            cursor = db.execute(
+                "INSERT INTO tasks (content, active_form, status, created, updated) VALUES (?, ?, ?, ?, ?)",
+                (content, active_form or f"Doing: {content}", status, now, now),
+            )
+        return self.get(cursor.lastrowid)
+
+    def transition(self, task_id, to_status, from_status=None):
+        """Atomically move a task to to_status
+
+        With from_status (a status or tuple of statuses) the change only
+        happens if the task is currently in one of them, so two agents can
+        race to claim the same pending task and exactly one wins. Returns
+        the updated task, or None if the task is missing or was not in
+        from_status.
+        """
+        _check_status(to_status)
+        sql = "UPDATE tasks SET status = ?, updated = ?, owner = NULL, heartbeat = NULL WHERE id = ?"
+        args = [to_status, _now(), task_id]
+        if from_status:
+            allowed = (from_status,) if isinstance(from_status, str) else tuple(from_status)
+            sql += f" AND status IN ({', '.join('?' * len(allowed))})"
+            args.extend(allowed)
+        with self._write() as db:
+            changed = db.execute(sql, args).rowcount
+        return self.get(task_id) if changed else None
+
+    def lease(self, task_id, owner):
+        """Atomically move a pending task to in_progress, held by owner
+
+        Returns the task, or None if it was not pending (another runner or
+        the user got there first).
+        """
+        with self._write() as db:
+            changed = db.execute(
+                "UPDATE tasks SET status = 'in_progress', updated = ?, owner = ?, heartbeat = ? "
+                "WHERE id = ? AND status = 'pending'",
+                (_now(), owner, time.time(), task_id),
+            ).rowcount
+        return self.get(task_id) if changed else None
+
+    def renew(self, owner):
+        """Refresh the leases of every task owner is running; returns how many"""
+        with self._write() as db:
+            return db.execute(
+                "UPDATE tasks SET heartbeat = ? WHERE owner = ? AND status = 'in_progress'",
+                (time.time(), owner),
+            ).rowcount
+
+    def release_stale(self, max_age):
+        """Put leased tasks not renewed for max_age seconds back to pending; returns their ids"""
+        with self._write() as db:
+            rows = db.execute(
+                "SELECT id FROM tasks WHERE status = 'in_progress' AND owner IS NOT NULL AND heartbeat < ?",
+                (time.time() - max_age,),
+            ).fetchall()
+            ids = [row["id"] for row in rows]
+            db.executemany(
+                "UPDATE tasks SET status = 'pending', updated = ?, owner = NULL, heartbeat = NULL WHERE id = ?",
+                [(_now(), task_id) for task_id in ids],
+            )
+        return ids
+
+    def finish(self, task_id, result=None, error=None, owner=None):
+        """Checkpoint a running task: completed with its result, or back to pending with an error
+
+        With owner, only the runner holding the task's lease can finish it.
+        Returns False if the task was not running (under that owner).
+        """
+        status = "pending" if error else "completed"
+        now = _now()
+        sql = "UPDATE tasks SET status = ?, updated = ?, owner = NULL, heartbeat = NULL " \
+              "WHERE id = ? AND status = 'in_progress'"
+        args = [status, now, task_id]
+        if owner is not None:
+            sql += " AND owner = ?"
+            args.append(owner)
+        with self._write() as db:
+            changed = db.execute(sql, args).rowcount
+            if changed:
+                db.execute(
+                    "INSERT OR REPLACE INTO task_results (task_id, result, error, finished) VALUES (?, ?, ?, ?)",
+                    (task_id, result, error, now),
+                )
+        return changed > 0
+
+    def result(self, task_id):
+        """{"result", "error", "finished"} of the task's last run, or None"""
+        row = self._connection().execute(
+            "SELECT result, error, finished FROM task_results WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    # ----- dependencies -----
+
+    def add_dependency(self, task_id, depends_on):
+        """Record that task_id needs depends_on to be completed first"""
+        if task_id == depends_on:
+            raise ValueError("A task cannot depend on itself")
+        with self._write() as db:
+            for tid in (task_id, depends_on):
+                if db.execute("SELECT 1 FROM tasks WHERE id = ?", (tid,)).fetchone() is None:
+                    raise ValueError(f"No task {tid}")
+            if task_id in _reachable(db, depends_on):
+                raise ValueError(f"Task {depends_on} already depends on task {task_id}")
+            db.execute("INSERT OR IGNORE INTO task_deps (task_id, depends_on) VALUES (?, ?)",
+                       (task_id, depends_on))
+
+    def remove_dependency(self, task_id, depends_on):
+        with self._write() as db:
+            return db.execute("DELETE FROM task_deps WHERE task_id = ? AND depends_on = ?",
+                              (task_id, depends_on)).rowcount > 0
+
+    def dependencies(self):
+        """{task id: set of task ids it depends on} for every task with dependencies"""
+        deps = {}
+        for task_id, depends_on in self._connection().execute("SELECT task_id, depends_on FROM task_deps"):
+            deps.setdefault(task_id, set()).add(depends_on)
+        return deps
+
+    def remove(self, task_id):
+        with self._write() as db:
+            return db.execute("DELETE FROM tasks WHERE id = ?", (task_id,)).rowcount > 0
+
+    # ----- todos.json compatibility -----
+
+    def import_json(self, path):
+        """Load tasks from a todos.json document, keeping ids and timestamps
+
+        Tasks whose id already exists are left alone, so importing twice is
+        harmless. Returns the number of tasks added.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            todos = json.load(f).get("todos", [])
+
+        added = 0
+        now = _now()
+        with self._write() as db:
+            for todo in todos:
+                status = todo.get("status", "pending")
+                if status not in STATUSES:
+                    status = "pending"
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO tasks (id, content, active_form, status, created, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (todo.get("id"), todo["content"], todo.get("activeForm") or f"Doing: {todo['content']}",
+                     status, todo.get("created", now), todo.get("updated", now)),
+                )
+                added += cursor.rowcount
+        return added
+
+    def export_json(self, path):
+        """Write the tasks out in the todos.json layout"""
+        todos = [
+            {"id": t["id"], "content": t["content"], "activeForm": t["activeForm"],
+             "status": t["status"], "created": t["created"], "updated": t["updated"]}
+            for t in self.list()
+        ]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"todos": todos, "updated": _now()}, f, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back on error"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def _reachable(db, task_id):
+    """Ids of every task that task_id depends on, directly or not"""
+    rows = db.execute(
+        "WITH RECURSIVE up(id) AS (SELECT depends_on FROM task_deps WHERE task_id = ? "
+        "UNION SELECT d.depends_on FROM task_deps d JOIN up ON d.task_id = up.id) SELECT id FROM up",
+        (task_id,),
+    )
+    return {row[0] for row in rows}
+
+
+def _now():
+    return datetime.now().isoformat()
+
+
+def _check_status(status):
+    if status not in STATUSES:
+        raise ValueError(f"Unknown status {status!r}; expected one of {', '.join(STATUSES)}")
+
+
+def _to_dict(row):
+    return {
+        "id": row["id"],
+        "content": row["content"],
+        "activeForm": row["active_form"],
+        "status": row["status"],
+        "created": row["created"],
+        "updated": row["updated"],
+        "owner": row["owner"],
+    }
@@ -0,0 +1,182 @@
+# Per-call and per-command metrics with local file exporters
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        """Approximate quantile using the upper bound of the matching bucket"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound if bound != math.inf else self.buckets[-2]
+        return self.buckets[-2]
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "avg": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Telemetry:
+    """Collects counters and latency histograms keyed by metric name and labels"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def current_command(self):
+        return getattr(self._local, "command", None)
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextmanager
+    def command(self, name):
+        """Time a REPL command and count it (and any error it raises)"""
+        previous = self.current_command
+        self._local.command = name
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.increment("agent_command_errors_total", command=name)
+            raise
+        finally:
+            self.observe("agent_command_latency_seconds", time.perf_counter() - start, command=name)
+            self.increment("agent_commands_total", command=name)
+            self._local.command = previous
+
+    def record_call(self, persona, model, latency, usage=None, error=None):
+        """Record one model API call"""
+        command = self.current_command or "none"
+        self.observe("agent_call_latency_seconds", latency, persona=persona, model=model)
+        self.increment("agent_calls_total", persona=persona, model=model, command=command)
+        if error is not None:
+            self.increment("agent_call_errors_total", persona=persona, model=model,
+                           error=type(error).__name__)
+            return
+        usage = usage or {}
+        self.increment("agent_input_tokens_total", usage.get("input_tokens", 0), persona=persona, model=model)
+        self.increment("agent_output_tokens_total", usage.get("output_tokens", 0), persona=persona, model=model)
+
+    def record_cache_hit(self, source, persona=None):
+        self.increment("agent_cache_hits_total", source=source, persona=persona or "none")
+
+    def snapshot(self):
+        """Plain-dict view of every metric"""
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), **histogram.to_dict()}
+                    for (name, labels), histogram in sorted(self.histograms.items())
+                ],
+            }
+
+    def totals(self, name, by):
+        """Sum a counter grouped by one of its labels"""
+        grouped = {}
+        with self._lock:
+            for (metric, labels), value in self.counters.items():
+                if metric == name:
+                    key = dict(labels).get(by, "none")
+                    grouped[key] = grouped.get(key, 0) + value
+        return grouped
+
+    def to_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_labels(labels)} {value}")
+
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, labels), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == math.inf else repr(bound)
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Write metrics to path: JSON for *.json, Prometheus text otherwise"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if path.endswith(".json"):
+            data = json.dumps(self.snapshot(), indent=2)
+        else:
+            data = self.to_prometheus()
+
+        # Write then rename so scrapers never see a partial file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,198 @@
+# Lightweight span tracing written as OpenTelemetry-shaped JSON lines
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Span:
+    """A timed unit of work inside a trace"""
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = {"code": "OK"}
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class Tracer:
+    """Creates nested spans per thread and appends finished traces to a JSONL file
+
+    The current span is tracked per thread; work handed to another thread
+    joins the trace through attach() or bind(). Finished spans are buffered
+    and each trace is written in one append once its last open span ends.
+    """
+
+    def __init__(self, path=None, max_bytes=10 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open = {}  # trace id -> number of unfinished spans
+        self._finished = {}  # trace id -> finished spans not yet written
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @property
+    def current(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def attach(self, parent):
+        """Make parent (a span from another thread, or None) the current span here"""
+        if parent is None:
+            yield
+            return
+        stack = self._stack()
+        stack.append(parent)
+        try:
+            yield
+        finally:
+            stack.pop()
+
+    def bind(self, func):
+        """Wrap func to run under the current span on whichever thread calls it"""
+        parent = self.current
+
+        @functools.wraps(func)
+        def bound(*args, **kwargs):
+            with self.attach(parent):
+                return func(*args, **kwargs)
+        return bound
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Open a child of the current span (or a new trace if there is none)"""
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        span = Span(name, trace_id, parent.span_id if parent else None, attributes)
+        if self.path:
+            with self._lock:
+                self._open[trace_id] = self._open.get(trace_id, 0) + 1
+        stack.append(span)
+        try:
+            yield span
+        except Exception as e:
+            span.status = {"code": "ERROR", "message": str(e)}
+            raise
+        finally:
+            stack.pop()
+            span.end_ns = time.time_ns()
+            self._finish(span)
+
+    def traced(self, name=None):
+        """Decorator wrapping a function call in a span"""
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _finish(self, span):
+        if not self.path:
+            return
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            self._finished.setdefault(span.trace_id, []).append(line)
+            self._open[span.trace_id] -= 1
+            if self._open[span.trace_id]:
+                return
+            del self._open[span.trace_id]
+            lines = self._finished.pop(span.trace_id)
+            try:
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+            except OSError:
+                pass
+
+
+def load_traces(path, limit=5, tail_bytes=1024 * 1024):
+    """Return the last `limit` traces from a span file, each as a list of span dicts"""
+    if limit < 1 or not path or not os.path.exists(path):
+        return []
+
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - tail_bytes))
+        data = f.read().decode("utf-8", errors="ignore")
+
+    traces = {}
+    for line in data.splitlines():
+        try:
+            span = json.loads(line)
+        except ValueError:
+            continue  # First line may be cut off by the tail read
+        traces.setdefault(span["traceId"], []).append(span)
+
+    ordered = sorted(traces.values(), key=lambda spans: min(s["startTimeUnixNano"] for s in spans))
+    return ordered[-limit:]
+
+
+def render_waterfall(spans, width=40):
+    """Format one trace as an indented waterfall of text lines"""
+    if not spans:
+        return []
+
+    by_parent = {}
+    for span in spans:
+        by_parent.setdefault(span["parentSpanId"], []).append(span)
+    for children in by_parent.values():
+        children.sort(key=lambda s: s["startTimeUnixNano"])
+
+    span_ids = {span["spanId"] for span in spans}
+    roots = [s for s in spans if not s["parentSpanId"] or s["parentSpanId"] not in span_ids]
+    start = min(s["startTimeUnixNano"] for s in spans)
+    end = max(s["endTimeUnixNano"] for s in spans)
+    total = max(end - start, 1)
+
+    lines = []
+
+    def walk(span, depth):
+        offset = int((span["startTimeUnixNano"] - start) / total * width)
+        length = max(1, int((span["endTimeUnixNano"] - span["startTimeUnixNano"]) / total * width))
+        bar = " " * offset + "█" * min(length, width - offset)
+        duration_ms = (span["endTimeUnixNano"] - span["startTimeUnixNano"]) / 1e6
+        marker = "❌" if span["status"].get("code") == "ERROR" else "  "
+        label = ("  " * depth + span["name"])[:36]
+        lines.append(f"{label:36} {bar:{width}} {duration_ms:9.1f} ms {marker}")
+        for child in by_parent.get(span["spanId"], []):
+            walk(child, depth + 1)
+
+    for root in sorted(roots, key=lambda s: s["startTimeUnixNano"]):
+        walk(root, 0)
+    return lines
@@ -0,0 +1,243 @@
+# Model transport with hedged requests and a circuit breaker
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    """Raised when a model is skipped because its circuit is open"""
+
+
+class LatencyTracker:
+    """Keeps recent first-token latencies per model"""
+
+    def __init__(self, window=100):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, model, latency):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(latency)
+
+    def percentile(self, model, pct, min_samples=1):
+        """Return the pct-th percentile latency, or None without enough samples"""
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < max(min_samples, 1):
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+
+class CircuitBreaker:
+    """Skips a model for a cool-down window after repeated failures"""
+
+    def __init__(self, failure_threshold=3, cooldown=30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def allow(self, model):
+        """True if the model may be called (closed, or half-open after cool-down)"""
+        with self._lock:
+            state = self._state.get(model)
+            if not state or state["opened_at"] is None:
+                return True
+            if time.monotonic() - state["opened_at"] >= self.cooldown:
+                # Half-open: let one trial call through
+                state["opened_at"] = time.monotonic()
+                return True
+            return False
+
+    def record_success(self, model):
+        with self._lock:
+            self._state.pop(model, None)
+
+    def record_failure(self, model):
+        with self._lock:
+            state = self._state.setdefault(model, {"failures": 0, "opened_at": None})
+            state["failures"] += 1
+            if state["failures"] >= self.failure_threshold:
+                state["opened_at"] = time.monotonic()
+
+    def status(self):
+        """Map of model -> 'open' / 'closed' with failure counts"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                model: {
+                    "failures": state["failures"],
+                    "state": "open" if state["opened_at"] is not None
+                    and now - state["opened_at"] < self.cooldown else "closed",
+                }
+                for model, state in self._state.items()
+            }
+
+
+class _Attempt:
+    """One call to a model running on its own thread"""
+
+    def __init__(self, attempt_id, model, events):
+        self.id = attempt_id
+        self.model = model
+        self.events = events
+        self.cancelled = threading.Event()
+        self.started = time.perf_counter()
+
+    def run(self, call):
+        try:
+            for kind, payload in call(self.model, self.cancelled):
+                if self.cancelled.is_set():
+                    return
+                self.events.put((self.id, kind, payload))
+        except Exception as e:
+            self.events.put((self.id, "error", e))
+
+
+class Transport:
+    """Sends chat requests to a backend, optionally hedging slow calls
+
+    With hedging enabled, a call that has not produced its first token by the
+    configured percentile of recent latencies is duplicated (to the same model
+    or, with hedge_to_fallback, to the next model of the route). Whichever
+    attempt answers first wins and the other is cancelled. on_model, if
+    given, is called with the model of the winning attempt, which is not
+    the requested model when a fallback hedge wins.
+    """
+
+    def __init__(self, backend, hedge=False, hedge_percentile=95, min_samples=10,
+                 hedge_to_fallback=False, breaker=None, latencies=None):
+        self.backend = backend
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.hedge_to_fallback = hedge_to_fallback
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = latencies or LatencyTracker()
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "skipped": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, backend):
+        """Build a transport configured from AGENT_HEDGE* / AGENT_BREAKER* variables"""
+        return cls(
+            backend,
+            hedge=os.getenv("AGENT_HEDGE", "0") == "1",
+            hedge_percentile=float(os.getenv("AGENT_HEDGE_PERCENTILE", "95")),
+            hedge_to_fallback=os.getenv("AGENT_HEDGE_FALLBACK", "0") == "1",
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("AGENT_BREAKER_FAILURES", "3")),
+                cooldown=float(os.getenv("AGENT_BREAKER_COOLDOWN", "30")),
+            ),
+        )
+
+    def chat(self, model, messages, hedge_model=None, on_model=None, **options):
+        """Blocking chat call; returns the backend's ChatResponse"""
+        def call(target, cancelled):
+            yield "done", self.backend.chat(target, messages, **options)
+
+        for kind, payload in self._race(model, hedge_model, call, on_model):
+            if kind == "done":
+                return payload
+
+    def chat_stream(self, model, messages, hedge_model=None, on_usage=None, on_model=None, **options):
+        """Streaming chat call; yields text chunks as they arrive"""
+        def call(target, cancelled):
+            for kind, payload in self.backend.chat_stream(target, messages, **options):
+                if cancelled.is_set():
+                    return
+                yield kind, payload
+            yield "done", None
+
+        for kind, payload in self._race(model, hedge_model, call, on_model):
+            if kind == "chunk":
+                yield payload
+            elif kind == "usage" and on_usage:
+                on_usage(payload)
+
+    def _race(self, model, hedge_model, call, on_model=None):
+        if not self.breaker.allow(model):
+            with self._lock:
+                self.stats["skipped"] += 1
+            raise CircuitOpenError(f"Circuit open for {model}")
+
+        with self._lock:
+            self.stats["calls"] += 1
+
+        events = queue.Queue()
+        attempts = {}
+        self._start(attempts, model, events, call)
+
+        hedge_after = None
+        if self.hedge:
+            hedge_after = self.latencies.percentile(model, self.hedge_percentile, self.min_samples)
+        hedge_target = hedge_model if self.hedge_to_fallback and hedge_model else model
+
+        try:
+            yield from self._wait(attempts, events, call, model, hedge_after, hedge_target, on_model)
+        finally:
+            # Stop anything still running, e.g. when the caller stops reading a stream
+            for attempt in attempts.values():
+                attempt.cancelled.set()
+
+    def _wait(self, attempts, events, call, model, hedge_after, hedge_target, on_model):
+        winner = None
+        last_error = None
+        while True:
+            timeout = None
+            if winner is None and hedge_after is not None:
+                elapsed = time.perf_counter() - attempts[0].started
+                timeout = max(0.0, hedge_after - elapsed)
+
+            try:
+                attempt_id, kind, payload = events.get(timeout=timeout)
+            except queue.Empty:
+                hedge_after = None
+                if self.breaker.allow(hedge_target):
+                    with self._lock:
+                        self.stats["hedged"] += 1
+                    self._start(attempts, hedge_target, events, call)
+                continue
+
+            attempt = attempts[attempt_id]
+            if winner is None:
+                if kind == "error":
+                    self.breaker.record_failure(attempt.model)
+                    last_error = payload
+                    attempt.cancelled.set()
+                    if all(a.cancelled.is_set() for a in attempts.values()):
+                        raise last_error
+                    continue
+
+                winner = attempt
+                self.latencies.add(winner.model, time.perf_counter() - winner.started)
+                if winner.id != 0:
+                    with self._lock:
+                        self.stats["hedge_wins"] += 1
+                if on_model:
+                    on_model(winner.model)
+                for other in attempts.values():
+                    if other is not winner:
+                        other.cancelled.set()
+
+            if attempt is not winner:
+                continue
+
+            if kind == "error":
+                self.breaker.record_failure(winner.model)
+                raise payload
+
+            yield kind, payload
+            if kind == "done":
+                self.breaker.record_success(winner.model)
+                return
+
+    def _start(self, attempts, model, events, call):
+        attempt = _Attempt(len(attempts), model, events)
+        attempts[attempt.id] = attempt
+        threading.Thread(target=attempt.run, args=(call,), daemon=True).start()
+        return attempt
@@ -0,0 +1,181 @@
+# Cross-reference index: definitions, call sites and references across the workspace
+#
+# Matching is by name, as Python's dynamic dispatch allows no better without
+# type inference: a call to `obj.save()` is counted as a reference to every
+# workspace definition named `save`.
+import ast
+import threading
+
+from Agent.depgraph import scan_python_files
+
+DEF_KINDS = {
+    ast.FunctionDef: "function",
+    ast.AsyncFunctionDef: "async function",
+    ast.ClassDef: "class",
+}
+
+
+class _Indexer(ast.NodeVisitor):
+    """Collects definitions and references of one file in a single pass"""
+
+    def __init__(self, rel_path):
+        self.path = rel_path
+        self.scope = []  # enclosing definitions, innermost last
+        self.definitions = []
+        self.references = []
+
+    def _define(self, node):
+        owner = self.scope[-1] if self.scope and self.scope[-1]["kind"] == "class" else None
+        kind = DEF_KINDS[type(node)]
+        if owner and kind != "class":
+            kind = "async method" if kind == "async function" else "method"
+        qualname = ".".join([d["name"] for d in self.scope] + [node.name])
+        definition = {
+            "name": node.name,
+            "qualname": qualname,
+            "kind": kind,
+            "owner": owner["name"] if owner else None,
+            "file": self.path,
+            "line": min([node.lineno] + [d.lineno for d in node.decorator_list]),
+            "def_line": node.lineno,
+            "end_line": node.end_lineno,
+        }
+        self.definitions.append(definition)
+
+        # Decorators, defaults and bases belong to the enclosing scope
+        for child in node.decorator_list:
+            self.visit(child)
+        if isinstance(node, ast.ClassDef):
+            for child in node.bases + node.keywords:
+                self.visit(child)
+        else:
+            self.visit(node.args)
+            if node.returns:
+                self.visit(node.returns)
+
+        self.scope.append(definition)
+        for child in node.body:
+            self.visit(child)
+        self.scope.pop()
+
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_ClassDef = _define
+
+    def _reference(self, name, kind, node):
+        self.references.append({
+            "name": name,
+            "kind": kind,
+            "file": self.path,
+            "line": node.lineno,
+            "scope": self.scope[-1]["qualname"] if self.scope else "<module>",
+        })
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Name):
+            self._reference(func.id, "call", func)
+        elif isinstance(func, ast.Attribute):
+            self._reference(func.attr, "call", func)
+            self.visit(func.value)
+        else:
+            self.visit(func)
+        for child in node.args + node.keywords:
+            self.visit(child)
+
+    def visit_Attribute(self, node):
+        self._reference(node.attr, "attribute", node)
+        self.visit(node.value)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self._reference(node.id, "name", node)
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            self._reference(alias.name, "import", node)
+
+
+def index_source(rel_path, source):
+    """(definitions, references) of one file (raises SyntaxError)"""
+    indexer = _Indexer(rel_path)
+    indexer.visit(ast.parse(source))
+    return indexer.definitions, indexer.references
+
+
+class XrefIndex:
+    """Workspace-wide definitions and references, re-indexed file by file"""
+
+    def __init__(self):
+        self._files = {}  # rel path -> (signature, definitions, references)
+        self._by_name = None
+        self._lock = threading.Lock()
+
+    def sync(self, root, read_source):
+        """Re-index .py files under root that changed; returns (changed, removed)
+
+        read_source(rel_path) returns a file's text, or None for a file that
+        may not be read; such files, and files that do not parse, keep their
+        last good index. The diff and its application happen under the lock.
+        """
+        current = scan_python_files(root)
+        with self._lock:
+            changed = [p for p, sig in current.items() if self._files.get(p, (None,))[0] != sig]
+            removed = [p for p in self._files if p not in current]
+            for path in removed:
+                del self._files[path]
+            for path in changed:
+                try:
+                    source = read_source(path)
+                    indexed = index_source(path, source) if source is not None else None
+                except (SyntaxError, ValueError, OSError):
+                    indexed = None
+                if indexed is None:
+                    old = self._files.get(path)
+                    indexed = old[1:] if old else ([], [])
+                self._files[path] = (current[path],) + tuple(indexed)
+            if changed or removed:
+                self._by_name = None
+        return changed, removed
+
+    def _maps(self):
+        with self._lock:
+            if self._by_name is None:
+                definitions, references = {}, {}
+                for _, defs, refs in self._files.values():
+                    for d in defs:
+                        definitions.setdefault(d["name"], []).append(d)
+                    for r in refs:
+                        references.setdefault(r["name"], []).append(r)
+                self._by_name = (definitions, references)
+            return self._by_name
+
+    def definitions(self, symbol):
+        """Definitions matching a name or a dotted qualname suffix (Class.method)"""
+        name = symbol.rsplit(".", 1)[-1]
+        matches = self._maps()[0].get(name, [])
+        if "." in symbol:
+            matches = [d for d in matches if d["qualname"] == symbol or d["qualname"].endswith("." + symbol)]
+        return sorted(matches, key=lambda d: (d["file"], d["line"]))
+
+    def references(self, symbol, kinds=None):
+        """Places a symbol's name is used (calls, attributes, names, imports)"""
+        name = symbol.rsplit(".", 1)[-1]
+        refs = self._maps()[1].get(name, [])
+        if kinds:
+            refs = [r for r in refs if r["kind"] in kinds]
+        return sorted(refs, key=lambda r: (r["file"], r["line"]))
+
+    def callers(self, symbol):
+        """{(file, scope)} of the functions that call symbol"""
+        return sorted({(r["file"], r["scope"]) for r in self.references(symbol, kinds=("call",))})
+
+    def callees(self, symbol):
+        """Names called from inside the definitions of symbol that resolve to workspace definitions"""
+        known = self._maps()[0]
+        called = set()
+        for definition in self.definitions(symbol):
+            _, _, refs = self._files.get(definition["file"], (None, [], []))
+            for ref in refs:
+                inside = ref["scope"] == definition["qualname"] or ref["scope"].startswith(definition["qualname"] + ".")
+                if ref["kind"] == "call" and inside and ref["name"] in known:
+                    called.add(ref["name"])
+        return sorted(called)
@@ -3,6 +3,8 @@ import gradio as gr
 import os
 import json
 from pathlib import Path
+from Agent.sessions import SessionStore
+from Agent.fileview import FileViewer, list_directory
 
 class MockAgent:
     def chat(self, message, history):
@@ -20,20 +22,79 @@ class MockAgent:
         
         return f"I received: {message}. This is a mock response. In production, this would call Cohere API."
 
-# Initialize agent
-agent = MockAgent()
+# Initialize agent: the real Cohere-backed agent, or the mock when it can't start
+# (e.g. no SDK or API key in a demo Space)
+try:
+    from main import coding_agent, coding_agent_stream
+    agent = None
+except Exception as e:
+    print(f"⚠️  Real agent unavailable ({e}), using mock responses")
+    coding_agent = coding_agent_stream = None
+    agent = MockAgent()
+
+PERSONAS = {"Coder": "coder", "Reviewer": "reviewer", "Architect": "architect"}
+DEFAULT_SETTINGS = {"persona": "Coder", "temperature": 0.2}
+
+# Queue sizing: concurrent model calls per worker and how many requests may wait
+CHAT_CONCURRENCY = int(os.getenv("GRADIO_CHAT_CONCURRENCY", "16"))
+FILE_CONCURRENCY = int(os.getenv("GRADIO_FILE_CONCURRENCY", "32"))
+QUEUE_MAX_SIZE = int(os.getenv("GRADIO_QUEUE_MAX_SIZE", "256"))
+
+# Chat history stays on the server; the browser only gets the visible window
+sessions = SessionStore(
+    token_budget=int(os.getenv("CHAT_HISTORY_TOKENS", "3000")),
+    visible_turns=int(os.getenv("CHAT_VISIBLE_TURNS", "20"))
+)
 
 # File system for workspace
 WORKSPACE_DIR = "workspace"
 os.makedirs(WORKSPACE_DIR, exist_ok=True)
 
-def chat_with_agent(message, history):
+def stream_reply(message, history, settings=None, context=None):
+    """Yield the agent's reply to a message as growing partial text"""
+    settings = settings or DEFAULT_SETTINGS
+    if agent is not None:
+        yield agent.chat(message, history)
+        return
+    
+    partial = ""
+    for chunk in coding_agent_stream(
+        message,
+        persona=PERSONAS.get(settings["persona"], "coder"),
+        temperature=settings["temperature"],
+        history=context
+    ):
+        partial += chunk
+        yield partial
+
+def respond(message, settings=None, session_id="default"):
+    """Chat tab handler: yields (input box, chat window, pending reply)
+
+    While the reply streams only the pending turn changes; the chat window
+    is sent once, when the turn is finished. A failed turn is shown but not
+    kept in the session, so the error never reaches the model as context.
+    """
+    context = sessions.context(session_id)
+    partial = ""
+    try:
+        for partial in stream_reply(message, sessions.view(session_id), settings, context):
+            yield "", gr.update(), f"**You:** {message}\n\n{partial}"
+    except Exception as e:
+        yield "", sessions.view(session_id, pending=(message, f"❌ Error: {str(e)}")), ""
+        return
+    
+    sessions.append(session_id, message, partial)
+    yield "", sessions.view(session_id), ""
+
+def chat_with_agent(message, history, settings=None):
     """Chat interface for the agent"""
-    response = agent.chat(message, history)
+    response = ""
+    for response in stream_reply(message, history, settings):
+        pass
     history.append((message, response))
     return history, history, ""  # Return updated history and clear input
 
-def list_files():
+def list_files(limit=20):
     """List files in workspace"""
     files = []
     for root, dirs, filenames in os.walk(WORKSPACE_DIR):
@@ -41,7 +102,61 @@ def list_files():
             if not filename.startswith('.'):
                 rel_path = os.path.relpath(os.path.join(root, filename), WORKSPACE_DIR)
                 files.append(rel_path)
-    return "\n".join(files[:20]) or "No files in workspace"
+                if len(files) >= limit:
+                    # Stop walking once we have enough names to show
+                    return "\n".join(files)
+    return "\n".join(files) or "No files in workspace"
+
+# Files tab: one directory level and one page of lines at a time
+viewer = FileViewer()
+BROWSER_PAGE_SIZE = 200
+VIEW_PAGE_LINES = 200
+MORE_ENTRIES = "__more__"
+
+def browse(rel_dir=".", offset=0):
+    """Dropdown choices for one level of the workspace tree"""
+    result = list_directory(WORKSPACE_DIR, rel_dir, offset, BROWSER_PAGE_SIZE)
+    if "error" in result:
+        return gr.update(choices=[], value=None), rel_dir, offset, f"❌ {result['error']}"
+    
+    directory = result["directory"]
+    choices = []
+    for entry in result["entries"]:
+        path = os.path.normpath(os.path.join(directory, entry["name"]))
+        if entry["type"] == "dir":
+            choices.append((f"📁 {entry['name']}/", path + "/"))
+        else:
+            choices.append((f"📄 {entry['name']}  ({entry['size'] / 1024:.1f} KB)", path))
+    if result["has_more"]:
+        choices.append((f"⏬ Show more ({result['total'] - offset - len(result['entries'])} left)", MORE_ENTRIES))
+    
+    shown = f"{offset + 1}-{offset + len(result['entries'])} of {result['total']}" if result["total"] else "empty"
+    label = f"📂 `{'/' if directory == '.' else directory}` ({shown})"
+    return gr.update(choices=choices, value=None), directory, offset, label
+
+def view_page(filepath, start=0, page_lines=VIEW_PAGE_LINES):
+    """Read one page of a workspace file"""
+    start = max(0, int(start or 0))
+    page_lines = max(1, int(page_lines or VIEW_PAGE_LINES))
+    full_path = os.path.abspath(os.path.join(WORKSPACE_DIR, filepath or ""))
+    workspace = os.path.abspath(WORKSPACE_DIR)
+    if os.path.commonpath([workspace, full_path]) != workspace or not os.path.isfile(full_path):
+        return "File not found", 0, "❌ File not found"
+    
+    try:
+        page = viewer.read_lines(full_path, start, page_lines)
+        if start and not page["text"]:
+            # Past the end (Next on the last page, or the file shrank): show the last page
+            last = max(0, ((page["total_lines"] or 0) - 1) // page_lines * page_lines)
+            page = viewer.read_lines(full_path, last, page_lines)
+    except OSError as e:
+        return "Error reading file", 0, f"❌ {str(e)}"
+    
+    total = page["total_lines"]
+    of_total = f"of {total}" if total is not None else "(more below)" if page["has_more"] else ""
+    info = (f"Lines {page['start'] + 1}-{page['end']} {of_total} · "
+            f"{page['size'] / 1024:.1f} KB")
+    return page["text"], page["start"], info
 
 def read_file(filepath):
     """Read a file"""
@@ -96,26 +211,39 @@ with gr.Blocks(title="AI Coding Agent", theme=gr.themes.Soft()) as demo:
     gr.Markdown("# 🤖 AI Coding Agent")
     gr.Markdown("An intelligent coding assistant that can help write, review, and explain code.")
     
+    # Per-browser-session agent settings
+    session_settings = gr.State(dict(DEFAULT_SETTINGS))
+    
     with gr.Tabs():
         with gr.TabItem("💬 Chat"):
             chatbot = gr.Chatbot(label="Conversation", height=400)
+            pending_reply = gr.Markdown("")
             msg = gr.Textbox(label="Your message", placeholder="Ask me about coding...")
             clear = gr.Button("Clear")
             
-            def respond(message, chat_history):
-                bot_message = agent.chat(message, chat_history)
-                chat_history.append((message, bot_message))
-                return "", chat_history
+            def respond_in_session(message, settings, request: gr.Request):
+                yield from respond(message, settings, request.session_hash if request else "default")
             
-            msg.submit(respond, [msg, chatbot], [msg, chatbot])
-            clear.click(lambda: None, None, chatbot, queue=False)
+            def clear_chat(request: gr.Request):
+                sessions.clear(request.session_hash if request else "default")
+                return None
+            
+            # The chatbot is output-only, so history is never uploaded from the browser
+            msg.submit(respond_in_session, [msg, session_settings], [msg, chatbot, pending_reply],
+                       api_name="respond", concurrency_limit=CHAT_CONCURRENCY)
+            clear.click(clear_chat, None, chatbot, queue=False)
         
         with gr.TabItem("📁 Files"):
             with gr.Row():
                 with gr.Column(scale=1):
                     gr.Markdown("### File Operations")
-                    file_list = gr.Textbox(label="Workspace Files", interactive=False, lines=10)
-                    refresh_btn = gr.Button("🔄 Refresh Files")
+                    current_dir = gr.State(".")
+                    dir_offset = gr.State(0)
+                    dir_label = gr.Markdown("📂 `/`")
+                    dir_entries = gr.Dropdown(label="Workspace Files", choices=[], interactive=True)
+                    with gr.Row():
+                        up_btn = gr.Button("⬆️ Up")
+                        refresh_btn = gr.Button("🔄 Refresh Files")
                     
                     file_name = gr.Textbox(label="Filename", placeholder="example.py")
                     file_content = gr.Textbox(label="Content", lines=10, placeholder="Your code here...")
@@ -126,26 +254,82 @@ with gr.Blocks(title="AI Coding Agent", theme=gr.themes.Soft()) as demo:
                     def update_file_list():
                         return list_files()
                     
-                    refresh_btn.click(update_file_list, outputs=file_list)
-                    create_examples_btn.click(create_example_files, outputs=file_list)
+                    def refresh_dir(rel_dir):
+                        return browse(rel_dir, 0)
+                    
+                    def go_up(rel_dir):
+                        parent = os.path.dirname(rel_dir.rstrip("/")) or "."
+                        return browse(parent, 0)
+                    
+                    browser_outputs = [dir_entries, current_dir, dir_offset, dir_label]
+                    refresh_btn.click(refresh_dir, current_dir, browser_outputs,
+                                      concurrency_limit=FILE_CONCURRENCY)
+                    up_btn.click(go_up, current_dir, browser_outputs, concurrency_limit=FILE_CONCURRENCY)
+                    demo.load(refresh_dir, current_dir, browser_outputs)
+                    
+                    def create_examples(rel_dir):
+                        status = create_example_files()
+                        return (status,) + browse(rel_dir, 0)
                     
-                    def save_file(fname, content):
+                    create_examples_btn.click(create_examples, current_dir,
+                                              [gr.Textbox(label="Status")] + browser_outputs)
+                    
+                    def save_file(fname, content, rel_dir):
                         result = write_file(fname, content)
-                        return result, update_file_list()
+                        return (result,) + browse(rel_dir, 0)
+                    
+                    save_btn.click(save_file, [file_name, file_content, current_dir], 
+                                  [gr.Textbox(label="Result")] + browser_outputs,
+                                  api_name="save_file", concurrency_limit=FILE_CONCURRENCY)
                     
-                    save_btn.click(save_file, [file_name, file_content], 
-                                  [gr.Textbox(label="Result"), file_list])
+                    # Hidden helper kept for scripted clients that want a flat listing
+                    gr.Button(visible=False).click(update_file_list, outputs=gr.Textbox(visible=False),
+                                                   api_name="update_file_list",
+                                                   concurrency_limit=FILE_CONCURRENCY)
                 
                 with gr.Column(scale=1):
                     gr.Markdown("### Read File")
                     read_filename = gr.Textbox(label="Filename to read", placeholder="example.py")
-                    read_btn = gr.Button("📖 Read File")
-                    file_display = gr.Textbox(label="File Content", interactive=False, lines=20)
+                    with gr.Row():
+                        read_btn = gr.Button("📖 Read File")
+                        page_lines = gr.Number(value=VIEW_PAGE_LINES, label="Lines per page", precision=0)
+                    view_start = gr.State(0)
+                    view_info = gr.Markdown("")
+                    file_display = gr.Textbox(label="File Content", interactive=False, lines=20, max_lines=40)
+                    with gr.Row():
+                        prev_btn = gr.Button("◀ Previous")
+                        next_btn = gr.Button("Next ▶")
+                    
+                    def display_file(filename, lines=VIEW_PAGE_LINES):
+                        return view_page(filename, 0, lines)
+                    
+                    def previous_page(filename, start, lines):
+                        return view_page(filename, max(0, start - int(lines or VIEW_PAGE_LINES)), lines)
                     
-                    def display_file(filename):
-                        return read_file(filename)
+                    def next_page(filename, start, lines):
+                        return view_page(filename, start + int(lines or VIEW_PAGE_LINES), lines)
                     
-                    read_btn.click(display_file, inputs=read_filename, outputs=file_display)
+                    viewer_outputs = [file_display, view_start, view_info]
+                    read_btn.click(display_file, [read_filename, page_lines], viewer_outputs,
+                                   api_name="display_file", concurrency_limit=FILE_CONCURRENCY)
+                    prev_btn.click(previous_page, [read_filename, view_start, page_lines], viewer_outputs,
+                                   concurrency_limit=FILE_CONCURRENCY)
+                    next_btn.click(next_page, [read_filename, view_start, page_lines], viewer_outputs,
+                                   concurrency_limit=FILE_CONCURRENCY)
+                    
+                    def open_entry(choice, rel_dir, offset, lines):
+                        no_change = (gr.update(),) * 4
+                        if not choice:
+                            return no_change + (gr.update(),) * 4
+                        if choice == MORE_ENTRIES:
+                            return browse(rel_dir, offset + BROWSER_PAGE_SIZE) + (gr.update(),) * 4
+                        if choice.endswith("/"):
+                            return browse(choice.rstrip("/"), 0) + (gr.update(),) * 4
+                        return no_change + (choice,) + view_page(choice, 0, lines)
+                    
+                    dir_entries.change(open_entry, [dir_entries, current_dir, dir_offset, page_lines],
+                                       browser_outputs + [read_filename] + viewer_outputs,
+                                       concurrency_limit=FILE_CONCURRENCY)
         
         with gr.TabItem("⚙️ Settings"):
             gr.Markdown("### Agent Settings")
@@ -173,14 +357,16 @@ with gr.Blocks(title="AI Coding Agent", theme=gr.themes.Soft()) as demo:
             save_settings = gr.Button("Save Settings")
             settings_status = gr.Textbox(label="Status", interactive=False)
             
-            def save_settings_func(persona_val, temp_val, api_val):
-                # In production, save to config
-                return f"Settings saved: {persona_val} mode, Temperature: {temp_val}"
+            def save_settings_func(persona_val, temp_val, api_val, settings):
+                # Settings live in this browser session only
+                settings = dict(settings, persona=persona_val, temperature=temp_val)
+                return settings, f"Settings saved: {persona_val} mode, Temperature: {temp_val}"
             
             save_settings.click(
                 save_settings_func,
-                [persona, temperature, api_key],
-                outputs=settings_status
+                [persona, temperature, api_key, session_settings],
+                outputs=[session_settings, settings_status],
+                queue=False
             )
     
     gr.Markdown("---")
@@ -198,5 +384,8 @@ with gr.Blocks(title="AI Coding Agent", theme=gr.themes.Soft()) as demo:
             btn = gr.Button(example_text)
             # This would need JavaScript to switch tabs - simplified for demo
 
+# Generator handlers run in worker threads; keep enough threads for every slot
+demo.queue(default_concurrency_limit=CHAT_CONCURRENCY, max_size=QUEUE_MAX_SIZE)
+
 if __name__ == "__main__":
-    demo.launch()
\ No newline at end of file
+    demo.launch(max_threads=CHAT_CONCURRENCY + FILE_CONCURRENCY + 8)
\ No newline at end of file
@@ -1,23 +1,103 @@
 # Entry point for CLI version
-import cohere
+import sys
 from dotenv import load_dotenv
+
+load_dotenv()  # Before anything reads AGENT_* settings, including the daemon client below
+
+if __name__ == '__main__' and len(sys.argv) > 1 and not sys.argv[1].startswith('-'):
+    # One-shot command: let a running daemon (main.py --daemon) answer it with warm state
+    from Agent.daemon import run_client
+    exit_code = run_client(" ".join(sys.argv[1:]))
+    if exit_code is not None:
+        sys.exit(exit_code)
+
 import os
 import json
 from pathlib import Path
 import ast
 import re
+import time
+import argparse
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 from Prompts.system_prompts import (
     COHERE_CODING_AGENT,
     COHERE_CODE_REVIEWER, 
     COHERE_ARCHITECT
 )
-
-load_dotenv()
+from Agent.router import ModelRouter
+from Agent.backends import backend_from_env
+from Agent.singleflight import SingleFlight, request_key
+from Agent.transport import CircuitOpenError, Transport
+from Agent.telemetry import Telemetry
+from Agent.state import state_dir, state_path
+from Agent.tracing import Tracer, load_traces, render_waterfall
+from Agent.profiling import CommandProfiler
+from Agent.server import run_server
+from Agent.daemon import serve_daemon
+from Agent.batch import BatchRunner, load_commands, summarize
+from Agent.tasks import STATUSES, TaskStore
+from Agent.planner import PlanExecutor
+from Agent.archive import ConversationArchive
+from Agent.cachekeys import CodeNormalizer
+from Agent.reviews import FindingsCache, IncrementalReviewer, format_findings
+from Agent.sandbox import SandboxPool
+from Agent.depgraph import ImportGraph
+from Agent.xref import XrefIndex
+from Agent.symbols import extract, splice, split_target, strip_fences
+from Agent.codemetrics import MetricsEngine, hot_files
 
 cohere_api_key = os.getenv("COHERE_API_KEY")
 print(cohere_api_key[0:5] + "*" * len(cohere_api_key) if cohere_api_key else "No API key found")
 
-co = cohere.ClientV2(cohere_api_key)
+backend = backend_from_env(cohere_api_key, default_cassette=state_path("cassettes", "default.jsonl"))
+router = ModelRouter.from_file()
+inflight = SingleFlight()
+transport = Transport.from_env(backend)
+telemetry = Telemetry()
+metrics_file = os.getenv("AGENT_METRICS_FILE")
+trace_file = state_path("traces.jsonl") if os.getenv("AGENT_TRACE", "0") == "1" else None  # opt-in
+tracer = Tracer(trace_file)
+profiler = CommandProfiler(os.path.join(state_dir(), "profiles"))
+
+# Task list (formerly todos.json, which is imported once on first run)
+tasks = TaskStore(os.getenv("AGENT_TASKS_DB") or state_path("tasks.db"))
+if not any(tasks.counts().values()) and os.path.exists("todos.json"):
+    tasks.import_json("todos.json")
+
+# Every exchange is archived; with a TTL, identical requests are answered from the archive
+archive = ConversationArchive(os.getenv("AGENT_ARCHIVE_DB") or state_path("archive.db"))
+ARCHIVE_CACHE_TTL = float(os.getenv("AGENT_ARCHIVE_CACHE_TTL", "0"))  # seconds; 0 (default) disables reuse
+ARCHIVE_RECALL = int(os.getenv("AGENT_ARCHIVE_RECALL", "0"))  # past answers added to questions
+
+# Task types whose cache key ignores formatting and comments in the code context, e.g. "review"
+NORMALIZED_KEY_TASKS = {t.strip() for t in os.getenv("AGENT_NORMALIZED_KEYS", "").split(",") if t.strip()}
+normalizer = CodeNormalizer()
+
+# Python files are reviewed per symbol, resending only symbols that changed
+INCREMENTAL_REVIEW = os.getenv("AGENT_INCREMENTAL_REVIEW", "1") == "1"
+review_cache = FindingsCache(state_path("reviews.db"))
+
+# Warm, resource-limited interpreters for running workspace code
+sandbox = SandboxPool(
+    workers=int(os.getenv("AGENT_SANDBOX_WORKERS", "2")),
+    cpu_seconds=int(os.getenv("AGENT_SANDBOX_CPU", "10")),
+    memory_mb=int(os.getenv("AGENT_SANDBOX_MEMORY_MB", "512")),
+    timeout=float(os.getenv("AGENT_SANDBOX_TIMEOUT", "30")),
+)
+
+# Workspace import graph; after a write, the tests importing the file are run
+import_graph = ImportGraph()
+xref = XrefIndex()
+# Complexity, size and churn per file, cached per content hash, to pick files worth reviewing
+metrics_engine = MetricsEngine(state_path("metrics.db"), workers=int(os.getenv("AGENT_METRICS_WORKERS", "0")) or None)
+TEST_IMPACT = os.getenv("AGENT_TEST_IMPACT", "1") == "1"
+
+REPL_COMMANDS = {
+    "help", "quit", "test", "models", "stats", "read", "write", "create",
+    "list", "analyze", "review", "architect", "edit", "trace", "profile",
+    "todos", "search", "run", "deps", "find-refs", "metrics",
+}
 
 
 class FileSystemManager:
@@ -43,6 +123,7 @@ class FileSystemManager:
         os.makedirs(self.workspace_dir, exist_ok=True)
         print(f"📁 Workspace: {self.workspace_dir}")
     
+    @tracer.traced("fs.read_file")
     def read_file(self, file_path):
         """Read a file with safety checks"""
         try:
@@ -75,6 +156,7 @@ class FileSystemManager:
         except Exception as e:
             return {"error": f"Error reading {file_path}: {str(e)}"}
     
+    @tracer.traced("fs.write_file")
     def write_file(self, file_path, content):
         """Write content to a file"""
         try:
@@ -104,6 +186,7 @@ class FileSystemManager:
         """Create a new file with optional content"""
         return self.write_file(file_path, content)
     
+    @tracer.traced("fs.list_files")
     def list_files(self, directory=".", pattern="*"):
         """List files in a directory"""
         try:
@@ -146,6 +229,7 @@ class FileSystemManager:
         except Exception as e:
             return {"error": f"Error listing files: {str(e)}"}
     
+    @tracer.traced("fs.analyze_file")
     def analyze_file(self, file_path):
         """Analyze a Python file using AST"""
         read_result = self.read_file(file_path)
@@ -160,25 +244,35 @@ class FileSystemManager:
             classes = []
             imports = []
             
+            owners = {
+                child: node.name
+                for node in ast.walk(tree) if isinstance(node, ast.ClassDef)
+                for child in node.body
+            }
+            
             for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
                     functions.append({
                         "name": node.name,
                         "line": node.lineno,
-                        "args": [arg.arg for arg in node.args.args]
+                        "end_line": node.end_lineno,
+                        "args": [arg.arg for arg in node.args.args],
+                        "owner": owners.get(node),
+                        "async": isinstance(node, ast.AsyncFunctionDef)
                     })
                 elif isinstance(node, ast.ClassDef):
                     classes.append({
                         "name": node.name,
-                        "line": node.lineno
+                        "line": node.lineno,
+                        "end_line": node.end_lineno
                     })
                 elif isinstance(node, ast.Import):
                     for alias in node.names:
                         imports.append(alias.name)
                 elif isinstance(node, ast.ImportFrom):
-                    module = node.module or ""
+                    module = "." * node.level + (node.module or "")
                     for alias in node.names:
-                        imports.append(f"{module}.{alias.name}")
+                        imports.append(f"{module}.{alias.name}" if node.module else f"{module}{alias.name}")
             
             return {
                 "success": True,
@@ -204,6 +298,10 @@ class FileSystemManager:
                 "error": f"Analysis error: {str(e)}"
             }
     
+    def find_unsafe_patterns(self, content):
+        """Unsafe patterns that occur in content"""
+        return [pattern for pattern in self.unsafe_patterns if re.search(pattern, content)]
+    
     def _resolve_path(self, path):
         """Resolve path relative to workspace"""
         if os.path.isabs(path):
@@ -230,48 +328,779 @@ class FileSystemManager:
 fs = FileSystemManager()
 
 # ===== Enhanced Agent Functions =====
-def coding_agent(task, context="", persona="coder", file_context=None):
-    """Enhanced coding agent with file context support"""
+PERSONA_PROMPTS = {
+    'coder': COHERE_CODING_AGENT,
+    'reviewer': COHERE_CODE_REVIEWER,
+    'architect': COHERE_ARCHITECT
+}
+
+def build_prompt(task, context="", persona="coder", file_context=None, history=None, recalled=None):
+    """Assemble the full prompt for a persona"""
+    with tracer.span("agent.build_prompt", persona=persona) as span:
+        system_prompt = PERSONA_PROMPTS.get(persona, COHERE_CODING_AGENT)
+        full_prompt = f"{system_prompt}\n\nTask: {task}"
+        
+        if context:
+            full_prompt += f"\n\nCode Context:\n```python\n{context}\n```"
+        
+        if file_context:
+            full_prompt += f"\n\nFile Context:\n{file_context}"
+        
+        if history:
+            full_prompt += f"\n\nConversation so far:\n{history}"
+        
+        if recalled:
+            full_prompt += f"\n\nEarlier answers to similar questions:\n{recalled}"
+        span.set_attribute("prompt_chars", len(full_prompt))
     
-    persona_prompts = {
-        'coder': COHERE_CODING_AGENT,
-        'reviewer': COHERE_CODE_REVIEWER,
-        'architect': COHERE_ARCHITECT
-    }
+    return full_prompt
+
+def prepare_request(task, context, persona, file_context, task_type, quality, temperature, history=None,
+                    recalled=None):
+    """Build the prompt, route it and derive the coalescing key"""
+    full_prompt = build_prompt(task, context, persona, file_context, history, recalled)
+    route = router.route(
+        task_type=task_type,
+        persona=persona,
+        prompt_chars=len(full_prompt),
+        quality=quality
+    )
+    messages = [
+        {
+            "role": "user",
+            "content": full_prompt,
+        }
+    ]
+    options = {"temperature": temperature} if temperature is not None else {}
     
-    system_prompt = persona_prompts.get(persona, COHERE_CODING_AGENT)
-    full_prompt = f"{system_prompt}\n\nTask: {task}"
+    key_prompt = full_prompt
+    if context and task_type in NORMALIZED_KEY_TASKS:
+        # Reformatted or re-commented code maps to the same key
+        with tracer.span("agent.normalize_key", chars=len(context)):
+            fingerprint = normalizer.fingerprint(context)
+        key_prompt = build_prompt(task, f"<normalized {fingerprint}>", persona, file_context, history, recalled)
+    key = request_key(route.models[0], persona, key_prompt, options)
+    return route, messages, options, key
+
+def coding_agent(task, context="", persona="coder", file_context=None, task_type="chat",
+                 quality="normal", temperature=None, history=None, recall=0):
+    """Enhanced coding agent with file context support"""
+    route, messages, options, key = prepare_request(
+        task, context, persona, file_context, task_type, quality, temperature, history
+    )
+    cached = archived_answer(key, persona)
+    if cached is not None:
+        return cached
+    if recall:
+        route, messages, options, _ = prepare_request(
+            task, context, persona, file_context, task_type, quality, temperature, history,
+            recalled=archive.related_context(task, limit=recall)
+        )
     
-    if context:
-        full_prompt += f"\n\nCode Context:\n```python\n{context}\n```"
+    # Identical concurrent requests share a single API call
+    leader = []
     
-    if file_context:
-        full_prompt += f"\n\nFile Context:\n{file_context}"
+    def call():
+        leader.append(True)
+        meta = {}
+        text = routed_chat(route, messages, meta=meta, **options)
+        archive_exchange(key, task, persona, messages, text, meta)
+        return text
     
-    response = co.chat(
-        model="command-a-03-2025",
-        messages=[
-            {
-                "role": "user",
-                "content": full_prompt,
-            }
-        ],
+    result = inflight.do(key, call)
+    if not leader:
+        telemetry.record_cache_hit("inflight", persona)
+    return result
+
+def coding_agent_stream(task, context="", persona="coder", file_context=None, task_type="chat",
+                        quality="normal", temperature=None, history=None, recall=0):
+    """Streaming variant of coding_agent; yields text chunks as they arrive"""
+    route, messages, options, key = prepare_request(
+        task, context, persona, file_context, task_type, quality, temperature, history
     )
+    cached = archived_answer(key, persona)
+    if cached is not None:
+        yield cached
+        return
+    if recall:
+        route, messages, options, _ = prepare_request(
+            task, context, persona, file_context, task_type, quality, temperature, history,
+            recalled=archive.related_context(task, limit=recall)
+        )
+    
+    # The leader streams on its own thread; keep its spans in this trace
+    parent = tracer.current
     
-    return response.message.content[0].text
+    def produce():
+        with tracer.attach(parent):
+            meta = {}
+            chunks = []
+            for chunk in routed_stream(route, messages, meta=meta, **options):
+                chunks.append(chunk)
+                yield chunk
+            archive_exchange(key, task, persona, messages, "".join(chunks), meta)
+    
+    yield from inflight.stream(key, produce)
+
+def archived_answer(key, persona):
+    """Answer archived for exactly this request, if reuse is enabled"""
+    if not ARCHIVE_CACHE_TTL:
+        return None
+    with tracer.span("archive.lookup"):
+        cached = archive.lookup(key, max_age=ARCHIVE_CACHE_TTL)
+    if cached is not None:
+        telemetry.record_cache_hit("archive", persona)
+        print("♻️  Answer reused from the archive (unset AGENT_ARCHIVE_CACHE_TTL for a fresh one)")
+    return cached
+
+def archive_exchange(key, task, persona, messages, response, meta):
+    """Archive a finished exchange; a failing archive never fails the request"""
+    system_prompt = PERSONA_PROMPTS.get(persona, COHERE_CODING_AGENT)
+    prompt = messages[-1]["content"]
+    if prompt.startswith(system_prompt):
+        prompt = prompt[len(system_prompt):].lstrip()
+    try:
+        with tracer.span("archive.record"):
+            archive.record(key, task, prompt, response, persona=persona, model=meta.get("model"),
+                           usage=meta.get("usage"), latency=meta.get("latency"))
+    except Exception as e:
+        print(f"⚠️  Could not archive exchange: {e}")
+
+def routed_chat(route, messages, meta=None, **options):
+    """Call the models of a route in order, falling back on errors
+
+    meta, if given, receives the model, usage and latency of the answer.
+    """
+    last_error = None
+    models = list(route)
+    for i, model in enumerate(models):
+        hedge_model = models[i + 1] if i + 1 < len(models) else None
+        served = {}
+        start = time.perf_counter()
+        try:
+            with tracer.span("model.chat", model=model, rule=route.rule):
+                response = transport.chat(model, messages, hedge_model=hedge_model,
+                                          on_model=lambda m: served.update(model=m), **options)
+        except CircuitOpenError as e:
+            # Endpoint is cooling down, go straight to the next model
+            last_error = e
+            continue
+        except Exception as e:
+            latency = time.perf_counter() - start
+            router.record(route, served.get("model", model), latency, error=e)
+            telemetry.record_call(route.persona, served.get("model", model), latency, error=e)
+            last_error = e
+            continue
+        
+        # A hedge to the fallback model may have answered first
+        model = served.get("model", model)
+        latency = time.perf_counter() - start
+        router.record(route, model, latency, usage=response.usage)
+        telemetry.record_call(route.persona, model, latency, usage=response.usage)
+        if meta is not None:
+            meta.update(model=model, usage=response.usage, latency=latency)
+        return response.text
+    
+    raise last_error
+
+def routed_stream(route, messages, meta=None, **options):
+    """Stream from the models of a route, falling back only before the first chunk"""
+    last_error = None
+    models = list(route)
+    for i, model in enumerate(models):
+        hedge_model = models[i + 1] if i + 1 < len(models) else None
+        usage = {}
+        served = {}
+        started = False
+        start = time.perf_counter()
+        try:
+            with tracer.span("model.chat_stream", model=model, rule=route.rule):
+                for chunk in transport.chat_stream(model, messages, hedge_model=hedge_model,
+                                                   on_usage=usage.update,
+                                                   on_model=lambda m: served.update(model=m), **options):
+                    started = True
+                    yield chunk
+        except CircuitOpenError as e:
+            last_error = e
+            continue
+        except Exception as e:
+            latency = time.perf_counter() - start
+            router.record(route, served.get("model", model), latency, error=e)
+            telemetry.record_call(route.persona, served.get("model", model), latency, error=e)
+            if started:
+                raise
+            last_error = e
+            continue
+        
+        model = served.get("model", model)
+        latency = time.perf_counter() - start
+        router.record(route, model, latency, usage=usage)
+        telemetry.record_call(route.persona, model, latency, usage=usage)
+        if meta is not None:
+            meta.update(model=model, usage=usage, latency=latency)
+        return
+    
+    raise last_error
 
 def simple_agent():
     """Test the function"""
-    response = co.chat(
-        model='command-a-03-2025',
-        messages=[
-            {
-                'role': 'user',
-                'content': "I'm joining a new startup called Co1t today. Could you help me write a one-sentence introduction message to my teammates"
-            }
-        ],
+    route = router.route(task_type="simple", persona="coder")
+    result = routed_chat(route, [
+        {
+            'role': 'user',
+            'content': "I'm joining a new startup called Co1t today. Could you help me write a one-sentence introduction message to my teammates"
+        }
+    ])
+    print(result)
+
+# ===== Agent Operations =====
+REVIEW_TASK = "Review this code for security issues, bugs, and improvements"
+
+def read_symbol(target):
+    """Read one function or class of a file (file.py::Class.method)"""
+    file_path, symbol = split_target(target)
+    if not symbol:
+        return {"error": f"No symbol given in {target} (use file.py::Class.method)"}
+    read_result = fs.read_file(file_path)
+    if "error" in read_result:
+        return read_result
+    try:
+        span, text = extract(read_result['content'], symbol)
+    except SyntaxError as e:
+        return {"error": f"Cannot parse {file_path}: line {e.lineno}: {e.msg}"}
+    if span is None:
+        return {"error": f"No function or class {symbol} in {file_path}"}
+    return {
+        "success": True,
+        "path": read_result['path'],
+        "file": file_path,
+        "symbol": symbol,
+        "start": span['start'],
+        "end": span['end'],
+        "content": text,
+        "size": len(text),
+        "lines": span['end'] - span['start'] + 1
+    }
+
+def read_target(target):
+    """Read a whole file, or one symbol of it with file.py::name"""
+    return read_symbol(target) if "::" in target else fs.read_file(target)
+
+def resolve_review_target(target):
+    """Work out whether a review target is a symbol, a file path or inline code"""
+    if "::" in target:
+        result = read_symbol(target)
+        if "error" in result:
+            return result
+        return {"source": "symbol", "context": result['content'], **result}
+    
+    if os.path.exists(target) or '/' in target or '.' in target:
+        # It's probably a file path
+        read_result = fs.read_file(target)
+        if "error" in read_result:
+            return {"error": f"Error reading file: {read_result['error']}"}
+        return {"success": True, "source": "file", "path": read_result['path'], "context": read_result['content']}
+    
+    # It's inline code
+    return {"success": True, "source": "inline", "context": target}
+
+def review_code(target):
+    """Review a file or inline code with the reviewer persona"""
+    resolved = resolve_review_target(target)
+    if "error" in resolved:
+        return resolved
+    
+    if INCREMENTAL_REVIEW and resolved['source'] == 'file' and resolved['path'].endswith('.py'):
+        try:
+            return review_incrementally(resolved)
+        except SyntaxError:
+            pass  # Not parseable: review the text as a whole
+    
+    review = coding_agent(**review_request(resolved))
+    return {
+        "success": True,
+        "source": resolved['source'],
+        "chars": len(resolved['context']),
+        "review": review
+    }
+
+def review_request(resolved):
+    """coding_agent arguments for reviewing a resolved target"""
+    task = REVIEW_TASK
+    file_context = None
+    if resolved['source'] == 'symbol':
+        task += f" (this is {resolved['symbol']} from {resolved['file']}, lines {resolved['start']}-{resolved['end']})"
+        file_context = symbol_context(resolved['symbol']) or None
+    return {
+        "task": task,
+        "context": resolved['context'],
+        "file_context": file_context,
+        "persona": "reviewer",
+        "task_type": "review"
+    }
+
+def review_incrementally(resolved):
+    """Per-symbol review of a Python file, reusing findings for unchanged symbols"""
+    reviewer = IncrementalReviewer(
+        review_cache,
+        lambda task, code: coding_agent(task, context=code, persona="reviewer", task_type="review")
     )
-    print(response.message.content[0].text)
+    with tracer.span("review.incremental") as span:
+        result = reviewer.review(resolved['context'])
+        span.set_attribute("reviewed", len(result['reviewed']))
+        span.set_attribute("reused", len(result['reused']))
+    
+    path = os.path.relpath(resolved['path'], fs.workspace_dir)
+    review = format_findings(result['findings'], path)
+    if result['reply'] is not None:
+        # The model did not answer in the findings format: show its review as written
+        review = f"{review}\n\n{result['reply']}" if result['findings'] else result['reply']
+    return {
+        "success": True,
+        "source": "file",
+        "chars": len(resolved['context']),
+        "review": review,
+        **result
+    }
+
+def run_file(file_path, args=()):
+    """Run a workspace Python file in the sandbox"""
+    read_result = fs.read_file(file_path)
+    if "error" in read_result:
+        return read_result
+    
+    unsafe = fs.find_unsafe_patterns(read_result['content'])
+    if unsafe:
+        return {"error": f"Refusing to run {file_path}: matches unsafe patterns {', '.join(unsafe)}"}
+    
+    with tracer.span("sandbox.run", file=file_path):
+        result = sandbox.run(path=read_result['path'], args=args, cwd=fs.workspace_dir)
+    return {"path": read_result['path'], **result}
+
+# ===== Test Impact =====
+def workspace_relpath(file_path):
+    return os.path.relpath(os.path.abspath(fs._resolve_path(file_path)), fs.workspace_dir)
+
+def file_imports(rel_path):
+    """Imports analyze_file finds in a file (None if it does not parse)"""
+    result = fs.analyze_file(rel_path)
+    return result['imports'] if result.get("valid_python") else None
+
+def sync_import_graph():
+    """Re-index workspace files added, changed or removed since the last sync"""
+    with tracer.span("imports.sync") as span:
+        changed, removed = import_graph.sync(fs.workspace_dir, file_imports)
+        span.set_attribute("changed", len(changed))
+        span.set_attribute("removed", len(removed))
+
+def dependency_context(file_path):
+    """A file's place in the import graph, as a note for the model"""
+    sync_import_graph()
+    rel_path = workspace_relpath(file_path)
+    if rel_path not in import_graph:
+        return ""
+    notes = []
+    imports = sorted(import_graph.imports_of(rel_path))
+    importers = sorted(import_graph.importers_of(rel_path))
+    if imports:
+        notes.append(f"{rel_path} imports: {', '.join(imports)}")
+    if importers:
+        notes.append(f"{rel_path} is imported by: {', '.join(importers)} (keep its public interface compatible)")
+    return "\n".join(notes)
+
+def sync_xref():
+    """Re-index definitions and references of changed workspace files"""
+    with tracer.span("xref.sync") as span:
+        changed, removed = xref.sync(fs.workspace_dir, lambda path: fs.read_file(path).get('content'))
+        span.set_attribute("changed", len(changed))
+        span.set_attribute("removed", len(removed))
+
+def find_references(symbol):
+    """Definitions, references, callers and callees of a symbol"""
+    sync_xref()
+    return {
+        "success": True,
+        "symbol": symbol,
+        "definitions": xref.definitions(symbol),
+        "references": xref.references(symbol),
+        "callers": [{"file": f, "scope": scope} for f, scope in xref.callers(symbol)],
+        "callees": xref.callees(symbol),
+    }
+
+def symbol_context(symbol, max_chars=1500):
+    """Where a symbol is defined, who calls it and what it calls, as a note for the model"""
+    refs = find_references(symbol)
+    if not refs['definitions']:
+        return ""
+    notes = [f"{symbol} is defined at " + ", ".join(
+        f"{d['file']}:{d['line']}-{d['end_line']} ({d['kind']})" for d in refs['definitions'])]
+    if refs['callers']:
+        notes.append("Called from: " + ", ".join(f"{c['file']}:{c['scope']}" for c in refs['callers']))
+    if refs['callees']:
+        signatures = []
+        for name in refs['callees']:
+            for definition in xref.definitions(name)[:1]:
+                lines = fs.read_file(definition['file']).get('content', '').split('\n')
+                signatures.append(f"{definition['file']}:{definition['def_line']}: "
+                                  f"{lines[definition['def_line'] - 1].strip()}")
+        notes.append("It calls:\n" + "\n".join(signatures))
+    return "\n".join(notes)[:max_chars]
+
+def mentioned_symbols(text):
+    """Code-looking identifiers in text that name workspace definitions"""
+    sync_xref()
+    candidates = re.findall(r"`([A-Za-z_][\w.]*)`|([A-Za-z_][\w.]*)\(\)|\b([A-Za-z_]\w*(?:[._]\w+|[a-z][A-Z]\w*))\b", text)
+    symbols = []
+    for groups in candidates:
+        name = next(g for g in groups if g)
+        if not name.endswith('.py') and name not in symbols and xref.definitions(name):
+            symbols.append(name)
+    return symbols
+
+def dependency_report(file_path=None):
+    """Import graph answers: a file's impact, or workspace-wide cycles"""
+    sync_import_graph()
+    if not file_path:
+        return {"success": True, "files": len(import_graph), "cycles": import_graph.cycles()}
+    rel_path = workspace_relpath(file_path)
+    if rel_path not in import_graph:
+        return {"error": f"Not a workspace Python file: {file_path}"}
+    return {
+        "success": True,
+        "imports": sorted(import_graph.imports_of(rel_path)),
+        "all_imports": sorted(import_graph.dependencies([rel_path])),
+        **import_graph.impact(rel_path)
+    }
+
+def code_metrics(file_path=None, top=10):
+    """Riskiest workspace files, or one file's per-function metrics"""
+    with tracer.span("metrics.collect") as span:
+        results, stats = metrics_engine.collect(fs.workspace_dir)
+        for name, value in stats.items():
+            span.set_attribute(name, value)
+    if file_path:
+        rel_path = workspace_relpath(file_path)
+        if rel_path not in results:
+            return {"error": f"Not a workspace Python file: {file_path}"}
+        return {"success": True, "file": rel_path, **results[rel_path]}
+    return {
+        "success": True,
+        **stats,
+        "hot": [{"file": path, **{k: v for k, v in m.items() if k != "functions"}} for path, m in hot_files(results, top)],
+        "errors": {path: m['error'] for path, m in results.items() if "error" in m},
+    }
+
+def run_tests(test_paths):
+    """Run test files in parallel in the sandbox"""
+    if importlib.util.find_spec("pytest"):
+        module, options = "pytest", ["-q", "-p", "no:cacheprovider"]
+    else:
+        module, options = "unittest", []
+    
+    def run_one(path):
+        unsafe = fs.find_unsafe_patterns(fs.read_file(path).get('content', ''))
+        if unsafe:
+            return {"test": path, "success": False, "exit_code": None, "duration": 0.0,
+                    "summary": f"refused: matches unsafe patterns {', '.join(unsafe)}", "output": ""}
+        result = sandbox.run(module=module, args=options + [path], cwd=fs.workspace_dir)
+        output = (result['stdout'] + result['stderr']).strip()
+        lines = output.splitlines()
+        return {
+            "test": path,
+            # pytest exits 5 when a file has no tests, which is not a failure
+            "success": result['success'] or (module == "pytest" and result['exit_code'] == 5),
+            "exit_code": result['exit_code'],
+            "duration": result['duration'],
+            "summary": "timed out" if result['timed_out'] else (lines[-1] if lines else ""),
+            "output": "\n".join(lines[-40:]),
+        }
+    
+    with ThreadPoolExecutor(max_workers=sandbox.workers) as pool:
+        return list(pool.map(tracer.bind(run_one), test_paths))
+
+def after_write(file_path):
+    """Re-index a written Python file and run the tests it affects
+
+    Returns the test results, or None when test impact does not apply.
+    """
+    if not TEST_IMPACT or not file_path.endswith('.py'):
+        return None
+    sync_import_graph()
+    rel_path = workspace_relpath(file_path)
+    tests = import_graph.affected_tests([rel_path])
+    if not tests:
+        return []
+    with tracer.span("tests.impact", changed=rel_path, tests=len(tests)):
+        return run_tests(tests)
+
+def write_and_test(file_path, content):
+    """Write a file, then run the tests affected by it"""
+    result = fs.write_file(file_path, content)
+    if "error" not in result:
+        tests = after_write(file_path)
+        if tests is not None:
+            result['tests'] = tests
+    return result
+
+def report_tests(tests):
+    if not tests:
+        return
+    passed = sum(1 for t in tests if t['success'])
+    print(f"🧪 {len(tests)} affected test file(s): {passed} passed, {len(tests) - passed} failed")
+    for test in tests:
+        icon = "✅" if test['success'] else "❌"
+        print(f"  {icon} {test['test']} ({test['duration'] * 1000:.0f} ms) {test['summary']}")
+        if not test['success'] and test['output']:
+            print("\n".join("      " + line for line in test['output'].splitlines()[-15:]))
+
+def build_edit_prompt(file_path, instructions, current_content):
+    """Prompt asking the coder persona to rewrite a file"""
+    return f"""Edit this file according to these instructions:
+    
+    File: {file_path}
+    Instructions: {instructions}
+    
+    Current content:
+    ```python
+    {current_content[:1000]}  # First 1000 chars
+    ```
+    
+    Return the COMPLETE new file content. Only output the code, no explanations."""
+
+def build_symbol_edit_prompt(target, kind, instructions, current_code):
+    """Prompt asking the coder persona to rewrite one function or class"""
+    return f"""Edit this {kind} according to these instructions:
+    
+    Symbol: {target}
+    Instructions: {instructions}
+    
+    Current code:
+    ```python
+    {current_code}
+    ```
+    
+    Return the COMPLETE new code of this {kind} only, keeping its name. Only output the code, no explanations."""
+
+def edit_symbol(target, instructions):
+    """Edit one function or class with the AI and splice it back into its file"""
+    file_path, symbol = split_target(target)
+    read_result = fs.read_file(file_path)
+    if "error" in read_result:
+        return {"error": f"Error reading file: {read_result['error']}"}
+    
+    current_content = read_result['content']
+    try:
+        span, current_code = extract(current_content, symbol or "")
+    except SyntaxError as e:
+        return {"error": f"Cannot parse {file_path}: line {e.lineno}: {e.msg}"}
+    if span is None:
+        return {"error": f"No function or class {symbol} in {file_path}"}
+    
+    try:
+        reply = coding_agent(
+            build_symbol_edit_prompt(target, span['kind'], instructions, current_code),
+            context=current_code,
+            file_context=symbol_context(symbol) or None,
+            persona="coder",
+            task_type="edit",
+            quality="high"
+        )
+    except Exception as e:
+        return {"error": f"AI editing failed: {str(e)}"}
+    
+    new_code = strip_fences(reply)
+    try:
+        new_content = splice(current_content, span, new_code)
+    except SyntaxError as e:
+        return {"error": f"Edited {symbol} does not parse (line {e.lineno}: {e.msg}); file left unchanged"}
+    
+    write_result = write_and_test(file_path, new_content)
+    if "error" in write_result:
+        return {"error": f"Error saving: {write_result['error']}"}
+    
+    result = {
+        "success": True,
+        "path": write_result['path'],
+        "symbol": symbol,
+        "start": span['start'],
+        "size": len(new_content),
+        "old_size": len(current_content),
+        "lines_changed": abs(len(new_code.split('\n')) - len(current_code.split('\n')))
+    }
+    if 'tests' in write_result:
+        result['tests'] = write_result['tests']
+    return result
+
+def edit_file(file_path, instructions):
+    """Edit a workspace file (or one symbol of it, file.py::name) with the AI and write the result back"""
+    if "::" in file_path:
+        return edit_symbol(file_path, instructions)
+    
+    read_result = fs.read_file(file_path)
+    if "error" in read_result:
+        return {"error": f"Error reading file: {read_result['error']}"}
+    
+    current_content = read_result['content']
+    related = dependency_context(file_path) if file_path.endswith('.py') else ""
+    try:
+        new_content = coding_agent(
+            build_edit_prompt(file_path, instructions, current_content),
+            context=current_content,
+            file_context=related or None,
+            persona="coder",
+            task_type="edit",
+            quality="high"
+        )
+    except Exception as e:
+        return {"error": f"AI editing failed: {str(e)}"}
+    
+    write_result = write_and_test(file_path, new_content)
+    if "error" in write_result:
+        return {"error": f"Error saving: {write_result['error']}"}
+    
+    old_lines = current_content.split('\n')
+    new_lines = new_content.split('\n')
+    result = {
+        "success": True,
+        "path": write_result['path'],
+        "size": len(new_content),
+        "old_size": len(current_content),
+        "lines_changed": abs(len(new_lines) - len(old_lines))
+    }
+    if 'tests' in write_result:
+        result['tests'] = write_result['tests']
+    return result
+
+def find_file_reference(text):
+    """Return the first word of text that looks like a file path, if any"""
+    for word in text.split():
+        if '.' in word and not word.startswith('.'):
+            # Might be a file reference
+            possible_file = word.strip('.,!?;:"\'')
+            if os.path.exists(possible_file) or '/' in possible_file:
+                return possible_file
+    return None
+
+def question_context(question):
+    """File context for a free-form question that mentions a file or workspace symbols"""
+    file_mentioned = find_file_reference(question)
+    names = mentioned_symbols(question)[:3]
+    symbols = "\n\n".join(filter(None, (symbol_context(name) for name in names)))
+    if not file_mentioned:
+        if symbols:
+            return f"Symbols mentioned:\n{symbols}", {"symbols": names}
+        return None, {}
+    
+    read_result = fs.read_file(file_mentioned)
+    if "error" in read_result:
+        return None, {"file": file_mentioned, "file_error": read_result['error']}
+    
+    file_context = f"File '{file_mentioned}' content:\n{read_result['content'][:2000]}"
+    if file_mentioned.endswith('.py'):
+        related = dependency_context(file_mentioned)
+        if related:
+            file_context += f"\n\nRelated modules:\n{related}"
+    if symbols:
+        file_context += f"\n\nSymbols mentioned:\n{symbols}"
+    return file_context, {"file": file_mentioned, "file_chars": len(read_result['content'])}
+
+def ask_agent(question, persona="coder", temperature=None):
+    """Answer a coding question, adding context from any file it mentions"""
+    file_context, info = question_context(question)
+    answer = coding_agent(question, file_context=file_context, persona=persona, temperature=temperature,
+                          recall=ARCHIVE_RECALL)
+    return {"success": True, "answer": answer, **info}
+
+def ask_agent_stream(question, persona="coder", temperature=None):
+    """Streaming variant of ask_agent; yields text chunks"""
+    file_context, _ = question_context(question)
+    yield from coding_agent_stream(question, file_context=file_context, persona=persona, temperature=temperature,
+                                   recall=ARCHIVE_RECALL)
+
+def review_code_stream(target):
+    """Streaming variant of review_code; yields text chunks"""
+    resolved = resolve_review_target(target)
+    if "error" in resolved:
+        raise ValueError(resolved['error'])
+    yield from coding_agent_stream(**review_request(resolved))
+
+def instrumented(name, operation):
+    """Wrap an operation in the same metrics and tracing as a REPL command"""
+    def run(params):
+        with telemetry.command(name), tracer.span(f"api.{name}"):
+            return operation(params)
+    return run
+
+def instrumented_stream(name, stream):
+    """Streaming variant of instrumented; the span lasts until the stream ends"""
+    def run(params):
+        with telemetry.command(name), tracer.span(f"api.{name}"):
+            yield from stream(params)
+    return run
+
+# Parameters each API operation needs, and the operations safe to call with GET
+API_REQUIRED = {
+    "chat": ("message",), "review": ("target",), "edit": ("file", "instructions"), "read": ("file",),
+    "analyze": ("file",), "run": ("file",), "refs": ("symbol",),
+}
+API_READ_ONLY = {"list", "read", "analyze", "deps", "refs", "metrics"}
+
+def api_operations():
+    """Operations (and streaming variants) exposed by the headless server"""
+    operations = {
+        "chat": lambda p: ask_agent(p["message"], p.get("persona", "coder"), p.get("temperature")),
+        "review": lambda p: review_code(p["target"]),
+        "edit": lambda p: edit_file(p["file"], p["instructions"]),
+        "list": lambda p: fs.list_files(p.get("dir", ".")),
+        "read": lambda p: read_target(p["file"]),
+        "analyze": lambda p: fs.analyze_file(p["file"]),
+        "run": lambda p: run_file(p["file"], p.get("args", [])),
+        "deps": lambda p: dependency_report(p.get("file")),
+        "refs": lambda p: find_references(p["symbol"]),
+        "metrics": lambda p: code_metrics(p.get("file"), int(p.get("top", 10))),
+    }
+    streams = {
+        "chat": lambda p: ask_agent_stream(p["message"], p.get("persona", "coder"), p.get("temperature")),
+        "review": lambda p: review_code_stream(p["target"]),
+    }
+    return (
+        {name: instrumented(name, op) for name, op in operations.items()},
+        {name: instrumented_stream(name, op) for name, op in streams.items()},
+    )
+
+def batch_operations():
+    """Operations available to --batch scripts"""
+    operations, _ = api_operations()
+    extra = {
+        "write": lambda p: write_and_test(p["file"], p.get("content", "")),
+        "create": lambda p: write_and_test(p["file"], p.get("content", "")),
+    }
+    operations.update({name: instrumented(name, op) for name, op in extra.items()})
+    operations["ask"] = operations["chat"]
+    return operations
+
+def run_batch(path, output_path=None, jobs=8):
+    """Run a script or JSONL file of commands and write JSONL results"""
+    commands = load_commands(path)
+    output = open(output_path, "w", encoding="utf-8") if output_path else sys.stdout
+    log = sys.stderr if output is sys.stdout else sys.stdout
+    print(f"📋 Running {len(commands)} commands with up to {jobs} at a time", file=log)
+    
+    start = time.perf_counter()
+    try:
+        with tracer.span("batch", commands=len(commands), jobs=jobs):
+            operations = {name: tracer.bind(op) for name, op in batch_operations().items()}
+            results = BatchRunner(operations, jobs=jobs, output=output).run(commands)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    
+    counts = summarize(results)
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"✅ Batch finished in {time.perf_counter() - start:.2f}s: {summary}", file=log)
+    if metrics_file:
+        telemetry.export(metrics_file)
+    return 0 if counts.get("ok", 0) == len(results) else 1
 
 def interactive_agent():
     """CLI for the agent with file operations"""
@@ -280,261 +1109,594 @@ def interactive_agent():
     
     while True:
         user_input = input("\n> ").strip()
-        
-        if user_input.lower() == 'quit':
-            print("Goodbye!")
+        if not run_command(user_input):
             break
+
+def run_command(user_input):
+    """Run one command with metrics, tracing and profiling around it"""
+    command = command_name(user_input)
+    with telemetry.command(command), tracer.span(f"command.{command}", input=user_input[:200]):
+        with profiler.profile(command):
+            keep_going = handle_command(user_input)
+    
+    if metrics_file:
+        telemetry.export(metrics_file)
+    return keep_going
+
+def command_name(user_input):
+    """Name of the REPL command used for metrics (free-form questions are 'ask')"""
+    word = user_input.split(' ', 1)[0].lower() if user_input else ""
+    return word if word in REPL_COMMANDS else "ask"
+
+def handle_command(user_input):
+    """Run one REPL command; returns False when the session should end"""
+    if user_input.lower() == 'quit':
+        print("Goodbye!")
+        return False
+    
+    elif user_input.lower() == 'help':
+        print("\n📚 COMMANDS:")
+        print("  help                    - Show this help")
+        print("  quit                    - Exit")
+        print("  test                    - Test agent")
+        print("  read <file>             - Read a file (file.py::Class.method for one symbol)")
+        print("  write <file> <content>  - Write to file")
+        print("  create <file> [content] - Create new file")
+        print("  list [dir]              - List files")
+        print("  analyze <file>          - Analyze Python file")
+        print("  review <file/code>      - Review code (file.py::name for one symbol)")
+        print("  architect <task>        - Use architect")
+        print("  edit <file> <instructions> - Edit file with AI (file.py::name edits one symbol)")
+        print("  run <file> [args]       - Run a Python file in the sandbox")
+        print("  deps [file]             - Import graph: what a file uses and what breaks if it changes")
+        print("  find-refs <symbol>      - Definitions, callers and uses of a name (or Class.method)")
+        print("  metrics [n|file]        - Riskiest files by complexity, size and churn, or one file's functions")
+        print("  models                  - Show model routing stats")
+        print("  stats [export <file>]   - Show or export metrics")
+        print("  trace [n]               - Show timing waterfall of last n commands")
+        print("  profile on|off [cpu|memory|all] - Profile each command")
+        print("  todos [status]          - Show the task list")
+        print("  todos add <task>        - Add a task")
+        print("  todos start|done|reset <id> - Change a task's status")
+        print("  todos rm <id>           - Remove a task")
+        print("  todos dep|undep <id> <ids...> - Make a task wait (or stop waiting) for other tasks")
+        print("  todos run [n]           - Work open tasks with the agent, n at a time")
+        print("  todos show <id>         - Show a task's result")
+        print("  todos import|export [file] - Sync with a todos.json file")
+        print("  search <words>          - Search past answers (search #<id> shows one)")
+        print("  Or ask any coding question!")
+        return True
+    
+    elif user_input.lower() == 'test':
+        print("\n🧪 Testing agent...")
+        result = coding_agent(
+            "Write Python function to check prime numbers",
+            persona="coder",
+            task_type="test"
+        )
+        print(f"\n{result}")
+    
+    elif user_input.lower() == 'models':
+        summary = router.summary()
+        print("\n🧭 Model routing:")
+        if not summary['models']:
+            print("  No model calls yet")
+            return True
+        for model, stats in summary['models'].items():
+            print(f"  • {model:24} {stats['calls']} calls, {stats['errors']} errors, "
+                  f"avg {stats['avg_latency']:.2f}s, ${stats['cost']:.4f}")
+        print(f"💰 Total cost: ${summary['total_cost']:.4f} "
+              f"(saved ~${summary['total_saved']:.4f} vs {router.default_model})")
+        print(f"🪁 Transport: {transport.stats['calls']} calls, {transport.stats['hedged']} hedged "
+              f"({transport.stats['hedge_wins']} hedge wins), {transport.stats['skipped']} skipped")
+        for model, state in transport.breaker.status().items():
+            print(f"  ⚡ {model}: circuit {state['state']} ({state['failures']} failures)")
+    
+    elif user_input.lower().startswith('stats'):
+        args = user_input[5:].strip().split()
+        if args and args[0] == 'export':
+            path = args[1] if len(args) > 1 else state_path("metrics.prom")
+            print(f"✅ Metrics written to {telemetry.export(path)}")
+            return True
         
-        elif user_input.lower() == 'help':
-            print("\n📚 COMMANDS:")
-            print("  help                    - Show this help")
-            print("  quit                    - Exit")
-            print("  test                    - Test agent")
-            print("  read <file>             - Read a file")
-            print("  write <file> <content>  - Write to file")
-            print("  create <file> [content] - Create new file")
-            print("  list [dir]              - List files")
-            print("  analyze <file>          - Analyze Python file")
-            print("  review <file/code>      - Review code")
-            print("  architect <task>        - Use architect")
-            print("  edit <file>             - Edit file with AI")
-            print("  Or ask any coding question!")
-            continue
-        
-        elif user_input.lower() == 'test':
-            print("\n🧪 Testing agent...")
-            result = coding_agent(
-                "Write Python function to check prime numbers",
-                persona="coder"
-            )
-            print(f"\n{result}")
-        
-        # ===== FILE OPERATIONS =====
-        elif user_input.lower().startswith('read '):
-            file_path = user_input[5:].strip()
-            if not file_path:
-                print("❌ Please provide file path")
+        snapshot = telemetry.snapshot()
+        print("\n📈 Command latency:")
+        for hist in snapshot['histograms']:
+            if hist['name'] != 'agent_command_latency_seconds':
                 continue
-            
-            print(f"\n📖 Reading {file_path}...")
-            result = fs.read_file(file_path)
-            
-            if "error" in result:
-                print(f"❌ Error: {result['error']}")
-            else:
-                print(f"✅ File: {result['path']}")
-                print(f"Size: {result['size']} chars, Lines: {result['lines']}")
-                print("-" * 60)
-                # Show first 500 chars
-                preview = result['content']
-                if len(preview) > 500:
-                    preview = preview[:500] + "...\n[Truncated]"
-                print(preview)
-                print("-" * 60)
-        
-        elif user_input.lower().startswith('write '):
-            parts = user_input[6:].strip().split(' ', 1)
-            if len(parts) < 2:
-                print("❌ Usage: write <file> <content>")
+            print(f"  • {hist['labels']['command']:12} {hist['count']:5} runs  "
+                  f"avg {hist['avg']:.3f}s  p50≤{hist['p50']}s  p95≤{hist['p95']}s")
+        
+        print("\n🧠 Model calls by persona:")
+        for hist in snapshot['histograms']:
+            if hist['name'] != 'agent_call_latency_seconds':
                 continue
-            
-            file_path, content = parts
-            print(f"\n✏️ Writing to {file_path}...")
-            result = fs.write_file(file_path, content)
-            
-            if "error" in result:
-                print(f"❌ Error: {result['error']}")
-            else:
-                print(f"✅ {result['message']}")
+            labels = hist['labels']
+            print(f"  • {labels['persona']:10} {labels['model']:24} {hist['count']:5} calls  "
+                  f"avg {hist['avg']:.2f}s  p95≤{hist['p95']}s")
         
-        elif user_input.lower().startswith('create '):
-            parts = user_input[7:].strip().split(' ', 1)
-            file_path = parts[0]
-            content = parts[1] if len(parts) > 1 else ""
-            
-            print(f"\n📝 Creating {file_path}...")
-            result = fs.create_file(file_path, content)
-            
-            if "error" in result:
-                print(f"❌ Error: {result['error']}")
-            else:
-                print(f"✅ File created: {result['path']}")
-                if content:
-                    print(f"   With {len(content)} characters of content")
-        
-        elif user_input.lower().startswith('list'):
-            dir_path = user_input[5:].strip() or "."
-            print(f"\n📁 Listing files in {dir_path}...")
-            result = fs.list_files(dir_path)
+        input_tokens = telemetry.totals("agent_input_tokens_total", "persona")
+        output_tokens = telemetry.totals("agent_output_tokens_total", "persona")
+        for persona in sorted(set(input_tokens) | set(output_tokens)):
+            print(f"  🔢 {persona}: {input_tokens.get(persona, 0)} in / {output_tokens.get(persona, 0)} out tokens")
+        
+        cache_hits = sum(telemetry.totals("agent_cache_hits_total", "source").values())
+        errors = sum(telemetry.totals("agent_call_errors_total", "persona").values())
+        print(f"\n♻️  Cache hits: {cache_hits}   ❌ Call errors: {errors}")
+    
+    elif user_input.lower().startswith('trace'):
+        count = user_input[5:].strip()
+        if count and (not count.isdigit() or int(count) < 1):
+            print("❌ Usage: trace [number of traces]")
+            return True
+        traces = load_traces(trace_file, limit=int(count) if count else 3)
+        if not traces:
+            print("❌ No traces recorded (tracing is off unless AGENT_TRACE=1)")
+            return True
+        
+        for spans in traces:
+            print("-" * 100)
+            for line in render_waterfall(spans, width=40):
+                print(line)
+        print("-" * 100)
+    
+    elif user_input.lower().startswith('profile'):
+        args = user_input[7:].strip().lower().split()
+        if not args:
+            mode = ", ".join(m for m, on in (("cpu", profiler.cpu), ("memory", profiler.memory)) if on)
+            print(f"🔬 Profiling: {mode or 'off'} (reports in {profiler.output_dir})")
+        elif args[0] == 'on':
+            target = args[1] if len(args) > 1 else 'cpu'
+            if target not in ('cpu', 'memory', 'all'):
+                print("❌ Usage: profile on [cpu|memory|all]")
+                return True
+            profiler.enable(cpu=target in ('cpu', 'all'), memory=target in ('memory', 'all'))
+            print(f"🔬 Profiling enabled ({target}), reports in {profiler.output_dir}")
+        elif args[0] == 'off':
+            profiler.disable()
+            print("🔬 Profiling disabled")
+        else:
+            print("❌ Usage: profile on|off [cpu|memory|all]")
+    
+    elif user_input.lower().startswith('todos'):
+        handle_todos(user_input[5:].strip())
+    
+    elif user_input.lower().startswith('search'):
+        query = user_input[6:].strip()
+        if query.startswith('#') and query[1:].isdigit():
+            entry = archive.get(int(query[1:]))
+            if not entry:
+                print(f"❌ No archived exchange {query}")
+                return True
+            print(f"\n🗄️  #{entry['id']} {time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['created']))} "
+                  f"({entry['persona']}, {entry['model']})")
+            print(f"❓ {entry['task']}\n")
+            print(entry['response'])
+            return True
+        if not query:
+            stats = archive.stats()
+            print(f"🗄️  {stats['exchanges']} archived exchanges ({stats['stored'] / 1024:.1f} KB compressed, "
+                  f"{stats['input_tokens']} input / {stats['output_tokens']} output tokens)")
+            return True
+        
+        start = time.perf_counter()
+        hits = archive.search(query)
+        elapsed = (time.perf_counter() - start) * 1000
+        if not hits:
+            print(f"🔍 No archived answers match '{query}' ({elapsed:.1f} ms)")
+            return True
+        print(f"\n🔍 {len(hits)} matches ({elapsed:.1f} ms):")
+        for hit in hits:
+            when = time.strftime('%Y-%m-%d %H:%M', time.localtime(hit['created']))
+            print(f"  #{hit['id']:<5} {when}  {hit['task'][:70]}")
+            print(f"         {hit['snippet']}")
+    
+    # ===== FILE OPERATIONS =====
+    elif user_input.lower().startswith('read '):
+        file_path = user_input[5:].strip()
+        if not file_path:
+            print("❌ Please provide file path")
+            return True
+        
+        print(f"\n📖 Reading {file_path}...")
+        result = read_target(file_path)
+        
+        if "error" in result:
+            print(f"❌ Error: {result['error']}")
+        elif "symbol" in result:
+            print(f"✅ {result['symbol']} in {result['path']} (lines {result['start']}-{result['end']})")
+            print("-" * 60)
+            for number, line in enumerate(result['content'].split('\n'), result['start']):
+                print(f"{number:5} | {line}")
+            print("-" * 60)
+        else:
+            print(f"✅ File: {result['path']}")
+            print(f"Size: {result['size']} chars, Lines: {result['lines']}")
+            print("-" * 60)
+            # Show first 500 chars
+            preview = result['content']
+            if len(preview) > 500:
+                preview = preview[:500] + "...\n[Truncated]"
+            print(preview)
+            print("-" * 60)
+    
+    elif user_input.lower().startswith('write '):
+        parts = user_input[6:].strip().split(' ', 1)
+        if len(parts) < 2:
+            print("❌ Usage: write <file> <content>")
+            return True
+        
+        file_path, content = parts
+        print(f"\n✏️ Writing to {file_path}...")
+        result = write_and_test(file_path, content)
+        
+        if "error" in result:
+            print(f"❌ Error: {result['error']}")
+        else:
+            print(f"✅ {result['message']}")
+            report_tests(result.get('tests'))
+    
+    elif user_input.lower().startswith('create '):
+        parts = user_input[7:].strip().split(' ', 1)
+        file_path = parts[0]
+        content = parts[1] if len(parts) > 1 else ""
+        
+        print(f"\n📝 Creating {file_path}...")
+        result = write_and_test(file_path, content)
+        
+        if "error" in result:
+            print(f"❌ Error: {result['error']}")
+        else:
+            print(f"✅ File created: {result['path']}")
+            if content:
+                print(f"   With {len(content)} characters of content")
+            report_tests(result.get('tests'))
+    
+    elif user_input.lower().startswith('list'):
+        dir_path = user_input[5:].strip() or "."
+        print(f"\n📁 Listing files in {dir_path}...")
+        result = fs.list_files(dir_path)
+        
+        if "error" in result:
+            print(f"❌ Error: {result['error']}")
+        else:
+            print(f"✅ Directory: {result['directory']}")
+            print(f"Found {result['count']} files:")
+            print("-" * 60)
+            for file_info in result['files'][:20]:  # Show first 20
+                size_kb = file_info['size'] / 1024
+                print(f"{file_info['path']:40} ({size_kb:.1f} KB)")
             
-            if "error" in result:
-                print(f"❌ Error: {result['error']}")
-            else:
-                print(f"✅ Directory: {result['directory']}")
-                print(f"Found {result['count']} files:")
-                print("-" * 60)
-                for file_info in result['files'][:20]:  # Show first 20
-                    size_kb = file_info['size'] / 1024
-                    print(f"{file_info['path']:40} ({size_kb:.1f} KB)")
-                
-                if result['count'] > 20:
-                    print(f"... and {result['count'] - 20} more files")
-                print("-" * 60)
-        
-        elif user_input.lower().startswith('analyze '):
-            file_path = user_input[8:].strip()
-            if not file_path:
-                print("❌ Please provide file path")
-                continue
+            if result['count'] > 20:
+                print(f"... and {result['count'] - 20} more files")
+            print("-" * 60)
+    
+    elif user_input.lower().startswith('analyze '):
+        file_path = user_input[8:].strip()
+        if not file_path:
+            print("❌ Please provide file path")
+            return True
+        
+        print(f"\n🔍 Analyzing {file_path}...")
+        result = fs.analyze_file(file_path)
+        
+        if "error" in result:
+            print(f"❌ Error: {result['error']}")
+        elif not result.get("valid_python", True):
+            print(f"⚠️  {result['error']}")
+        else:
+            print(f"✅ Valid Python file: {result['path']}")
+            print(f"📊 Analysis: {result['analysis']}")
             
-            print(f"\n🔍 Analyzing {file_path}...")
-            result = fs.analyze_file(file_path)
+            if result['functions']:
+                print("\n📋 Functions:")
+                for func in result['functions'][:5]:  # Show first 5
+                    args = ', '.join(func['args'])
+                    name = f"{func['owner']}.{func['name']}" if func['owner'] else func['name']
+                    prefix = "async " if func['async'] else ""
+                    print(f"  • {prefix}{name}({args}) (lines {func['line']}-{func['end_line']})")
             
-            if "error" in result:
-                print(f"❌ Error: {result['error']}")
-            elif not result.get("valid_python", True):
-                print(f"⚠️  {result['error']}")
-            else:
-                print(f"✅ Valid Python file: {result['path']}")
-                print(f"📊 Analysis: {result['analysis']}")
-                
-                if result['functions']:
-                    print("\n📋 Functions:")
-                    for func in result['functions'][:5]:  # Show first 5
-                        args = ', '.join(func['args'])
-                        print(f"  • {func['name']}({args}) (line {func['line']})")
-                
-                if result['classes']:
-                    print("\n🏗️ Classes:")
-                    for cls in result['classes'][:5]:
-                        print(f"  • {cls['name']} (line {cls['line']})")
-                
-                if result['imports']:
-                    print("\n📦 Imports:")
-                    for imp in result['imports'][:10]:  # Show first 10
-                        print(f"  • {imp}")
-        
-        elif user_input.lower().startswith('review'):
-            # Check if it's a file or inline code
-            target = user_input[7:].strip()
+            if result['classes']:
+                print("\n🏗️ Classes:")
+                for cls in result['classes'][:5]:
+                    print(f"  • {cls['name']} (lines {cls['line']}-{cls['end_line']})")
             
-            if os.path.exists(target) or '/' in target or '.' in target:
-                # It's probably a file path
-                print(f"\n🔍 Reviewing file: {target}")
-                read_result = fs.read_file(target)
-                
-                if "error" in read_result:
-                    print(f"❌ Error reading file: {read_result['error']}")
-                    continue
-                
-                context = read_result['content']
-                print(f"📄 Read {len(context)} characters from file")
+            if result['imports']:
+                print("\n📦 Imports:")
+                for imp in result['imports'][:10]:  # Show first 10
+                    print(f"  • {imp}")
+    
+    elif user_input.lower().startswith('review'):
+        # Check if it's a file or inline code
+        target = user_input[7:].strip()
+        if not target:
+            print("❌ Please provide code or file path to review")
+            return True
+        
+        print("🤖 Analyzing with AI reviewer...")
+        result = review_code(target)
+        if "error" in result:
+            print(f"❌ {result['error']}")
+            return True
+        
+        if result['source'] == 'symbol':
+            print(f"\n🔍 Reviewed {target} ({result['chars']} characters)")
+        elif result['source'] == 'file':
+            print(f"\n🔍 Reviewed file: {target} ({result['chars']} characters)")
+            if result.get('reused'):
+                total = len(result['reviewed']) + len(result['reused'])
+                print(f"♻️  Re-reviewed {len(result['reviewed'])} of {total} symbols "
+                      f"({result['chars_sent']} of {result['chars_total']} chars), cached findings for the rest")
+        else:
+            print(f"\n🔍 Reviewed code ({result['chars']} chars)")
+        print(f"\n{result['review']}")
+    
+    elif user_input.lower().startswith('edit '):
+        # AI-powered file editing
+        parts = user_input[5:].strip().split(' ', 1)
+        if len(parts) < 2:
+            print("❌ Usage: edit <file> <instructions>")
+            return True
+        
+        file_path, instructions = parts
+        print(f"\n✏️ Editing {file_path} with AI...")
+        print("🤖 AI is editing the file...")
+        result = edit_file(file_path, instructions)
+        
+        if "error" in result:
+            print(f"❌ {result['error']}")
+        else:
+            print(f"✅ File updated: {result['path']}")
+            print(f"   New size: {result['size']} characters")
+            print(f"   Lines changed: {result['lines_changed']}")
+            report_tests(result.get('tests'))
+    
+    elif user_input.lower().startswith('run '):
+        parts = user_input[4:].split()
+        if not parts:
+            print("❌ Usage: run <file> [args]")
+            return True
+        
+        result = run_file(parts[0], parts[1:])
+        if "error" in result:
+            print(f"❌ {result['error']}")
+            return True
+        
+        if result['stdout']:
+            print(result['stdout'].rstrip())
+        if result['stderr']:
+            print(result['stderr'].rstrip())
+        if result['timed_out']:
+            print(f"⏱️  Timed out after {result['duration']:.2f}s")
+        elif result['success']:
+            print(f"✅ Exited 0 in {result['duration'] * 1000:.0f} ms")
+        else:
+            print(f"❌ Exited {result['exit_code']} in {result['duration'] * 1000:.0f} ms")
+        if result['truncated']:
+            print("✂️  Output truncated")
+    
+    elif user_input.lower() == 'deps' or user_input.lower().startswith('deps '):
+        file_path = user_input[5:].strip()
+        result = dependency_report(file_path or None)
+        if "error" in result:
+            print(f"❌ {result['error']}")
+            return True
+        
+        if not file_path:
+            print(f"\n🕸️  Import graph: {result['files']} Python files")
+            if result['cycles']:
+                print(f"🔁 {len(result['cycles'])} import cycle(s):")
+                for group in result['cycles']:
+                    cycle = group['cycle']
+                    print(f"  • {' → '.join(cycle + cycle[:1])}")
+                    others = [f for f in group['files'] if f not in cycle]
+                    if others:
+                        print(f"    also in this import loop: {', '.join(others)}")
             else:
-                # It's inline code
-                context = target
-                if not context:
-                    print("❌ Please provide code or file path to review")
-                    continue
-                print(f"\n🔍 Reviewing code ({len(context)} chars)...")
-            
-            print("🤖 Analyzing with AI reviewer...")
-            result = coding_agent(
-                "Review this code for security issues, bugs, and improvements",
-                context=context,
-                persona="reviewer"
-            )
-            print(f"\n{result}")
-        
-        elif user_input.lower().startswith('edit '):
-            # AI-powered file editing
-            parts = user_input[5:].strip().split(' ', 1)
-            if len(parts) < 2:
-                print("❌ Usage: edit <file> <instructions>")
-                continue
-            
-            file_path, instructions = parts
-            print(f"\n✏️ Editing {file_path} with AI...")
-            
-            # Read current file
-            read_result = fs.read_file(file_path)
-            if "error" in read_result:
-                print(f"❌ Error reading file: {read_result['error']}")
-                continue
-            
-            current_content = read_result['content']
-            print(f"📄 Current file: {len(current_content)} characters")
-            
-            # Ask AI to edit
-            edit_prompt = f"""Edit this file according to these instructions:
-            
-            File: {file_path}
-            Instructions: {instructions}
-            
-            Current content:
-            ```python
-            {current_content[:1000]}  # First 1000 chars
-            ```
-            
-            Return the COMPLETE new file content. Only output the code, no explanations."""
-            
-            print("🤖 AI is editing the file...")
-            try:
-                new_content = coding_agent(edit_prompt, context=current_content, persona="coder")
-                
-                # Write edited content
-                write_result = fs.write_file(file_path, new_content)
-                if "error" in write_result:
-                    print(f"❌ Error saving: {write_result['error']}")
-                else:
-                    print(f"✅ File updated: {write_result['path']}")
-                    print(f"   New size: {len(new_content)} characters")
-                    
-                    # Show diff summary
-                    old_lines = current_content.split('\n')
-                    new_lines = new_content.split('\n')
-                    print(f"   Lines changed: {abs(len(new_lines) - len(old_lines))}")
-            
-            except Exception as e:
-                print(f"❌ AI editing failed: {str(e)}")
+                print("✅ No import cycles")
+            return True
         
-        elif user_input.lower().startswith('architect'):
-            task = user_input[10:].strip()
-            if not task:
-                print("❌ Please provide a task for the architect")
-                continue
-            
-            print("\n🏗️ Architect thinking...")
-            result = coding_agent(task, persona="architect")
-            print(f"\n{result}")
+        print(f"\n🕸️  {result['file']}")
+        print(f"  📥 Imports: {', '.join(result['imports']) or '(no workspace modules)'}")
+        if len(result['all_imports']) > len(result['imports']):
+            print(f"     …transitively: {', '.join(result['all_imports'])}")
+        print(f"  📤 Imported by: {', '.join(result['direct']) or '(nothing)'}")
+        print(f"💥 Changing it may break {len(result['transitive'])} file(s): {', '.join(result['transitive']) or '-'}")
+        print(f"🧪 Tests to run: {', '.join(result['tests']) or '(none)'}")
+    
+    elif user_input.lower() == 'metrics' or user_input.lower().startswith('metrics '):
+        arg = user_input[8:].strip()
+        start = time.perf_counter()
+        result = code_metrics(None if arg.isdigit() else arg or None, int(arg) if arg.isdigit() else 10)
+        elapsed = (time.perf_counter() - start) * 1000
+        if "error" in result:
+            print(f"❌ {result['error']}")
+            return True
+        
+        if "file" in result:
+            print(f"\n📏 {result['file']}: risk {result['risk']}, {result['sloc']} code lines, "
+                  f"{len(result['functions'])} functions, {result['docstring_coverage']:.0%} documented, "
+                  f"{result['churn']} version(s) in 30 days")
+            for f in sorted(result['functions'], key=lambda f: -f['complexity']):
+                icon = "🔴" if f['complexity'] > 10 else "🟡" if f['complexity'] > 5 else "🟢"
+                doc = "" if f['docstring'] else ", no docstring"
+                print(f"  {icon} {f['name']} (lines {f['line']}-{f['end_line']}): complexity {f['complexity']}, "
+                      f"nesting {f['nesting']}, {f['loc']} lines, {f['params']} params{doc}")
+            return True
+        
+        print(f"\n📏 {result['files']} Python files ({result['computed']} measured, {result['cached']} cached, {elapsed:.0f} ms)")
+        if not result['hot']:
+            print("📭 No Python files in the workspace")
+        for m in result['hot']:
+            print(f"  {m['risk']:6.1f}  {m['file']}  (max complexity {m['max_complexity']}, nesting {m['max_nesting']}, "
+                  f"{m['sloc']} lines, {m['docstring_coverage']:.0%} documented, churn {m['churn']})")
+        for path, error in result['errors'].items():
+            print(f"  ⚠️  {path}: {error}")
+        if result['hot']:
+            print(f"💡 review {result['hot'][0]['file']} to start with the riskiest file")
+    
+    elif user_input.lower().startswith('find-refs'):
+        symbol = user_input[9:].strip()
+        if not symbol:
+            print("❌ Usage: find-refs <symbol>")
+            return True
+        
+        start = time.perf_counter()
+        result = find_references(symbol)
+        elapsed = (time.perf_counter() - start) * 1000
+        if not result['definitions'] and not result['references']:
+            print(f"🔎 No definitions or references of '{symbol}' ({elapsed:.1f} ms)")
+            return True
+        
+        print(f"\n🔎 {symbol} ({elapsed:.1f} ms)")
+        for d in result['definitions']:
+            print(f"  📍 {d['file']}:{d['line']}-{d['end_line']} {d['kind']} {d['qualname']}")
+        kinds = {"call": "📞", "attribute": "🔗", "name": "🏷️ ", "import": "📥"}
+        for ref in result['references']:
+            print(f"  {kinds[ref['kind']]} {ref['file']}:{ref['line']} in {ref['scope']} ({ref['kind']})")
+        if result['callees']:
+            print(f"  ➡️  Calls: {', '.join(result['callees'])}")
+    
+    elif user_input.lower().startswith('architect'):
+        task = user_input[10:].strip()
+        if not task:
+            print("❌ Please provide a task for the architect")
+            return True
+        
+        print("\n🏗️ Architect thinking...")
+        result = coding_agent(task, persona="architect", task_type="architect", quality="high")
+        print(f"\n{result}")
+    
+    else:
+        result = ask_agent(user_input)
+        if result.get("file"):
+            print(f"\n📄 Detected file reference: {result['file']}")
+            if result.get("file_error"):
+                print(f"⚠️  Could not read file, proceeding without context")
+            else:
+                print(f"✅ Added file context ({result['file_chars']} chars)")
         
+        print(f"\n🤖 Assistant:\n{result['answer']}")
+    
+    return True
+
+
+# ===== Task List =====
+TODO_ICONS = {"pending": "⬜", "in_progress": "🔄", "completed": "✅"}
+TODO_TRANSITIONS = {
+    "start": ("in_progress", ("pending",)),
+    "done": ("completed", ("pending", "in_progress")),
+    "reset": ("pending", None),
+}
+
+PLAN_CONCURRENCY = int(os.getenv("AGENT_PLAN_CONCURRENCY", "4"))
+
+def run_plan_task(task, dependency_results):
+    """Work one task of a plan, given the results of the tasks it waits for"""
+    context = "\n\n".join(
+        f"Result of prerequisite task {task_id}:\n{result}"
+        for task_id, result in sorted(dependency_results.items())
+    )
+    return coding_agent(task['content'], context=context, persona="coder")
+
+def report_plan_event(event, task, detail=None):
+    icons = {"started": "🔄", "completed": "✅", "failed": "❌", "resumed": "↩️ "}
+    line = f"{icons[event]} Task {task['id']} {event}: {task['content']}"
+    if event == "failed":
+        line += f" ({detail})"
+    print(line)
+
+def handle_todos(args):
+    """Subcommands of the todos REPL command"""
+    action, _, rest = args.partition(" ")
+    rest = rest.strip()
+    
+    if action == "add":
+        if not rest:
+            print("❌ Usage: todos add <task>")
+            return
+        task = tasks.add(rest)
+        print(f"✅ Added task {task['id']}: {task['content']}")
+    
+    elif action in TODO_TRANSITIONS:
+        if not rest.isdigit():
+            print(f"❌ Usage: todos {action} <id>")
+            return
+        to_status, from_status = TODO_TRANSITIONS[action]
+        task = tasks.transition(int(rest), to_status, from_status)
+        if task:
+            print(f"{TODO_ICONS[to_status]} Task {task['id']} is now {to_status}")
+        elif tasks.get(int(rest)):
+            print(f"❌ Task {rest} is {tasks.get(int(rest))['status']}; cannot {action} it")
         else:
-            # Check if query mentions a file
-            file_mentioned = None
-            for word in user_input.split():
-                if '.' in word and not word.startswith('.'):
-                    # Might be a file reference
-                    possible_file = word.strip('.,!?;:"\'')
-                    if os.path.exists(possible_file) or '/' in possible_file:
-                        file_mentioned = possible_file
-                        break
-            
-            if file_mentioned:
-                # Try to read the file for context
-                print(f"\n📄 Detected file reference: {file_mentioned}")
-                read_result = fs.read_file(file_mentioned)
-                
-                if "error" not in read_result:
-                    print(f"✅ Adding file context ({len(read_result['content'])} chars)")
-                    file_context = f"File '{file_mentioned}' content:\n{read_result['content'][:2000]}"
-                    result = coding_agent(user_input, file_context=file_context, persona="coder")
+            print(f"❌ No task {rest}")
+    
+    elif action == "rm":
+        if rest.isdigit() and tasks.remove(int(rest)):
+            print(f"🗑️  Removed task {rest}")
+        else:
+            print(f"❌ No task {rest or '(missing id)'}")
+    
+    elif action in ("dep", "undep"):
+        ids = rest.split()
+        if len(ids) < 2 or not all(i.isdigit() for i in ids):
+            print(f"❌ Usage: todos {action} <id> <prerequisite ids...>")
+            return
+        for prerequisite in ids[1:]:
+            try:
+                if action == "dep":
+                    tasks.add_dependency(int(ids[0]), int(prerequisite))
                 else:
-                    print(f"⚠️  Could not read file, proceeding without context")
-                    result = coding_agent(user_input, persona="coder")
-            else:
-                # General coding question
-                result = coding_agent(user_input, persona="coder")
-            
-            print(f"\n🤖 Assistant:\n{result}")
+                    tasks.remove_dependency(int(ids[0]), int(prerequisite))
+            except ValueError as e:
+                print(f"❌ {e}")
+                return
+        verb = "now waits for" if action == "dep" else "no longer waits for"
+        print(f"✅ Task {ids[0]} {verb} {', '.join(ids[1:])}")
+    
+    elif action == "run":
+        concurrency = int(rest) if rest.isdigit() else PLAN_CONCURRENCY
+        print(f"🗺️  Running open tasks, {concurrency} at a time...")
+        outcome = PlanExecutor(tasks, tracer.bind(run_plan_task), concurrency, on_event=report_plan_event).run()
+        print(f"\n✅ {len(outcome['completed'])} completed, ❌ {len(outcome['failed'])} failed, "
+              f"⏸️  {len(outcome['blocked'])} blocked")
+    
+    elif action == "show":
+        task = tasks.get(int(rest)) if rest.isdigit() else None
+        if not task:
+            print(f"❌ No task {rest or '(missing id)'}")
+            return
+        stored = tasks.result(task["id"]) or {}
+        print(f"{TODO_ICONS[task['status']]} {task['id']}. {task['content']}")
+        print(stored.get("result") or stored.get("error") or "(no result yet)")
+    
+    elif action == "import":
+        path = rest or "todos.json"
+        try:
+            print(f"✅ Imported {tasks.import_json(path)} tasks from {path}")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ Cannot import {path}: {e}")
+    
+    elif action == "export":
+        print(f"✅ Tasks written to {tasks.export_json(rest or 'todos.json')}")
+    
+    elif not action or action in STATUSES:
+        todo_list = tasks.list(status=action or None)
+        if not todo_list:
+            print("📝 No tasks")
+            return
+        print("\n📝 Tasks:")
+        deps = tasks.dependencies()
+        for task in todo_list:
+            after = deps.get(task['id'])
+            waits = f"  (after {', '.join(map(str, sorted(after)))})" if after else ""
+            print(f"  {TODO_ICONS[task['status']]} {task['id']:>3}. {task['content']}{waits}")
+        counts = tasks.counts()
+        print("  " + ", ".join(f"{counts[status]} {status}" for status in STATUSES))
+    
+    else:
+        print("❌ Usage: todos [status] | add <task> | start|done|reset <id> | rm <id> | "
+              "dep|undep <id> <ids...> | run [n] | show <id> | import|export [file]")
 
 # ===== Example Files Creation =====
 def setup_example_files():
@@ -619,6 +1781,51 @@ Use the agent commands to read, write, and analyze these files."""
     print("  • edit math_operations.py 'add docstrings to all functions'")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="AI Coding Agent CLI")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile every REPL command with cProfile")
+    parser.add_argument("--trace-malloc", action="store_true",
+                        help="report top allocation sites of every REPL command with tracemalloc")
+    parser.add_argument("command", nargs="*",
+                        help="run a single REPL command (via the daemon if one is running) and exit")
+    parser.add_argument("--daemon", action="store_true",
+                        help="keep warm state in a background process serving one-shot commands")
+    parser.add_argument("--serve", action="store_true",
+                        help="run the headless HTTP/JSON API instead of the REPL")
+    parser.add_argument("--host", default="127.0.0.1", help="API host (with --serve)")
+    parser.add_argument("--port", type=int, default=8765, help="API port (with --serve)")
+    parser.add_argument("--workers", type=int, default=8, help="API worker threads (with --serve)")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="run a script or JSONL file of commands non-interactively")
+    parser.add_argument("--output", metavar="FILE",
+                        help="write batch results as JSONL to FILE (default: stdout)")
+    parser.add_argument("--jobs", type=int, default=8, help="batch commands run concurrently (with --batch)")
+    args = parser.parse_args()
+    
+    if args.profile or args.trace_malloc:
+        profiler.enable(cpu=args.profile, memory=args.trace_malloc)
+    
+    if args.serve or args.daemon:
+        sandbox.start()  # Long-running modes keep sandbox workers warm from the start
+    
+    if args.serve:
+        operations, streams = api_operations()
+        run_server(operations, streams, host=args.host, port=args.port, workers=args.workers,
+                   required=API_REQUIRED, read_only=API_READ_ONLY, token=os.getenv("AGENT_API_TOKEN"))
+        raise SystemExit(0)
+    
+    if args.batch:
+        raise SystemExit(run_batch(args.batch, args.output, args.jobs))
+    
+    if args.daemon:
+        serve_daemon(run_command)
+        raise SystemExit(0)
+    
+    if args.command:
+        # No daemon answered: run the command in this process
+        run_command(" ".join(args.command))
+        raise SystemExit(0)
+    
     # Setup workspace
     setup_example_files()
     
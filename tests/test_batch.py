@@ -0,0 +1,66 @@
+# Tests for batch planning and dependency handling (python -m pytest tests)
+import unittest
+
+from Agent.batch import BatchCommand, BatchRunner, parse_line, plan
+
+
+def script(*lines):
+    return [parse_line(line, number) for number, line in enumerate(lines, 1)]
+
+
+class BatchPlanTest(unittest.TestCase):
+    def test_commands_on_the_same_file_keep_their_order(self):
+        commands = plan(script(
+            "read a.py",
+            "read a.py",
+            "write a.py print('hi')",
+            "analyze a.py",
+            "read b.py",
+        ))
+        deps = {command.id: command.deps for command in commands}
+
+        # Reads run together, a write waits for both, the next read waits for the write
+        self.assertEqual(deps["L1"], set())
+        self.assertEqual(deps["L2"], set())
+        self.assertEqual(deps["L3"], {"L1", "L2"})
+        self.assertEqual(deps["L4"], {"L3"})
+        self.assertEqual(deps["L5"], set())
+
+    def test_unknown_after_id_is_rejected(self):
+        with self.assertRaises(ValueError):
+            plan([BatchCommand("x", "list", {}, after=["missing"])])
+
+
+class BatchRunnerTest(unittest.TestCase):
+    def run_commands(self, commands):
+        operations = {
+            "list": lambda params: {"success": True},
+            "read": lambda params: {"error": "File not found"},
+        }
+        results = BatchRunner(operations, jobs=4).run(commands)
+        return {record["id"]: record for record in results}
+
+    def test_after_cycle_is_skipped(self):
+        results = self.run_commands([
+            BatchCommand("a", "list", {}, after=["b"]),
+            BatchCommand("b", "list", {}, after=["a"]),
+            BatchCommand("c", "list", {}),
+        ])
+
+        self.assertEqual(results["c"]["status"], "ok")
+        for command_id in ("a", "b"):
+            self.assertEqual(results[command_id]["status"], "skipped")
+            self.assertEqual(results[command_id]["result"], {"error": "Dependency cycle"})
+
+    def test_dependents_of_a_failed_command_are_skipped(self):
+        results = self.run_commands([
+            BatchCommand("r", "read", {"file": "a.py"}),
+            BatchCommand("l", "list", {}, after=["r"]),
+        ])
+
+        self.assertEqual(results["r"]["status"], "error")
+        self.assertEqual(results["l"]["status"], "skipped")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+# Tests for the workspace import graph (python -m pytest tests)
+import os
+import shutil
+import tempfile
+import unittest
+
+from Agent.depgraph import ImportGraph
+
+
+class ImportGraphTest(unittest.TestCase):
+    def test_two_file_cycle(self):
+        graph = ImportGraph()
+        graph.set_imports("a.py", ["b.helper"])
+        graph.set_imports("b.py", ["a"])
+        graph.set_imports("c.py", ["a"])
+
+        self.assertEqual(graph.cycles(), [{"files": ["a.py", "b.py"], "cycle": ["a.py", "b.py"]}])
+        self.assertEqual(graph.importers_of("a.py"), {"b.py", "c.py"})
+
+    def test_relative_imports(self):
+        graph = ImportGraph()
+        graph.set_imports("pkg/__init__.py", [])
+        graph.set_imports("pkg/x.py", [])
+        graph.set_imports("pkg/sub/__init__.py", [".y"])  # from . import y
+        graph.set_imports("pkg/sub/y.py", [])
+        graph.set_imports("pkg/sub/mod.py", ["..x", ".y.name"])  # from .. import x; from .y import name
+
+        self.assertEqual(graph.imports_of("pkg/sub/mod.py"), {"pkg/x.py", "pkg/sub/y.py"})
+        self.assertEqual(graph.imports_of("pkg/sub/__init__.py"), {"pkg/sub/y.py"})
+        self.assertEqual(graph.cycles(), [])
+
+    def test_sync_picks_up_changes_and_removals(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        for name in ("a.py", "b.py"):
+            with open(os.path.join(root, name), "w", encoding="utf-8") as f:
+                f.write("")
+        imports = {"a.py": ["b"], "b.py": []}
+        graph = ImportGraph()
+
+        changed, removed = graph.sync(root, imports.get)
+        self.assertEqual((sorted(changed), removed), (["a.py", "b.py"], []))
+        self.assertEqual(graph.dependents(["b.py"]), {"a.py"})
+
+        os.remove(os.path.join(root, "b.py"))
+        changed, removed = graph.sync(root, imports.get)
+        self.assertEqual((changed, removed), ([], ["b.py"]))
+        self.assertEqual(graph.imports_of("a.py"), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
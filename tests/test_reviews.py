@@ -0,0 +1,46 @@
+# Tests for parsing incremental review replies (python -m pytest tests)
+import unittest
+
+from Agent.reviews import parse_findings, review_units
+
+SOURCE = '''import os
+
+
+def load(path):
+    return open(path).read()
+
+
+class Store:
+    def save(self, path, data):
+        with open(path, "w") as f:
+            f.write(data)
+'''
+
+
+class ParseFindingsTest(unittest.TestCase):
+    def setUp(self):
+        self.units = review_units(SOURCE)
+
+    def test_findings_are_grouped_by_symbol(self):
+        reply = "\n".join([
+            '{"symbol": "load", "line": 5, "severity": "high", "message": "File is never closed"}',
+            'Some chatter the model added',
+            '{"symbol": "nope", "line": 11, "severity": "odd", "message": "Unchecked write"}',
+        ])
+        grouped, answered = parse_findings(reply, self.units)
+
+        self.assertTrue(answered)
+        self.assertEqual(grouped["load"], [{"offset": 1, "severity": "high", "message": "File is never closed"}])
+        # An unknown symbol goes to the innermost unit holding its line
+        self.assertEqual(grouped["Store.save"], [{"offset": 2, "severity": "medium", "message": "Unchecked write"}])
+
+    def test_explicit_no_findings(self):
+        self.assertEqual(parse_findings('{"none": true}', self.units), ({}, True))
+
+    def test_reply_ignoring_the_format_is_not_an_answer(self):
+        reply = "The code looks fine overall, but `load` should use a with block.\n{not json}\n[1, 2]"
+        self.assertEqual(parse_findings(reply, self.units), ({}, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
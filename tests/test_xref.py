@@ -0,0 +1,57 @@
+# Regression tests for the cross-reference index (python -m pytest tests)
+import os
+import shutil
+import tempfile
+import unittest
+
+from Agent.xref import XrefIndex
+
+
+class XrefSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.write("shapes.py", "def area(r):\n    return 3 * r * r\n")
+        self.write("app.py", "from shapes import area\n\nprint(area(2))\n")
+        # Names containing key/token/secret/password are refused by FileSystemManager.read_file
+        self.write("monkey.py", "def climb():\n    return area(1)\n")
+
+    def write(self, name, text):
+        with open(os.path.join(self.root, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def read_source(self, rel_path):
+        """Reader that refuses files the way main.sync_xref's reader does"""
+        if "key" in rel_path:
+            return None
+        with open(os.path.join(self.root, rel_path), encoding="utf-8") as f:
+            return f.read()
+
+    def test_refused_file_is_skipped(self):
+        index = XrefIndex()
+        changed, removed = index.sync(self.root, self.read_source)
+
+        self.assertEqual(sorted(changed), ["app.py", "monkey.py", "shapes.py"])
+        self.assertEqual(removed, [])
+        self.assertEqual([d["file"] for d in index.definitions("area")], ["shapes.py"])
+        self.assertEqual(index.definitions("climb"), [])
+        self.assertEqual({r["file"] for r in index.references("area")}, {"app.py"})
+
+    def test_unreadable_or_broken_file_keeps_last_index(self):
+        index = XrefIndex()
+        index.sync(self.root, self.read_source)
+
+        self.write("shapes.py", "def area(r:\n")
+        index.sync(self.root, self.read_source)
+        self.assertEqual([d["file"] for d in index.definitions("area")], ["shapes.py"])
+
+        def failing_reader(rel_path):
+            raise OSError("gone")
+
+        os.utime(os.path.join(self.root, "app.py"), (0, 0))
+        index.sync(self.root, failing_reader)
+        self.assertEqual({r["file"] for r in index.references("area")}, {"app.py"})
+
+
+if __name__ == "__main__":
+    unittest.main()